@@ -0,0 +1,109 @@
+"""
+Admission control for expensive endpoints.
+
+Work runs in one of two bounded thread pools, 'generate' for extraction and
+flashcard generation and 'interactive' for grading and hints, so a burst of
+uploads cannot hold up answers. A pool whose queue is full sheds load with a
+503. Per-client token buckets answer 429 before any work is queued. Both
+responses carry a Retry-After header.
+
+Everything here is used from the event loop thread, so no locks are needed.
+"""
+import asyncio
+import contextvars
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import metrics
+
+REJECTIONS = metrics.MetricFamily(
+    'flashcards_admission_rejections_total',
+    'Requests turned away by admission control, by pool and reason.',
+    'counter', ('pool', 'reason'),
+)
+
+def retry_after_error(status_code, detail, seconds):
+    return HTTPException(status_code=status_code, detail=detail,
+                         headers={'Retry-After': str(max(1, math.ceil(seconds)))})
+
+class ClientQuotas:
+    """Token buckets keyed by client: ``burst`` requests at once, refilled at ``rate`` per second.
+
+    Only the ``max_clients`` most recently seen clients are tracked; an evicted
+    client simply starts again with a full bucket.
+    """
+
+    def __init__(self, name, rate, burst, max_clients=10_000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.rejected = REJECTIONS.labels(name, 'quota')
+
+    def take(self, key, cost=1.0, now=None):
+        """Spend ``cost`` tokens for ``key``. Returns 0 if admitted, else seconds until it would be."""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+    def check(self, key, cost=1.0):
+        """Raise a 429 unless ``key`` has quota left."""
+        wait = self.take(key, cost)
+        if wait:
+            self.rejected.inc()
+            raise retry_after_error(429, "Too many requests, please slow down", wait)
+
+class WorkPool:
+    """A named thread pool that refuses work once ``max_queue`` jobs are waiting."""
+
+    def __init__(self, name, workers, max_queue):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+        self.pending = 0
+        # Moving average of job duration, used to estimate Retry-After
+        self.average_seconds = 1.0
+        self.rejected = REJECTIONS.labels(name, 'overloaded')
+
+    @property
+    def queued(self):
+        return max(0, self.pending - self.workers)
+
+    def admit(self):
+        """Raise a 503 if the queue is already full."""
+        if self.queued >= self.max_queue:
+            self.rejected.inc()
+            wait = self.average_seconds * (self.queued + 1) / self.workers
+            raise retry_after_error(503, "Server is busy, please retry shortly", min(wait, 60))
+
+    async def run(self, fn, *args, admit=True):
+        """Run ``fn(*args)`` on the pool, keeping the caller's tracing context.
+
+        Pass ``admit=False`` for follow-up jobs of a request that was already
+        admitted, so a batch is not cut off halfway through.
+        """
+        if admit:
+            self.admit()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, fn, *args)
+        finally:
+            self.pending -= 1
+            self.average_seconds = 0.8 * self.average_seconds + 0.2 * (time.perf_counter() - start)
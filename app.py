@@ -1,15 +1,32 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect, Header, Depends
+from fastapi.requests import HTTPConnection
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+import asyncio
 import json
+import logging
 import os
 import uuid
-import random
-from main import extract_text_from_pdf, extract_text_from_document, generate_flashcards, check_answer, generate_hint, extract_text_from_url
-from typing import Optional
+import secrets
+import time
+from main import extract_text_from_pdf, extract_text_from_document, generate_flashcards, generate_deck, check_answer, generate_hint, extract_text_from_url, card_question_answer, card_choices, local_check_answer, local_hint
+from deck_library import get_library
+from scheduler import Scheduler, quality_for
+import metrics
+import tracing
+import usage
+import logs
+from compression import CompressionMiddleware
+from static_cache import StaticCache
+from admission import ClientQuotas, WorkPool, retry_after_error
+from coalesce import SingleFlight, content_key, normalize_url
+from incremental import previous_chunks
+from typing import List, Optional
+
+logs.setup()
+log = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -22,13 +39,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Templates and Static Files
+# gzip (or brotli when installed) for JSON and text responses over 1 KB
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Per-route latency histograms, exposed on /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Per-request span timings in a Server-Timing header, plus on-demand profiling
+profiler = tracing.StackSampler()
+app.add_middleware(tracing.TracingMiddleware, sampler=profiler)
+
+# Request IDs for log correlation, echoed in X-Request-ID
+app.add_middleware(logs.RequestIdMiddleware)
+
+# Templates and Static Files, rendered and read once and served from memory
+# (reloaded on change when DEBUG is set)
 templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_files = StaticCache()
+static_files.add("/", "templates/index.html", "text/html",
+                 render=lambda path: templates.get_template(path.name).render().encode("utf-8"))
+static_files.add("/manifest.json", "static/manifest.json", "application/manifest+json")
+static_files.add("/sw.js", "static/sw.js", "application/javascript")
+static_files.add_directory("static", "/static/", cache_control="public, max-age=86400")
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'json'}
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+MAX_PROFILED_REQUESTS = 1000
+SKIP_ANSWER = 'SKIPPED'
+# Trust X-Forwarded-For for client addresses (set when running behind a proxy, e.g. on Render)
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "").lower() in ("1", "true", "yes")
+
+# Admission control: generation and interactive grading get separate pools
+# so a burst of uploads cannot hold up everyone's answers
+generate_pool = WorkPool('generate', workers=int(os.environ.get("GENERATE_WORKERS", 4)),
+                         max_queue=int(os.environ.get("GENERATE_QUEUE", 8)))
+interactive_pool = WorkPool('interactive', workers=int(os.environ.get("INTERACTIVE_WORKERS", 16)),
+                            max_queue=int(os.environ.get("INTERACTIVE_QUEUE", 64)))
+# Generation is keyed by client address, grading and hints by study session
+generate_quota = ClientQuotas('generate', rate=float(os.environ.get("GENERATE_PER_MINUTE", 6)) / 60,
+                              burst=int(os.environ.get("GENERATE_BURST", 3)))
+# Daily token budgets (0 disables): a study session that spends its budget
+# on grading and hints is graded locally from then on; a client that spends
+# its generation budget is refused new generations until the next UTC day
+SESSION_TOKEN_BUDGET = int(os.environ.get("SESSION_TOKEN_BUDGET", 50_000))
+CLIENT_TOKEN_BUDGET = int(os.environ.get("CLIENT_TOKEN_BUDGET", 1_000_000))
+SESSION_BUDGET_EXCEEDED = usage.BUDGET_EXCEEDED.labels('session')
+CLIENT_BUDGET_EXCEEDED = usage.BUDGET_EXCEEDED.labels('client')
+# Identical generations requested at the same time (a class opening a shared
+# link) run once and every request gets the result
+upload_flights = SingleFlight('upload')
+url_flights = SingleFlight('url')
+batch_flights = SingleFlight('urls')
+interactive_quota = ClientQuotas('interactive', rate=float(os.environ.get("INTERACTIVE_PER_SECOND", 2)),
+                                 burst=int(os.environ.get("INTERACTIVE_BURST", 10)))
 
 # Create uploads directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -36,10 +102,19 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # In-memory session storage (in production, use Redis or database)
 sessions = {}
 
+def count_sessions() -> dict:
+    study = sum(1 for key in sessions if key.endswith('_study'))
+    return {'deck': len(sessions) - study, 'study': study}
+
+metrics.GaugeFunction('flashcards_active_sessions', 'Sessions held in memory, by kind.', 'kind', count_sessions)
+metrics.GaugeFunction('flashcards_pool_pending', 'Jobs running or queued in each work pool.', 'pool',
+                      lambda: {pool.name: pool.pending for pool in (generate_pool, interactive_pool)})
+
 # Pydantic models
 class StartSessionRequest(BaseModel):
     session_id: str
     num_questions: int = 10
+    multiple_choice: bool = False
 
 class QuestionRequest(BaseModel):
     study_session_id: str
@@ -60,120 +135,306 @@ class FlashcardsRequest(BaseModel):
 class RestartRequest(BaseModel):
     confirm: bool = True
 
+class URLBatchRequest(BaseModel):
+    urls: List[str]
+    name: Optional[str] = None
+
+class ProfileRequest(BaseModel):
+    requests: int = 10
+
+class LibrarySessionRequest(BaseModel):
+    query: str
+    num_questions: int = 10
+    multiple_choice: bool = False
+
+# Upper bound on how many search matches seed a study session from the library
+LIBRARY_SESSION_MAX_CARDS = 500
+# Cards per page of GET /sessions/{session_id}/flashcards
+DECK_PAGE_SIZE = 100
+MAX_DECK_PAGE_SIZE = 500
+
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def save_to_library(name: str, flashcards: list, source: str, chunks: Optional[list] = None):
+    """Add a generated deck to the persistent library without failing the request."""
+    try:
+        get_library().add_deck(name, flashcards, source=source, chunks=chunks)
+    except Exception as e:
+        log.warning("Could not save deck to library: %s", e)
+
+def library_chunks(source: str) -> dict:
+    """Cards per chunk hash of the library deck last generated from ``source``, for incremental regeneration."""
+    try:
+        deck = get_library().get_source_deck(source)
+    except Exception as e:
+        log.warning("Could not read previous deck from library: %s", e)
+        return {}
+    return previous_chunks(deck['flashcards'], deck['chunks']) if deck else {}
+
+def library_chunk_cards(hashes: list) -> dict:
+    """Cards per chunk hash from any library deck, for incremental regeneration of uploads."""
+    try:
+        return get_library().chunk_cards(hashes)
+    except Exception as e:
+        log.warning("Could not read previous chunks from library: %s", e)
+        return {}
+
+def deck_response(session_id: str, flashcards: list, include_cards: bool, **fields) -> dict:
+    """Describe a new session's deck by count; the cards themselves only when asked for.
+    
+    Clients page through the deck with GET /sessions/{session_id}/flashcards.
+    """
+    response = {'session_id': session_id, 'flashcard_count': len(flashcards), **fields}
+    if include_cards:
+        response['flashcards'] = flashcards
+    return response
+
+def card_matches(card: dict, filters: dict) -> bool:
+    """Whether a card passes the category/difficulty/type filters ('all' or missing matches anything)."""
+    for key, default in (('category', 'General'), ('difficulty', 'medium'), ('type', 'question_answer')):
+        wanted = filters.get(key)
+        if wanted and wanted != 'all' and card.get(key, default) != wanted:
+            return False
+    return True
+
+def client_address(request: HTTPConnection) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get('x-forwarded-for')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+def check_generation_budget(client: str):
+    """Refuse a new generation once the client has spent its daily token budget."""
+    if usage.LEDGER.over_budget(f"client:{client}", CLIENT_TOKEN_BUDGET):
+        CLIENT_BUDGET_EXCEEDED.inc()
+        raise retry_after_error(429, "Daily generation budget used up, please try again tomorrow",
+                                usage.seconds_until_tomorrow())
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return static_files.response("/", request)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Render"""
     return {"status": "healthy", "message": "Flashcard API is running"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(metrics.render_latest(), media_type="text/plain; version=0.0.4")
+
 @app.get("/manifest.json")
-async def get_manifest():
+async def get_manifest(request: Request):
     """Serve PWA manifest file"""
-    with open("static/manifest.json", "r") as f:
-        manifest = json.load(f)
-    return manifest
+    return static_files.response("/manifest.json", request)
 
 @app.get("/sw.js")
-async def get_service_worker():
+async def get_service_worker(request: Request):
     """Serve service worker file"""
-    with open("static/sw.js", "r") as f:
-        sw_content = f.read()
-    return HTMLResponse(content=sw_content, media_type="application/javascript")
+    return static_files.response("/sw.js", request)
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    if not allowed_file(file.filename):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF, DOC, DOCX, or JSON file.")
+@app.get("/static/{path:path}")
+async def get_static_file(path: str, request: Request):
+    """Serve a file from static/ out of the in-memory cache."""
+    name = f"/static/{path}"
+    if name not in static_files and static_files.reload:
+        # Pick up files added since startup
+        static_files.add_directory("static", "/static/", cache_control="public, max-age=86400")
+    if name not in static_files:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return static_files.response(name, request)
+
+def generate_from_document(content: bytes, filename: str, file_extension: str) -> dict:
+    """Extract an uploaded document's text and generate its deck (runs on the generate pool).
     
-    # Save file temporarily
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+    Re-uploading a document only regenerates the chunks that are not
+    already in the library. Uploads are matched by content, not by file
+    name, since different students' files are often named alike.
+    """
+    # Save file temporarily, under a unique name so concurrent uploads of the same file cannot collide
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{os.path.basename(filename)}")
     with open(file_path, "wb") as buffer:
-        content = await file.read()
         buffer.write(content)
     
-    file_extension = file.filename.rsplit('.', 1)[1].lower()
-    
     try:
-        if file_extension in ['pdf', 'doc', 'docx']:
-            # Process document and generate flashcards
-            if file_extension == 'pdf':
-                text = extract_text_from_pdf(file_path)
-            else:
-                text = extract_text_from_document(file_path)
-                
-            if not text:
-                raise HTTPException(status_code=400, detail=f"Failed to extract text from {file_extension.upper()}")
-            
-            flashcards_data = generate_flashcards(text)
-            if not flashcards_data:
-                raise HTTPException(status_code=400, detail="Failed to generate flashcards")
-            
-            flashcards = flashcards_data.get('flashcards', [])
-            
-        elif file_extension == 'json':
-            # Load existing flashcards JSON
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    flashcards = data.get('flashcards', [])
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Invalid JSON file: {str(e)}")
-        
-        # Store flashcards in session
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = {
-            'flashcards': flashcards,
-            'study_session': None
-        }
-        
-        return {
-            'session_id': session_id,
-            'flashcards': flashcards,
-            'flashcard_count': len(flashcards),
-            'message': f'Successfully loaded {len(flashcards)} flashcards'
-        }
-    
+        if file_extension == 'pdf':
+            text = extract_text_from_pdf(file_path)
+        else:
+            text = extract_text_from_document(file_path)
     finally:
         # Clean up uploaded file
         if os.path.exists(file_path):
             os.remove(file_path)
+        
+    if not text:
+        raise HTTPException(status_code=400, detail=f"Failed to extract text from {file_extension.upper()}")
+    
+    deck = generate_deck(text, library_chunk_cards)
+    if not deck['flashcards']:
+        raise HTTPException(status_code=400, detail="Failed to generate flashcards")
+    
+    return deck
+
+async def generate_upload(content: bytes, filename: str, file_extension: str, key: str) -> list:
+    """Generate an uploaded document's deck and save it to the library (shared by identical uploads).
+    
+    ``key`` is the upload's content key; the same file uploaded again replaces its library deck.
+    """
+    deck = await generate_pool.run(generate_from_document, content, filename, file_extension, admit=False)
+    save_to_library(filename, deck['flashcards'], source=f"upload:{key}", chunks=deck['manifest'])
+    return deck['flashcards']
+
+@app.post("/upload")
+async def upload_file(request: Request, file: UploadFile = File(...), include_cards: bool = False):
+    if not allowed_file(file.filename):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF, DOC, DOCX, or JSON file.")
+    
+    file_extension = file.filename.rsplit('.', 1)[1].lower()
+    client = client_address(request)
+    if file_extension != 'json':
+        generate_quota.check(client)
+        check_generation_budget(client)
+        generate_pool.admit()
+    
+    content = await file.read()
+    
+    if file_extension in ['pdf', 'doc', 'docx']:
+        # Process document and generate flashcards; identical concurrent uploads share the work
+        with usage.attribute("/upload", f"client:{client}"):
+            key = content_key(content, file_extension)
+            flashcards = await upload_flights.run(key, lambda: generate_upload(content, file.filename, file_extension, key))
+        
+    elif file_extension == 'json':
+        # Load existing flashcards JSON
+        try:
+            data = json.loads(content)
+            flashcards = data.get('flashcards', [])
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON file: {str(e)}")
+    
+    # Store flashcards in session
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = {
+        'flashcards': list(flashcards),
+        'study_session': None
+    }
+    
+    return deck_response(session_id, flashcards, include_cards,
+                         message=f'Successfully loaded {len(flashcards)} flashcards')
+
+def generate_from_url(url: str) -> dict:
+    """Fetch a URL and generate its deck, regenerating only changed chunks (runs on the generate pool)."""
+    log.info("Processing URL %s", url)
+    text = extract_text_from_url(url)
+    if not text:
+        raise HTTPException(status_code=400, detail="Failed to extract content from URL")
+    
+    log.info("Extracted %d characters from URL", len(text))
+    deck = generate_deck(text, library_chunks(f"url:{url}"))
+    if not deck['flashcards']:
+        raise HTTPException(status_code=500, detail="Failed to generate flashcards")
+    return deck
+
+async def generate_url(url: str) -> list:
+    """Generate a URL's deck and save it to the library (shared by concurrent requests for the URL)."""
+    deck = await generate_pool.run(generate_from_url, url)
+    save_to_library(url, deck['flashcards'], source=f"url:{url}", chunks=deck['manifest'])
+    return deck['flashcards']
 
 @app.post("/generate-from-url")
-async def generate_flashcards_from_url(request: URLRequest):
+async def generate_flashcards_from_url(request: URLRequest, http_request: Request, include_cards: bool = False):
     """API endpoint to generate flashcards from a URL."""
+    client = client_address(http_request)
+    generate_quota.check(client)
+    check_generation_budget(client)
     try:
-        print(f"Processing URL: {request.url}")
-        text = extract_text_from_url(request.url)
-        if not text:
-            raise HTTPException(status_code=400, detail="Failed to extract content from URL")
-        
-        print(f"Extracted {len(text)} characters from URL")
-        flashcards = generate_flashcards(text)
-        if not flashcards:
-            raise HTTPException(status_code=500, detail="Failed to generate flashcards")
+        with usage.attribute("/generate-from-url", f"client:{client}"):
+            flashcards = await url_flights.run(normalize_url(request.url), lambda: generate_url(request.url))
         
         # Store flashcards in session for studying
         session_id = str(uuid.uuid4())
         sessions[session_id] = {
-            'flashcards': flashcards.get('flashcards', []),
+            'flashcards': list(flashcards),
             'study_session': None
         }
         
-        return {
-            "session_id": session_id,
-            "flashcards": flashcards.get('flashcards', []),
-            "message": f"Generated {len(flashcards.get('flashcards', []))} flashcards from URL"
-        }
+        return deck_response(session_id, flashcards, include_cards,
+                             message=f"Generated {len(flashcards)} flashcards from URL")
+    except HTTPException as e:
+        if e.status_code in (429, 503):
+            raise
+        log.warning("Error processing URL: %s", e.detail)
+        raise HTTPException(status_code=500, detail=f"Error processing URL: {e.detail}")
     except Exception as e:
-        print(f"Error processing URL: {e}")
+        log.exception("Error processing URL")
         raise HTTPException(status_code=500, detail=f"Error processing URL: {str(e)}")
 
+@app.post("/generate-from-urls")
+async def generate_flashcards_from_urls(request: URLBatchRequest, http_request: Request, include_cards: bool = False):
+    """Generate one deck from several URLs fetched concurrently.
+    
+    URLs that cannot be fetched are reported in 'sources' rather than failing
+    the batch; the request only fails when no URL yields any flashcards.
+    """
+    from url_batch import MAX_BATCH_URLS, ingest_urls
+    
+    urls = list(dict.fromkeys(url.strip() for url in request.urls if url.strip()))
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(urls) > MAX_BATCH_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_URLS} URLs per batch")
+    
+    client = client_address(http_request)
+    generate_quota.check(client)
+    check_generation_budget(client)
+    generate_pool.admit()
+    
+    async def generate_batch():
+        result = await ingest_urls(urls, generate_flashcards, sync_extract=extract_text_from_url,
+                                   run_sync=lambda fn, *args: generate_pool.run(fn, *args, admit=False))
+        if not result['flashcards']:
+            fetched = any(source['ok'] for source in result['sources'])
+            raise HTTPException(
+                status_code=500 if fetched else 400,
+                detail={
+                    'message': "Failed to generate flashcards" if fetched else "Failed to extract content from any URL",
+                    'sources': result['sources'],
+                },
+            )
+        name = request.name or (f"{urls[0]} (+{len(urls) - 1} more)" if len(urls) > 1 else urls[0])
+        save_to_library(name, result['flashcards'], source="urls:" + "\n".join(sorted(urls)))
+        return result
+    
+    # The same set of pages requested concurrently is ingested once
+    key = "\n".join(sorted({normalize_url(url) for url in urls}))
+    with usage.attribute("/generate-from-urls", f"client:{client}"):
+        result = await batch_flights.run(key, generate_batch)
+    flashcards = result['flashcards']
+    
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = {
+        'flashcards': list(flashcards),
+        'study_session': None
+    }
+    
+    ok = sum(1 for source in result['sources'] if source['ok'])
+    return deck_response(
+        session_id, flashcards, include_cards,
+        sources=result['sources'],
+        chunks=result['chunks'],
+        failed_chunks=result['failed_chunks'],
+        message=f"Generated {len(flashcards)} flashcards from {ok} of {len(urls)} URLs",
+    )
+
 @app.post("/start_session")
 async def start_session(request: StartSessionRequest):
     session_id = request.session_id
@@ -186,42 +447,94 @@ async def start_session(request: StartSessionRequest):
         # This could happen if the server restarted and sessions were lost
         raise HTTPException(status_code=400, detail=f"Session expired or not found. Please regenerate your flashcards.")
     
+    return create_study_session(session_id, num_questions, request.multiple_choice)
+
+def create_study_session(session_id: str, num_questions: int, multiple_choice: bool = False) -> dict:
+    """Register a study session that draws cards from the deck's scheduler.
+    
+    In multiple-choice mode every question comes with answer options and is
+    graded by exact match, so answering never calls Claude.
+    """
     session_data = sessions[session_id]
     flashcards = session_data.get('flashcards', [])
     
     if not flashcards:
         raise HTTPException(status_code=400, detail="No flashcards found in session")
     
-    # Shuffle and select requested number of flashcards
-    flashcards_copy = flashcards.copy()  # Make a copy to avoid modifying original
-    random.shuffle(flashcards_copy)
-    selected_flashcards = flashcards_copy[:num_questions]
+    # The scheduler keeps per-card review state for the whole deck, so it is
+    # built once and reused by every study session started on this deck
+    scheduler = session_data.get('scheduler')
+    if scheduler is None or len(scheduler) != len(flashcards):
+        scheduler = Scheduler(len(flashcards))
+        session_data['scheduler'] = scheduler
     
-    # Store the selected flashcards for this session
+    # Return the card an abandoned study session was holding to the queue
     study_session_id = f"{session_id}_study"
+    previous = sessions.get(study_session_id)
+    if previous and previous.get('current_card') is not None:
+        previous['scheduler'].release(previous['current_card'])
+    
+    total_questions = max(1, min(num_questions, len(flashcards)))
     sessions[study_session_id] = {
-        'flashcards': selected_flashcards,
-        'current_question': 0,
+        'flashcards': flashcards,
+        'scheduler': scheduler,
+        # Grading and hint usage counts against the deck's session budget, and the client's
+        'usage_key': f"session:{session_id}",
+        'current_card': None,
+        'multiple_choice': multiple_choice,
+        'choices': None,
+        'hint_used': False,
+        # When the current question was shown; answer latency is measured from here
+        'asked_at': None,
+        'shown': False,
+        # The in-flight grading task, so a second answer to the same card gets a 409
+        'grading': None,
+        'answered': 0,
         'score': 0,
-        'total_questions': len(selected_flashcards)
+        'total_questions': total_questions
     }
     
     return {
         'study_session_id': study_session_id,
-        'total_questions': len(selected_flashcards)
+        'total_questions': total_questions,
+        'multiple_choice': multiple_choice
     }
 
-@app.post("/get_question")
-async def get_question(request: QuestionRequest):
-    study_session_id = request.study_session_id
-    
+def get_study_session(study_session_id: str) -> dict:
     if not study_session_id or study_session_id not in sessions:
         raise HTTPException(status_code=400, detail="Invalid study session")
+    return sessions[study_session_id]
+
+def current_study_card(study_data: dict) -> dict:
+    """Return the card the student is currently answering."""
+    if study_data['current_card'] is None:
+        raise HTTPException(status_code=400, detail="No question in progress. Request a question first.")
+    return study_data['flashcards'][study_data['current_card']]
+
+def next_question(study_data: dict, prefetch: bool = False) -> dict:
+    """Return the current question, drawing a new card once the last one was answered.
     
-    study_data = sessions[study_session_id]
-    current_q = study_data['current_question']
+    Pass ``prefetch`` when the question is sent ahead of being shown, as the
+    WebSocket does with each result. The client then asks for it again when
+    it shows it, and the answer clock restarts at that point.
+    """
+    # Only draw a new card once the current one has been answered, so asking
+    # again (e.g. after switching tabs or reconnecting) returns the same question
+    if study_data['current_card'] is None and study_data['answered'] < study_data['total_questions']:
+        study_data['current_card'] = study_data['scheduler'].draw()
+        study_data['hint_used'] = False
+        study_data['asked_at'] = time.monotonic()
+        study_data['shown'] = not prefetch
+        # Options are fixed per question, so asking again shows them in the same order
+        study_data['choices'] = None
+        if study_data['multiple_choice'] and study_data['current_card'] is not None:
+            card = study_data['flashcards'][study_data['current_card']]
+            study_data['choices'] = card_choices(card, study_data['flashcards'])
+    elif not prefetch and not study_data['shown']:
+        study_data['asked_at'] = time.monotonic()
+        study_data['shown'] = True
     
-    if current_q >= len(study_data['flashcards']):
+    if study_data['current_card'] is None:
         # Session complete
         return {
             'complete': True,
@@ -230,95 +543,218 @@ async def get_question(request: QuestionRequest):
             'percentage': (study_data['score'] / study_data['total_questions']) * 100
         }
     
-    card = study_data['flashcards'][current_q]
-    
-    # Format question based on card type
-    if card['type'] == 'question_answer':
-        question = card['question']
-        correct_answer = card['answer']
-    elif card['type'] == 'vocabulary':
-        question = f"What is the definition of: {card['term']}?"
-        correct_answer = card['definition']
-    elif card['type'] == 'fact':
-        question = card['prompt']
-        correct_answer = card['content']
-    else:
-        question = "Unknown question type"
-        correct_answer = "Unknown answer"
+    card = current_study_card(study_data)
+    question, _ = card_question_answer(card)
     
-    return {
-        'question_number': current_q + 1,
+    result = {
+        'question_number': study_data['answered'] + 1,
         'total_questions': study_data['total_questions'],
         'question': question,
         'category': card.get('category', 'General'),
         'difficulty': card.get('difficulty', 'Unknown'),
         'current_score': study_data['score']
     }
+    if study_data['choices']:
+        result['choices'] = study_data['choices']
+    return result
 
-@app.post("/submit_answer")
-async def submit_answer(request: AnswerRequest):
-    study_session_id = request.study_session_id
-    user_answer = request.answer
+def grade_answer(study_data: dict, user_answer: str, client: Optional[str] = None,
+                 answered_at: Optional[float] = None) -> dict:
+    """Grade the answer to the current card and record the review.
     
-    if not study_session_id or study_session_id not in sessions:
-        raise HTTPException(status_code=400, detail="Invalid study session")
+    ``answered_at`` is the time.monotonic() at which the answer arrived, so
+    the recorded latency leaves out grading.
+    """
+    # The attempt store pulls in NumPy, so it is imported on the first answer rather than at startup
+    import attempts
     
-    study_data = sessions[study_session_id]
-    current_q = study_data['current_question']
-    card = study_data['flashcards'][current_q]
+    answered_at = answered_at or time.monotonic()
+    card = current_study_card(study_data)
+    question, correct_answer = card_question_answer(card)
     
-    # Get correct answer
-    if card['type'] == 'question_answer':
-        question = card['question']
-        correct_answer = card['answer']
-    elif card['type'] == 'vocabulary':
-        question = f"What is the definition of: {card['term']}?"
-        correct_answer = card['definition']
-    elif card['type'] == 'fact':
-        question = card['prompt']
-        correct_answer = card['content']
-    
-    # Check answer
-    is_correct = check_answer(question, correct_answer, user_answer)
+    # The frontend's skip button submits this marker; there is nothing to grade
+    skipped = user_answer == SKIP_ANSWER
+    graded_locally = False
+    if skipped:
+        is_correct = False
+    elif study_data['choices']:
+        # Multiple choice: the answer is one of the options, so no model is needed
+        is_correct = user_answer.strip() == str(correct_answer).strip()
+    elif interactive_over_budget(study_data, client):
+        graded_locally = True
+        is_correct = local_check_answer(correct_answer, user_answer)
+    else:
+        is_correct = check_answer(question, correct_answer, user_answer)
     
     if is_correct:
         study_data['score'] += 1
     
-    # Move to next question
-    study_data['current_question'] += 1
-    sessions[study_session_id] = study_data
+    # Every attempt goes to the analytics store, keyed by card and deck session
+    attempts.get_store().record(
+        attempts.card_identity(card, question, correct_answer), card, question, study_data['usage_key'],
+        is_correct, answered_at - study_data['asked_at'],
+        hint=study_data['hint_used'], skipped=skipped,
+    )
     
-    return {
+    # Record the review and move to the next question
+    study_data['scheduler'].review(
+        study_data['current_card'],
+        quality_for(is_correct, hint_used=study_data['hint_used'], skipped=skipped)
+    )
+    study_data['current_card'] = None
+    study_data['choices'] = None
+    study_data['answered'] += 1
+    
+    result = {
         'correct': is_correct,
         'correct_answer': correct_answer,
         'new_score': study_data['score']
     }
+    if graded_locally:
+        result['graded_locally'] = True
+    return result
+
+def interactive_over_budget(study_data: dict, client: Optional[str]) -> bool:
+    """True once the study session's deck or the client has spent its daily token budget.
+    
+    The client budget stops a client from getting fresh grading by starting
+    new study sessions once each one's budget is spent.
+    """
+    if usage.LEDGER.over_budget(study_data['usage_key'], SESSION_TOKEN_BUDGET):
+        SESSION_BUDGET_EXCEEDED.inc()
+        return True
+    if client is not None and usage.LEDGER.over_budget(f"client:{client}", CLIENT_TOKEN_BUDGET):
+        CLIENT_BUDGET_EXCEEDED.inc()
+        return True
+    return False
+
+def hint_for_current_card(study_data: dict, client: Optional[str] = None) -> str:
+    card = current_study_card(study_data)
+    question, correct_answer = card_question_answer(card)
+    
+    if interactive_over_budget(study_data, client):
+        hint = local_hint(correct_answer)
+    else:
+        hint = generate_hint(question, correct_answer)
+    study_data['hint_used'] = True
+    return hint
+
+@app.post("/get_question")
+async def get_question(request: QuestionRequest):
+    return next_question(get_study_session(request.study_session_id))
+
+async def run_interactive(study_session_id: str, fn, *args):
+    """Run grading or hint work for a study session under its quota."""
+    interactive_quota.check(study_session_id)
+    return await interactive_pool.run(fn, *args)
+
+def check_not_grading(study_data: dict):
+    """Refuse work on a card whose answer is being graded, e.g. a double submit or a second tab."""
+    if study_data['grading'] is not None:
+        raise HTTPException(status_code=409, detail="An answer to this question is already being graded")
+
+async def submit_study_answer(study_session_id: str, study_data: dict, answer: str, client: str) -> dict:
+    """Grade an answer: multiple choice inline, free text on the interactive pool.
+
+    The card is claimed on the event loop before grading is handed to a
+    worker thread, so concurrent answers to it cannot both be graded. The
+    grading runs to completion even if the request that started it goes away.
+    """
+    answered_at = time.monotonic()
+    current_study_card(study_data)
+    check_not_grading(study_data)
+    interactive_quota.check(study_session_id)
+    if study_data['choices']:
+        # An exact option match is microseconds of work; it needs no worker thread
+        return grade_answer(study_data, answer, client, answered_at)
+
+    interactive_pool.admit()
+    grading = asyncio.ensure_future(interactive_pool.run(grade_answer, study_data, answer, client, answered_at, admit=False))
+    study_data['grading'] = grading
+
+    def finished(task):
+        study_data['grading'] = None
+        # Mark the exception retrieved in case the request went away
+        if not task.cancelled():
+            task.exception()
+
+    grading.add_done_callback(finished)
+    return await asyncio.shield(grading)
+
+@app.post("/submit_answer")
+async def submit_answer(request: AnswerRequest, http_request: Request):
+    study_data = get_study_session(request.study_session_id)
+    client = client_address(http_request)
+    with usage.attribute("/submit_answer", study_data['usage_key'], f"client:{client}"):
+        return await submit_study_answer(request.study_session_id, study_data, request.answer, client)
 
 @app.post("/get_hint")
-async def get_hint(request: HintRequest):
-    study_session_id = request.study_session_id
+async def get_hint(request: HintRequest, http_request: Request):
+    study_data = get_study_session(request.study_session_id)
+    check_not_grading(study_data)
+    client = client_address(http_request)
+    with usage.attribute("/get_hint", study_data['usage_key'], f"client:{client}"):
+        return {'hint': await run_interactive(request.study_session_id, hint_for_current_card, study_data, client)}
+
+async def handle_study_message(study_session_id: str, message: dict, client: str) -> dict:
+    """Answer one message received on a study session WebSocket."""
+    # Look the session up per message: restarting a study session replaces it
+    study_data = get_study_session(study_session_id)
+    kind = message.get('type')
     
-    if not study_session_id or study_session_id not in sessions:
-        raise HTTPException(status_code=400, detail="Invalid study session")
+    if kind == 'question':
+        return {'type': 'question', **next_question(study_data)}
     
-    study_data = sessions[study_session_id]
-    current_q = study_data['current_question']
-    card = study_data['flashcards'][current_q]
+    # Reject answers and hint requests aimed at a question that was already
+    # answered, e.g. when a client resends after a dropped connection
+    question_number = message.get('question_number')
+    if question_number is not None and question_number != study_data['answered'] + 1:
+        raise HTTPException(status_code=409, detail="That question has already been answered")
     
-    # Get question and answer
-    if card['type'] == 'question_answer':
-        question = card['question']
-        correct_answer = card['answer']
-    elif card['type'] == 'vocabulary':
-        question = f"What is the definition of: {card['term']}?"
-        correct_answer = card['definition']
-    elif card['type'] == 'fact':
-        question = card['prompt']
-        correct_answer = card['content']
+    if kind == 'answer':
+        with usage.attribute("/ws/study", study_data['usage_key'], f"client:{client}"):
+            result = await submit_study_answer(study_session_id, study_data, str(message.get('answer', '')), client)
+        # Push the next question in the same frame to save a round trip
+        return {'type': 'result', **result, 'next': next_question(study_data, prefetch=True)}
+    elif kind == 'hint':
+        check_not_grading(study_data)
+        with usage.attribute("/ws/study", study_data['usage_key'], f"client:{client}"):
+            hint = await run_interactive(study_session_id, hint_for_current_card, study_data, client)
+        return {'type': 'hint', 'hint': hint}
+    
+    raise HTTPException(status_code=400, detail=f"Unknown message type: {kind}")
+
+@app.websocket("/ws/study/{study_session_id}")
+async def study_session_socket(websocket: WebSocket, study_session_id: str):
+    """Study session channel: one connection per session, one reply frame per message.
     
-    hint = generate_hint(question, correct_answer)
+    The current question is pushed on every connect, so a client that
+    reconnects resumes exactly where the session left off.
+    """
+    await websocket.accept()
+    client = client_address(websocket)
+    try:
+        current = next_question(get_study_session(study_session_id))
+    except HTTPException as e:
+        await websocket.send_json({'type': 'error', 'detail': e.detail})
+        await websocket.close(code=1008)
+        return
     
-    return {'hint': hint}
+    try:
+        await websocket.send_json({'type': 'question', **current})
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                reply = await handle_study_message(study_session_id, json.loads(raw), client)
+            except HTTPException as e:
+                reply = {'type': 'error', 'status': e.status_code, 'detail': e.detail}
+                if e.headers and 'Retry-After' in e.headers:
+                    reply['retry_after'] = int(e.headers['Retry-After'])
+            except (ValueError, AttributeError):
+                reply = {'type': 'error', 'status': 400, 'detail': "Messages must be JSON objects"}
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
 
 @app.post("/create_session_from_flashcards")
 async def create_session_from_flashcards(request: FlashcardsRequest):
@@ -391,43 +827,128 @@ async def get_filters(session_id: str):
 
 @app.post("/filter_flashcards")
 async def filter_flashcards(request: dict):
-    """Filter flashcards based on criteria."""
+    """Filter flashcards based on criteria.
+    
+    Returns the matching card ids (positions in the session's deck); pass
+    "include_cards": true to get the cards as well.
+    """
+    session_id = request.get('session_id')
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
     try:
-        session_id = request.get('session_id')
-        filters = request.get('filters', {})
-        
-        if session_id not in sessions:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
+        filters = request.get('filters') or {}
         flashcards = sessions[session_id]['flashcards']
-        filtered_flashcards = []
-        
-        for card in flashcards:
-            # Check category filter
-            if filters.get('category') and filters['category'] != 'all':
-                if card.get('category', 'General') != filters['category']:
-                    continue
-            
-            # Check difficulty filter
-            if filters.get('difficulty') and filters['difficulty'] != 'all':
-                if card.get('difficulty', 'medium') != filters['difficulty']:
-                    continue
-            
-            # Check type filter
-            if filters.get('type') and filters['type'] != 'all':
-                if card.get('type', 'question_answer') != filters['type']:
-                    continue
-            
-            filtered_flashcards.append(card)
+        ids = [card_id for card_id, card in enumerate(flashcards) if card_matches(card, filters)]
         
-        return {
-            'flashcards': filtered_flashcards,
-            'count': len(filtered_flashcards),
+        response = {
+            'ids': ids,
+            'count': len(ids),
             'total': len(flashcards)
         }
+        if request.get('include_cards'):
+            response['flashcards'] = [flashcards[card_id] for card_id in ids]
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error filtering flashcards: {str(e)}")
 
+@app.get("/sessions/{session_id}/flashcards")
+async def get_session_flashcards(session_id: str, cursor: Optional[str] = None, limit: int = DECK_PAGE_SIZE):
+    """Page through a session's deck.
+    
+    Each card carries its 'id', its position in the deck. Pass the returned
+    'next_cursor' to get the following page; it is null on the last page.
+    """
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if start < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not 1 <= limit <= MAX_DECK_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DECK_PAGE_SIZE}")
+    
+    flashcards = sessions[session_id]['flashcards']
+    end = min(start + limit, len(flashcards))
+    return {
+        'flashcards': [{**flashcards[card_id], 'id': card_id} for card_id in range(start, end)],
+        'next_cursor': str(end) if end < len(flashcards) else None,
+        'total': len(flashcards)
+    }
+
+@app.get("/library/search")
+def search_library(q: str, page: int = 1, page_size: int = 20):
+    """Full-text search over every deck in the library, ranked by relevance.
+    
+    A plain function, so the SQLite query runs on the threadpool rather than the event loop.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    try:
+        return get_library().search(q, page=page, page_size=page_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching library: {str(e)}")
+
+@app.post("/library/start_session")
+def start_session_from_library(request: LibrarySessionRequest):
+    """Create a flashcard session from a library search and start studying it (on the threadpool, like search)."""
+    try:
+        flashcards = get_library().search_cards(request.query, LIBRARY_SESSION_MAX_CARDS)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching library: {str(e)}")
+    
+    if not flashcards:
+        raise HTTPException(status_code=404, detail=f"No flashcards match '{request.query}'")
+    
+    session_id = str(uuid.uuid4())
+    sessions[session_id] = {
+        'flashcards': flashcards,
+        'study_session': None
+    }
+    
+    study_session = create_study_session(session_id, request.num_questions, request.multiple_choice)
+    return {
+        'session_id': session_id,
+        'flashcard_count': len(flashcards),
+        **study_session
+    }
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profile(request: ProfileRequest):
+    """Sample the stacks of all threads while the next N requests run."""
+    if not 1 <= request.requests <= MAX_PROFILED_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"requests must be between 1 and {MAX_PROFILED_REQUESTS}")
+    profiler.arm(request.requests)
+    return {'armed': request.requests}
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def get_profile(limit: int = 40):
+    """Aggregated profile of the requests sampled since the last arm."""
+    return profiler.report(limit)
+
+@app.get("/admin/analytics", dependencies=[Depends(require_admin)])
+def get_analytics(min_attempts: int = 5, top: int = 20, days: Optional[int] = None):
+    """Accuracy per category and difficulty label, the hardest cards and the cards whose label does not fit.
+    
+    Covers every recorded attempt, or those of the last ``days`` days. A
+    plain function, so the aggregation runs on the threadpool.
+    """
+    import attempts
+    
+    since = time.time() - days * 86400 if days else None
+    return attempts.get_store().analytics(max(1, min_attempts), max(1, min(top, 1000)), since)
+
+@app.get("/admin/usage", dependencies=[Depends(require_admin)])
+async def get_usage(day: Optional[str] = None, top: int = 20):
+    """Claude tokens and estimated cost for a UTC day (YYYY-MM-DD, default today).
+    
+    Broken down per endpoint, with the ``top`` study sessions and clients by tokens.
+    """
+    report = usage.LEDGER.report(day, top=max(1, min(top, 1000)))
+    report['budgets'] = {'session_tokens_per_day': SESSION_TOKEN_BUDGET, 'client_tokens_per_day': CLIENT_TOKEN_BUDGET}
+    return report
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
@@ -0,0 +1,310 @@
+"""
+Columnar store of study attempts and the card analytics computed from it.
+
+Every graded answer is one row: card, study session, time, answer latency and
+whether it was correct, hinted or skipped. Rows are kept as one NumPy array
+per column, 19 bytes an attempt. New rows fill a fixed-size in-memory block;
+a full block is appended to one raw file per column under ATTEMPTS_PATH and
+the files are read back as memory maps, so millions of attempts cost page
+cache rather than heap. With no path the blocks stay in memory.
+
+Cards and sessions are stored as small integer IDs. The key, category,
+difficulty label and question of each card live in ``cards.jsonl``, and the
+session IDs in ``sessions.txt``, both appended at the same time as the
+columns. A crash loses at most the unspilled block.
+
+analytics() aggregates with np.bincount, first per card and then from the
+card totals per category and difficulty label. It is linear in the number of
+attempts and has no Python loop over them.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+COLUMNS = {
+    'card': np.uint32,
+    'session': np.uint32,
+    'time': np.uint32,
+    'latency_ms': np.uint32,
+    'correct': np.uint8,
+    'hint': np.uint8,
+    'skipped': np.uint8,
+}
+BLOCK_SIZE = 65_536
+DIFFICULTIES = ('easy', 'medium', 'hard')
+UNLABELLED = len(DIFFICULTIES)
+# A card answered correctly this often plays as easy, below HARD_ACCURACY as hard
+EASY_ACCURACY = 0.8
+HARD_ACCURACY = 0.5
+
+def card_identity(card, question, answer):
+    """The card's ``card_key``, or a hash of its question and answer for decks without one."""
+    if card.get('card_key'):
+        return card['card_key']
+    return hashlib.sha256(f"{question}\0{answer}".encode('utf-8')).hexdigest()[:16]
+
+def observed_difficulty(accuracy):
+    """Difficulty codes (indexes into DIFFICULTIES) that match the observed accuracy."""
+    return np.where(accuracy >= EASY_ACCURACY, 0, np.where(accuracy >= HARD_ACCURACY, 1, 2))
+
+class AttemptStore:
+    """Append-only attempt columns with memory-mapped spill files.
+
+    Attempts are recorded from the worker threads that grade answers, so
+    appends take a lock; analytics copy the columns under it and aggregate
+    outside it.
+    """
+
+    def __init__(self, path=None, block_size=BLOCK_SIZE):
+        self.path = Path(path) if path else None
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self.card_ids = {}
+        self.card_keys = []
+        self.card_category = []
+        self.card_difficulty = []
+        self.card_questions = []
+        self.categories = {}
+        self.session_ids = {}
+        self.session_keys = []
+        self.block = {name: np.empty(block_size, dtype) for name, dtype in COLUMNS.items()}
+        self.size = 0
+        self.spilled = {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        # Cards and sessions already written to disk
+        self._saved_cards = 0
+        self._saved_sessions = 0
+        if self.path and self.path.exists():
+            self._load()
+
+    def __len__(self):
+        return len(self.spilled['card']) + self.size
+
+    def _load(self):
+        cards_path = self.path / 'cards.jsonl'
+        if cards_path.exists():
+            with open(cards_path, encoding='utf-8') as cards:
+                for line in cards:
+                    card = json.loads(line)
+                    self._add_card(card['key'], card['category'], card['difficulty'], card['question'])
+        sessions_path = self.path / 'sessions.txt'
+        if sessions_path.exists():
+            for session in sessions_path.read_text(encoding='utf-8').splitlines():
+                self._session_id(session)
+        self._saved_cards = len(self.card_keys)
+        self._saved_sessions = len(self.session_keys)
+        self._map_columns()
+
+    def _map_columns(self):
+        sizes = {}
+        for name, dtype in COLUMNS.items():
+            column_path = self.path / f"{name}.bin"
+            sizes[name] = column_path.stat().st_size // np.dtype(dtype).itemsize if column_path.exists() else 0
+        # A spill interrupted part way leaves some columns longer than others
+        rows = min(sizes.values())
+        for name, dtype in COLUMNS.items():
+            if rows:
+                self.spilled[name] = np.memmap(self.path / f"{name}.bin", dtype=dtype, mode='r', shape=(rows,))
+            else:
+                self.spilled[name] = np.empty(0, dtype)
+
+    def _add_card(self, key, category, difficulty, question):
+        category_id = self.categories.setdefault(category, len(self.categories))
+        difficulty = str(difficulty).strip().lower()
+        self.card_ids[key] = len(self.card_keys)
+        self.card_keys.append(key)
+        self.card_category.append(category_id)
+        self.card_difficulty.append(DIFFICULTIES.index(difficulty) if difficulty in DIFFICULTIES else UNLABELLED)
+        self.card_questions.append(question)
+        return self.card_ids[key]
+
+    def _session_id(self, session):
+        session_id = self.session_ids.get(session)
+        if session_id is None:
+            session_id = self.session_ids[session] = len(self.session_keys)
+            self.session_keys.append(session)
+        return session_id
+
+    def record(self, key, card, question, session, correct, latency, hint=False, skipped=False, now=None):
+        """Append one attempt at the card identified by ``key``; ``latency`` is in seconds."""
+        now = time.time() if now is None else now
+        with self._lock:
+            card_id = self.card_ids.get(key)
+            if card_id is None:
+                card_id = self._add_card(key, card.get('category', 'General'), card.get('difficulty', ''),
+                                         str(question)[:200])
+            row = self.size
+            self.block['card'][row] = card_id
+            self.block['session'][row] = self._session_id(session)
+            self.block['time'][row] = int(now)
+            self.block['latency_ms'][row] = min(max(0, int(latency * 1000)), 2**32 - 1)
+            self.block['correct'][row] = bool(correct)
+            self.block['hint'][row] = bool(hint)
+            self.block['skipped'][row] = bool(skipped)
+            self.size += 1
+            if self.size == self.block_size:
+                self._spill()
+
+    def flush(self):
+        """Write out the attempts still in the in-memory block."""
+        with self._lock:
+            if self.size:
+                self._spill()
+
+    def _spill(self):
+        if self.path is None:
+            for name in COLUMNS:
+                self.spilled[name] = np.concatenate([self.spilled[name], self.block[name][:self.size]])
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Keys first, so every ID in the columns on disk can be resolved
+            category_names = self._category_names()
+            with open(self.path / 'cards.jsonl', 'a', encoding='utf-8') as cards:
+                for card_id in range(self._saved_cards, len(self.card_keys)):
+                    cards.write(json.dumps({
+                        'key': self.card_keys[card_id],
+                        'category': category_names[self.card_category[card_id]],
+                        'difficulty': (DIFFICULTIES + ('',))[self.card_difficulty[card_id]],
+                        'question': self.card_questions[card_id],
+                    }, ensure_ascii=False) + '\n')
+            with open(self.path / 'sessions.txt', 'a', encoding='utf-8') as sessions:
+                sessions.writelines(f"{session}\n" for session in self.session_keys[self._saved_sessions:])
+            self._saved_cards = len(self.card_keys)
+            self._saved_sessions = len(self.session_keys)
+            for name in COLUMNS:
+                with open(self.path / f"{name}.bin", 'ab') as column:
+                    self.block[name][:self.size].tofile(column)
+            self._map_columns()
+        self.size = 0
+
+    def _category_names(self):
+        names = [''] * len(self.categories)
+        for name, category_id in self.categories.items():
+            names[category_id] = name
+        return names
+
+    def columns(self, since=None):
+        """A copy of every column, optionally only the attempts made at or after ``since``."""
+        with self._lock:
+            columns = {name: np.concatenate([self.spilled[name], self.block[name][:self.size]]) for name in COLUMNS}
+        if since is not None:
+            keep = columns['time'] >= since
+            columns = {name: values[keep] for name, values in columns.items()}
+        return columns
+
+    def analytics(self, min_attempts=5, top=20, since=None):
+        """Accuracy per card, category and difficulty label, and the cards whose label does not fit.
+
+        Only cards with at least ``min_attempts`` attempts are ranked or
+        calibrated. A skipped answer counts as an incorrect attempt.
+        """
+        columns = self.columns(since)
+        with self._lock:
+            card_category = np.array(self.card_category, dtype=np.int64)
+            card_difficulty = np.array(self.card_difficulty, dtype=np.int64)
+            category_names = self._category_names()
+            card_keys = list(self.card_keys)
+            card_questions = list(self.card_questions)
+        cards = len(card_keys)
+
+        card = columns['card']
+        attempts = np.bincount(card, minlength=cards)
+        correct = np.bincount(card, weights=columns['correct'], minlength=cards)
+        hints = np.bincount(card, weights=columns['hint'], minlength=cards)
+        skips = np.bincount(card, weights=columns['skipped'], minlength=cards)
+        latency = np.bincount(card, weights=columns['latency_ms'], minlength=cards)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            accuracy = correct / attempts
+        ranked = attempts >= max(1, min_attempts)
+        observed = observed_difficulty(accuracy)
+
+        def rate(numerator, denominator):
+            return round(float(numerator) / float(denominator), 4) if denominator else None
+
+        def describe_card(card_id):
+            labelled = card_difficulty[card_id]
+            return {
+                'card_key': card_keys[card_id],
+                'question': card_questions[card_id],
+                'category': category_names[card_category[card_id]],
+                'difficulty': DIFFICULTIES[labelled] if labelled != UNLABELLED else None,
+                'observed_difficulty': DIFFICULTIES[observed[card_id]],
+                'attempts': int(attempts[card_id]),
+                'accuracy': rate(correct[card_id], attempts[card_id]),
+                'hint_rate': rate(hints[card_id], attempts[card_id]),
+                'skip_rate': rate(skips[card_id], attempts[card_id]),
+                'mean_latency_ms': rate(latency[card_id], attempts[card_id]),
+            }
+
+        # Per category, from the per-card totals
+        category_count = len(category_names)
+        category_rows = []
+        totals = [np.bincount(card_category, weights=values, minlength=category_count)
+                  for values in (attempts, correct, hints, latency)]
+        for category_id in np.flatnonzero(totals[0]):
+            category_rows.append({
+                'category': category_names[category_id],
+                'attempts': int(totals[0][category_id]),
+                'accuracy': rate(totals[1][category_id], totals[0][category_id]),
+                'hint_rate': rate(totals[2][category_id], totals[0][category_id]),
+                'mean_latency_ms': rate(totals[3][category_id], totals[0][category_id]),
+            })
+        category_rows.sort(key=lambda row: row['accuracy'])
+
+        # Per difficulty label: how the labelled cards actually played
+        labels = len(DIFFICULTIES) + 1
+        label_attempts = np.bincount(card_difficulty, weights=attempts, minlength=labels)
+        label_correct = np.bincount(card_difficulty, weights=correct, minlength=labels)
+        played = np.bincount(card_difficulty[ranked] * len(DIFFICULTIES) + observed[ranked],
+                             minlength=labels * len(DIFFICULTIES)).reshape(labels, len(DIFFICULTIES))
+        calibration = []
+        for label in range(labels):
+            if not label_attempts[label]:
+                continue
+            calibration.append({
+                'difficulty': DIFFICULTIES[label] if label != UNLABELLED else None,
+                'attempts': int(label_attempts[label]),
+                'accuracy': rate(label_correct[label], label_attempts[label]),
+                'cards_played_as': dict(zip(DIFFICULTIES, played[label].tolist())),
+            })
+
+        # Hardest cards first; mislabelled cards by how far off the label is, then by evidence
+        candidates = np.flatnonzero(ranked)
+        hardest = candidates[np.lexsort((-attempts[candidates], accuracy[candidates]))][:top]
+        labelled = candidates[card_difficulty[candidates] != UNLABELLED]
+        gap = np.abs(observed[labelled] - card_difficulty[labelled])
+        mislabelled = labelled[gap > 0]
+        mislabelled = mislabelled[np.lexsort((-attempts[mislabelled], -gap[gap > 0]))][:top]
+
+        total = len(card)
+        return {
+            'attempts': total,
+            'sessions': int(np.count_nonzero(np.bincount(columns['session']))),
+            'cards': int(np.count_nonzero(attempts)),
+            'accuracy': rate(columns['correct'].sum(dtype=np.int64), total),
+            'categories': category_rows,
+            'difficulty': calibration,
+            'hardest_cards': [describe_card(card_id) for card_id in hardest],
+            'mislabelled_cards': [describe_card(card_id) for card_id in mislabelled],
+            'thresholds': {'min_attempts': min_attempts, 'easy_accuracy': EASY_ACCURACY, 'hard_accuracy': HARD_ACCURACY},
+        }
+
+# Created on first use by get_store(); tests may assign a stand-in
+STORE = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the process-wide attempt store, loading ATTEMPTS_PATH on first use."""
+    global STORE
+    with _store_lock:
+        if STORE is None:
+            STORE = AttemptStore(os.getenv("ATTEMPTS_PATH", "attempts") or None)
+            # Spill the last partial block when the server stops
+            atexit.register(STORE.flush)
+        return STORE
@@ -0,0 +1,147 @@
+"""
+Batch generation of one deck per document, resumable through a manifest.
+
+The manifest (``manifest.json`` in the output directory) records the content
+hash, status and output of every input. It is rewritten after each document
+finishes, so an interrupted run picks up where it stopped, and a rerun skips
+documents whose content has not changed since their deck was written.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.doc'}
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+def collect_inputs(source):
+    """Return the documents named by ``source``: a directory (searched
+    recursively) or a text file listing one path per line."""
+    source = Path(source)
+    if source.is_dir():
+        paths = [path for path in source.rglob('*') if path.suffix.lower() in SUPPORTED_EXTENSIONS]
+    else:
+        paths = []
+        for line in source.read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                path = Path(line)
+                paths.append(path if path.is_absolute() else source.parent / path)
+    return sorted({path.resolve() for path in paths})
+
+def input_base(source):
+    """The directory manifest keys and output paths are relative to: the
+    source directory itself, or the folder holding the list file. It does not
+    depend on which files a run finds, so keys stay the same between runs."""
+    source = Path(source).resolve()
+    return source if source.is_dir() else source.parent
+
+def document_key(path, base):
+    """``path`` relative to ``base``; a listed file outside it keeps its full path."""
+    try:
+        return path.relative_to(base).as_posix()
+    except ValueError:
+        return Path(*path.parts[1:]).as_posix()
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BatchManifest:
+    """Per-input progress, persisted atomically after every update."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.entries = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                if data.get('version') == MANIFEST_VERSION:
+                    self.entries = data.get('files', {})
+            except (OSError, ValueError):
+                # A damaged manifest only costs a full rerun
+                self.entries = {}
+
+    def is_current(self, key, digest, output_dir):
+        entry = self.entries.get(key)
+        return (
+            entry is not None
+            and entry.get('status') == 'done'
+            and entry.get('sha256') == digest
+            and (Path(output_dir) / entry['output']).exists()
+        )
+
+    def record(self, key, **fields):
+        with self._lock:
+            self.entries[key] = {**fields, 'updated': time.time()}
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            tmp_path.write_text(json.dumps({'version': MANIFEST_VERSION, 'files': self.entries}, indent=2),
+                                encoding='utf-8')
+            os.replace(tmp_path, self.path)
+
+def process_document(path, key, output_dir, manifest, extract, generate, force=False, on_deck=None):
+    """Generate and save the deck for one document. Returns (status, detail)."""
+    digest = file_hash(path)
+    if not force and manifest.is_current(key, digest, output_dir):
+        return 'skipped', manifest.entries[key]['output']
+
+    output = Path(key).with_suffix('').as_posix() + '_flashcards.json'
+    try:
+        text = extract(path)
+        if not text:
+            raise ValueError('No text extracted')
+        deck = generate(text)
+        if not deck or not deck.get('flashcards'):
+            raise ValueError('No flashcards generated')
+        output_path = Path(output_dir) / output
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as file:
+            json.dump(deck, file, indent=2, ensure_ascii=False)
+        if on_deck is not None:
+            on_deck(output_path, deck['flashcards'])
+    except Exception as e:
+        manifest.record(key, sha256=digest, status='failed', error=str(e) or type(e).__name__)
+        return 'failed', str(e) or type(e).__name__
+
+    manifest.record(key, sha256=digest, status='done', output=output, cards=len(deck['flashcards']))
+    return 'done', f"{len(deck['flashcards'])} cards -> {output}"
+
+def run_batch(paths, output_dir, extract, generate, workers=4, force=False, on_deck=None, report=print, base=None):
+    """Process ``paths`` on a pool of ``workers`` threads.
+
+    ``extract`` turns a path into text and ``generate`` turns text into a deck
+    dict; Claude concurrency is bounded inside ``generate`` itself. Manifest
+    keys are relative to ``base`` (see input_base(); default the current
+    directory). Returns a {'done', 'skipped', 'failed'} count.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = BatchManifest(output_dir / MANIFEST_NAME)
+    base = Path(base or '.').resolve()
+
+    counts = {'done': 0, 'skipped': 0, 'failed': 0}
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(process_document, path, document_key(path, base), output_dir, manifest,
+                            extract, generate, force, on_deck): path
+            for path in paths
+        }
+        for number, future in enumerate(as_completed(futures), start=1):
+            status, detail = future.result()
+            counts[status] += 1
+            report(f"[{number}/{len(paths)}] {status:7} {document_key(futures[future], base)}: {detail}")
+    except KeyboardInterrupt:
+        # Finished documents are already in the manifest; the next run resumes
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return counts
@@ -0,0 +1,144 @@
+"""
+Deterministic benchmark fixtures: PDF and DOCX documents of any page count,
+HTML pages, and a local HTTP server to serve them.
+
+Fixtures are generated on first use and cached under benchmarks/.fixtures, so
+repeated runs measure extraction rather than fixture generation.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURE_DIR = Path(__file__).parent / '.fixtures'
+
+WORDS = (
+    "neural network model training data learning algorithm clinical patient diagnosis "
+    "imaging accuracy bias regulation privacy workflow outcome prediction support decision "
+    "system hospital record treatment risk evaluation dataset validation feature signal"
+).split()
+
+LINES_PER_PAGE = 40
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def page_lines(rng, page_number, title="Benchmark Notes"):
+    """Lines for one page, with the running header and footer real notes carry."""
+    lines = [f"{title} - Chapter {page_number // 10 + 1}"]
+    lines.extend(sentence(rng) for _ in range(LINES_PER_PAGE - 2))
+    lines.append(f"Page {page_number}")
+    return lines
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def write_pdf(path, pages, seed=0):
+    """Write pdf_bytes(pages, seed) to ``path``."""
+    Path(path).write_bytes(pdf_bytes(pages, seed))
+
+def pdf_bytes(pages, seed=0):
+    """Return a text-only PDF with ``pages`` pages; each seed gives different text.
+
+    The file is assembled by hand (one content stream per page, a shared
+    Helvetica font and an xref table) so no PDF writer dependency is needed.
+    """
+    rng = random.Random(seed)
+    # Object 1: catalog, 2: page tree, 3: font, then a page/content pair per page
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for number in range(1, pages + 1):
+        text = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in page_lines(rng, number):
+            text.append(f"({_pdf_escape(line)}) Tj T*")
+        text.append("ET")
+        stream = '\n'.join(text).encode('latin-1')
+        page_id = len(objects) + 1
+        content_id = page_id + 1
+        page_ids.append(page_id)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode('latin-1')
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode('latin-1')
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+def write_docx(path, pages, seed=0):
+    """Write a DOCX with ``pages`` page-break-separated pages and a small table."""
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+
+    rng = random.Random(seed)
+    document = Document()
+    for number in range(1, pages + 1):
+        for line in page_lines(rng, number):
+            document.add_paragraph(line)
+        document.paragraphs[-1].add_run().add_break(WD_BREAK.PAGE)
+    table = document.add_table(rows=5, cols=2)
+    for row in table.rows:
+        row.cells[0].text = rng.choice(WORDS)
+        row.cells[1].text = sentence(rng, 6)
+    document.save(path)
+
+def write_html(path, paragraphs, seed=0):
+    """Write an article page wrapped in the navigation and scripts real sites have."""
+    rng = random.Random(seed)
+    nav = ''.join(f'<li><a href="/{word}">{word}</a></li>' for word in WORDS)
+    body = '\n'.join(f"<p>{sentence(rng, 30)}</p>" for _ in range(paragraphs))
+    Path(path).write_text(
+        "<!DOCTYPE html><html><head><title>Benchmark Article</title>"
+        "<style>body { font-family: sans-serif; }</style>"
+        "<script>var analytics = {};</script></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<div class=\"sidebar\"><ul>{nav}</ul></div>"
+        f"<article><h1>Benchmark Article</h1>\n{body}\n</article>"
+        "<footer><p>Copyright footer text</p></footer>"
+        "<script>analytics.track('view');</script></body></html>",
+        encoding='utf-8',
+    )
+
+def fixture(kind, size):
+    """Return the path of a cached fixture, generating it if needed.
+
+    ``kind`` is 'pdf' or 'docx' (``size`` pages) or 'html' (``size`` paragraphs).
+    """
+    FIXTURE_DIR.mkdir(exist_ok=True)
+    path = FIXTURE_DIR / f"{kind}_{size}.{kind}"
+    if not path.exists():
+        writer = {'pdf': write_pdf, 'docx': write_docx, 'html': write_html}[kind]
+        writer(path, size)
+    return path
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+@contextmanager
+def serve_directory(directory=None):
+    """Serve ``directory`` on a local port, yielding the base URL."""
+    directory = directory or FIXTURE_DIR
+    Path(directory).mkdir(exist_ok=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Concurrent study-session load test.
+
+Drives N virtual students through upload -> start_session -> (get_question ->
+get_hint -> submit_answer) x questions against a running app, ramping N up
+stage by stage. Each stage reports throughput and per-route p50/p95/p99
+latency and error rates.
+
+Every upload is a different document. Identical uploads are coalesced and
+their chunks reused from the deck library, so a shared PDF would reach
+Claude once and the harness would no longer measure generation under load.
+Each student gets its own generated PDF, from seeds that are new on every
+run, so a long-running --url server does not reuse earlier runs' decks either.
+
+Usage:
+    python -m benchmarks.loadtest --launch --llm-latency 800 --students 1,10,50
+    python -m benchmarks.loadtest --url http://127.0.0.1:8001 --students 5,25
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.fixtures import pdf_bytes
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+class Recorder:
+    """Collects latency samples and errors per route for one stage."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def request(self, client, route, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors.setdefault(route, []).append(type(e).__name__)
+            return None
+        finally:
+            self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors.setdefault(route, []).append(str(response.status_code))
+            return None
+        return response.json()
+
+    def summary(self, elapsed):
+        routes = {}
+        for route, samples in self.latencies.items():
+            ordered = sorted(samples)
+            errors = self.errors.get(route, [])
+            routes[route] = {
+                'requests': len(ordered),
+                'errors': len(errors),
+                'error_rate': round(len(errors) / len(ordered), 4),
+                'error_kinds': sorted(set(errors)),
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 1),
+            }
+        total = sum(route['requests'] for route in routes.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+            'errors': sum(route['errors'] for route in routes.values()),
+            'routes': routes,
+        }
+
+async def student(client, recorder, number, document, questions, hint_rate, think_time, rng):
+    """One virtual student working through a full session."""
+    upload = await recorder.request(
+        client, 'POST /upload', 'POST', '/upload',
+        files={'file': (f"notes-{number}.pdf", document, 'application/pdf')},
+    )
+    if upload is None:
+        return
+    started = await recorder.request(
+        client, 'POST /start_session', 'POST', '/start_session',
+        json={'session_id': upload['session_id'], 'num_questions': questions},
+    )
+    if started is None:
+        return
+    body = {'study_session_id': started['study_session_id']}
+    for _ in range(questions):
+        question = await recorder.request(client, 'POST /get_question', 'POST', '/get_question', json=body)
+        if question is None or question.get('complete'):
+            return
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        if rng.random() < hint_rate:
+            await recorder.request(client, 'POST /get_hint', 'POST', '/get_hint', json=body)
+        await recorder.request(client, 'POST /submit_answer', 'POST', '/submit_answer',
+                               json={**body, 'answer': 'my best answer'})
+
+async def run_stage(base_url, students, args, documents):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=students, max_keepalive_connections=students)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            student(client, recorder, number, documents[number], args.questions, args.hint_rate, args.think_time,
+                    random.Random(number))
+            for number in range(students)
+        ))
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed)
+
+def print_stage(students, summary):
+    print(f"\n== {students} students: {summary['requests']} requests in {summary['elapsed_s']}s, "
+          f"{summary['throughput_rps']} req/s, {summary['errors']} errors")
+    print(f"{'route':22} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in summary['routes'].items():
+        print(f"{route:22} {stats['requests']:>9} {stats['errors']:>7} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def launch_stub_server(llm_latency):
+    """Start benchmarks.stub_server in a subprocess and wait until it answers /health."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.stub_server', '--port', str(port), '--llm-latency', str(llm_latency)],
+        cwd=Path(__file__).parent.parent,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Stub server exited during startup")
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Stub server did not start within 30s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='base URL of a running app')
+    parser.add_argument('--launch', action='store_true', help='start a stub-LLM server instead of using --url')
+    parser.add_argument('--llm-latency', type=float, default=800.0, help='stub Claude latency in ms (with --launch)')
+    parser.add_argument('--students', default='1,5,10,25,50', help='comma-separated concurrency stages')
+    parser.add_argument('--questions', type=int, default=5, help='questions per student')
+    parser.add_argument('--hint-rate', type=float, default=0.3, help='fraction of questions that ask for a hint')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean seconds a student thinks per question')
+    parser.add_argument('--pages', type=int, default=10, help='pages in the uploaded PDF')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in seconds')
+    parser.add_argument('--json', type=Path, help='also write the results to this file')
+    args = parser.parse_args()
+
+    if not args.url and not args.launch:
+        parser.error('pass --url for a running app or --launch to start a stub server')
+
+    process = None
+    base_url = args.url
+    if args.launch:
+        process, base_url = launch_stub_server(args.llm_latency)
+    try:
+        seeds = itertools.count(random.SystemRandom().randrange(1 << 32))
+        results = []
+        for students in (int(value) for value in args.students.split(',')):
+            # Built before the stage starts, so only the requests are timed
+            documents = [pdf_bytes(args.pages, seed=next(seeds)) for _ in range(students)]
+            summary = asyncio.run(run_stage(base_url, students, args, documents))
+            print_stage(students, summary)
+            results.append({'students': students, **summary})
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
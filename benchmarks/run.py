@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite.
+
+Measures cold-start time, text extraction throughput, flashcard JSON parsing
+(including the repair fallbacks), per-endpoint latency and attempt analytics
+with no network access: Claude is
+replaced by a stub that replays recorded responses, documents are generated
+fixtures, and URLs are served from a local HTTP server.
+
+Usage:
+    python -m benchmarks.run                 # full run, compared with the stored baseline
+    python -m benchmarks.run --quick         # smaller fixtures and fewer repeats
+    python -m benchmarks.run --save-baseline # record this run as the new baseline
+    python -m benchmarks.run --llm-latency 800 --only endpoint
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fixtures import fixture, serve_directory
+from benchmarks.stub_claude import StubAnthropic, load_recordings, repair_variants
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_THRESHOLD = 1.5
+
+def measure(fn, repeat, warmup=1):
+    """Call ``fn`` ``warmup`` + ``repeat`` times and return the timed samples in seconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples, units=None, unit_name=None):
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    result = {
+        'runs': len(ordered),
+        'median_ms': round(median * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3),
+    }
+    if units:
+        result['throughput'] = round(units / median, 1)
+        result['unit'] = f"{unit_name}/s"
+    return result
+
+# Each command runs in a fresh interpreter, without an API key, the way a cold
+# start on Render or a `python main.py study ...` invocation would
+STARTUP_COMMANDS = {
+    'startup.import_main': ['-c', 'import main'],
+    'startup.import_app': ['-c', 'import app'],
+    'startup.cli_usage': ['main.py'],
+}
+
+def startup_cases(repeat):
+    env = {key: value for key, value in os.environ.items() if key != 'CLAUDE_API_KEY'}
+    results = {}
+    for name, command in STARTUP_COMMANDS.items():
+        run = lambda: subprocess.run([sys.executable, *command], cwd=REPO_ROOT, env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        results[name] = summarize(measure(run, repeat))
+    return results
+
+def extraction_cases(main, sizes, repeat):
+    results = {}
+    for kind, extract in (('pdf', main.extract_text_from_pdf), ('docx', main.extract_text_from_docx)):
+        for pages in sizes:
+            path = fixture(kind, pages)
+            runs = max(1, repeat * 10 // pages)
+            results[f"extract.{kind}.{pages}"] = summarize(measure(lambda: extract(path), runs), pages, 'pages')
+
+    with serve_directory() as base_url:
+        for paragraphs in (50, 2000):
+            path = fixture('html', paragraphs)
+            url = f"{base_url}/{path.name}"
+            kilobytes = path.stat().st_size / 1024
+            results[f"extract.url.{paragraphs}p"] = summarize(
+                measure(lambda: main.extract_text_from_url(url), repeat), kilobytes, 'KB'
+            )
+    return results
+
+def parse_cases(main, repeat):
+    results = {}
+    for name, text in repair_variants(load_recordings()['generate']).items():
+        results[f"parse.{name}"] = summarize(measure(lambda: main.parse_flashcards_response(text), repeat * 10))
+    text = main.extract_text_from_pdf(fixture('pdf', 10))
+    results['generate.end_to_end'] = summarize(measure(lambda: main.generate_flashcards(text), repeat))
+    return results
+
+def endpoint_cases(app_module, repeat):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app_module.app)
+    results = {}
+
+    def timed(samples_name, method, path, **kwargs):
+        start = time.perf_counter()
+        response = client.request(method, path, **kwargs)
+        samples.setdefault(samples_name, []).append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    samples = {}
+    pdf_bytes = fixture('pdf', 10).read_bytes()
+    flashcards = json.loads(load_recordings()['generate'])['flashcards'] * 20
+    with serve_directory() as base_url:
+        url = f"{base_url}/{fixture('html', 50).name}"
+        for _ in range(repeat):
+            timed('POST /upload', 'POST', '/upload', files={'file': ('notes.pdf', pdf_bytes, 'application/pdf')})
+            timed('POST /generate-from-url', 'POST', '/generate-from-url', json={'url': url})
+
+    session_id = timed('POST /create_session_from_flashcards', 'POST', '/create_session_from_flashcards',
+                       json={'flashcards': flashcards}).json()['session_id']
+    study_session_id = timed('POST /start_session', 'POST', '/start_session',
+                             json={'session_id': session_id, 'num_questions': repeat * 10}).json()['study_session_id']
+    body = {'study_session_id': study_session_id}
+    for _ in range(repeat * 10):
+        timed('POST /get_question', 'POST', '/get_question', json=body)
+        timed('POST /get_hint', 'POST', '/get_hint', json=body)
+        timed('POST /submit_answer', 'POST', '/submit_answer', json={**body, 'answer': 'an answer'})
+        timed('GET /library/search', 'GET', '/library/search', params={'q': 'neural network'})
+        timed('GET /metrics', 'GET', '/metrics')
+
+    for name, values in samples.items():
+        results[f"endpoint.{name}"] = summarize(values)
+    return results
+
+def analytics_cases(rows, repeat):
+    """Recording attempts one by one, and the card analytics over ``rows`` of them."""
+    import random
+
+    from attempts import AttemptStore
+
+    store = AttemptStore()
+    cards = [{'category': f"category {i % 40}", 'difficulty': ('easy', 'medium', 'hard')[i % 3]} for i in range(5000)]
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for row in range(rows):
+        card_id = rng.randrange(len(cards))
+        store.record(f"card-{card_id}", cards[card_id], f"Question {card_id}", f"session-{row // 20}",
+                     correct=rng.random() < 0.7, latency=rng.uniform(1, 30), hint=rng.random() < 0.1)
+    elapsed = time.perf_counter() - start
+    return {
+        'attempts.record': summarize([elapsed / rows]),
+        f"attempts.analytics.{rows}": summarize(measure(store.analytics, repeat), rows, 'attempts'),
+    }
+
+def compare(results, baseline, threshold):
+    """Print each case against the baseline and return the names that regressed."""
+    regressions = []
+    print(f"\n{'case':45} {'median ms':>11} {'p95 ms':>10} {'throughput':>16} {'vs base':>9}")
+    for name, result in results.items():
+        throughput = f"{result['throughput']} {result['unit']}" if 'throughput' in result else ''
+        previous = baseline.get('results', {}).get(name)
+        ratio = ''
+        if previous:
+            factor = result['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+            ratio = f"{factor:.2f}x"
+            if factor > threshold:
+                ratio += ' !'
+                regressions.append(name)
+        print(f"{name:45} {result['median_ms']:>11} {result['p95_ms']:>10} {throughput:>16} {ratio:>9}")
+    return regressions
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help='small fixtures and fewer repeats')
+    parser.add_argument('--repeat', type=int, default=None, help='timed runs per case')
+    parser.add_argument('--only', choices=('startup', 'extract', 'parse', 'endpoint', 'analytics'),
+                        help='run one group of cases')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='stub Claude latency in milliseconds')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='median slowdown factor that counts as a regression')
+    args = parser.parse_args()
+
+    repeat = args.repeat or (3 if args.quick else 10)
+    sizes = (10, 100) if args.quick else (10, 100, 1000)
+
+    results = {}
+    if args.only in (None, 'startup'):
+        results.update(startup_cases(repeat))
+
+    # Keep generated decks out of the real library
+    workdir = tempfile.mkdtemp(prefix='flashcards-bench-')
+    os.environ['DECK_LIBRARY_PATH'] = os.path.join(workdir, 'library.db')
+    os.environ['ATTEMPTS_PATH'] = os.path.join(workdir, 'attempts')
+    # Requests arrive back to back from one test client; quotas would only measure the 429 path
+    os.environ.setdefault('GENERATE_PER_MINUTE', '1000000')
+    os.environ.setdefault('GENERATE_BURST', '1000000')
+    os.environ.setdefault('INTERACTIVE_PER_SECOND', '1000000')
+    os.environ.setdefault('INTERACTIVE_BURST', '1000000')
+    # One client address generates every deck, so the daily token budgets are off too
+    os.environ.setdefault('CLIENT_TOKEN_BUDGET', '0')
+    os.environ.setdefault('SESSION_TOKEN_BUDGET', '0')
+    # Logs go to stderr; the parse repair cases warn on every run by design
+    os.environ.setdefault('LOG_LEVEL', 'error')
+
+    import main as main_module
+    import app as app_module
+    main_module.client = StubAnthropic(latency=args.llm_latency / 1000)
+
+    if args.only in (None, 'extract'):
+        results.update(extraction_cases(main_module, sizes, repeat))
+    if args.only in (None, 'parse'):
+        results.update(parse_cases(main_module, repeat))
+    if args.only in (None, 'endpoint'):
+        results.update(endpoint_cases(app_module, repeat))
+    if args.only in (None, 'analytics'):
+        results.update(analytics_cases(200_000 if args.quick else 2_000_000, repeat))
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('environment') != environment():
+            print(f"Note: baseline was recorded on {baseline.get('environment')}; timings may not be comparable")
+        if baseline.get('llm_latency_ms', 0.0) != args.llm_latency:
+            print("Note: baseline used a different --llm-latency")
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        saved = dict(results)
+        if args.only and args.baseline.exists():
+            # A partial run only replaces the cases it measured
+            saved = {**json.loads(args.baseline.read_text())['results'], **results}
+        args.baseline.write_text(json.dumps(
+            {'environment': environment(), 'llm_latency_ms': args.llm_latency, 'results': saved}, indent=2
+        ) + '\n')
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} case(s) slower than {args.threshold}x baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+A stand-in for ``anthropic.Anthropic`` that replays recorded responses.
+
+Only ``client.messages.create`` is implemented, which is all main.py uses.
+Each call sleeps for the configured latency and returns the recording for the
+call's purpose, which is recognised from the prompt the same way a reader would.
+A generation prompt made of several "[Section N]" chunks gets the recorded
+cards spread over its sections, as the real model tags them.
+"""
+import json
+import re
+import time
+from pathlib import Path
+
+RECORDINGS_DIR = Path(__file__).parent / 'recordings'
+
+def load_recordings(directory=RECORDINGS_DIR):
+    """Return {purpose: response text} for every ``<purpose>.txt`` recording."""
+    return {path.stem: path.read_text(encoding='utf-8') for path in Path(directory).glob('*.txt')}
+
+SECTION_HEADING = re.compile(r'^\s*\[Section (\d+)\]$', re.MULTILINE)
+
+def tag_sections(response_text, sections):
+    """Give the recorded cards 'section' numbers, spread evenly over ``sections``."""
+    data = json.loads(response_text[response_text.find('{'):response_text.rfind('}') + 1])
+    cards = data.get('flashcards', [])
+    for index, card in enumerate(cards):
+        card['section'] = index * sections // len(cards) + 1
+    return json.dumps(data)
+
+def purpose_of(prompt):
+    if 'create comprehensive flashcards' in prompt:
+        return 'generate'
+    if 'helpful hint' in prompt:
+        return 'hint'
+    return 'grade'
+
+class _Content:
+    def __init__(self, text):
+        self.text = text
+
+class _Usage:
+    def __init__(self, input_tokens, output_tokens):
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+class _Message:
+    def __init__(self, text, model, prompt):
+        self.content = [_Content(text)]
+        self.model = model
+        self.stop_reason = 'end_turn'
+        # Rough token estimate so usage-based code paths have numbers to work with
+        self.usage = _Usage(len(prompt) // 4, len(text) // 4)
+
+class _Messages:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        prompt = messages[-1]['content']
+        purpose = purpose_of(prompt)
+        self._client.calls.append(purpose)
+        latency = self._client.latency.get(purpose, self._client.default_latency)
+        if latency:
+            time.sleep(latency)
+        text = self._client.responses[purpose]
+        sections = len(SECTION_HEADING.findall(prompt)) if purpose == 'generate' else 0
+        if sections > 1:
+            text = tag_sections(text, sections)
+        return _Message(text, model, prompt)
+
+class StubAnthropic:
+    """Replays ``responses`` ({purpose: text}) after ``latency`` seconds.
+
+    ``latency`` is either one number for every call or a {purpose: seconds}
+    mapping. ``calls`` records the purpose of every request made.
+    """
+
+    def __init__(self, responses=None, latency=0.0):
+        self.responses = dict(load_recordings())
+        self.responses.update(responses or {})
+        if isinstance(latency, dict):
+            self.latency, self.default_latency = dict(latency), 0.0
+        else:
+            self.latency, self.default_latency = {}, latency
+        self.calls = []
+        self.messages = _Messages(self)
+
+def repair_variants(response_text):
+    """Return generate responses that exercise each parse path.
+
+    'valid' parses directly, 'trailing_comma' is fixed by the repair pass, and
+    'truncated' (cut off mid-card, as with a max_tokens stop) only yields
+    partial cards.
+    """
+    data = json.loads(response_text[response_text.find('{'):response_text.rfind('}') + 1])
+    valid = json.dumps(data, indent=2)
+    trailing = valid.replace('}\n  ]', '},\n  ]')
+    cut = valid.rfind('"answer"')
+    truncated = valid[:cut] + '"answer": "cut off mid'
+    return {'valid': valid, 'trailing_comma': trailing, 'truncated': truncated}
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Run app.py under uvicorn with Claude replaced by the replaying stub.
+
+Usage:
+    python -m benchmarks.stub_server --port 8001 --llm-latency 800
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.stub_claude import StubAnthropic
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='stub Claude latency in milliseconds')
+    args = parser.parse_args()
+
+    # Keep generated decks out of the real library
+    workdir = tempfile.mkdtemp(prefix='flashcards-stub-')
+    os.environ['DECK_LIBRARY_PATH'] = os.path.join(workdir, 'library.db')
+    os.environ['ATTEMPTS_PATH'] = os.path.join(workdir, 'attempts')
+    # Virtual students all connect from 127.0.0.1 and answer without thinking, so
+    # lift the per-client quotas; the work pools still bound concurrency and shed
+    # load with 503s
+    os.environ.setdefault('GENERATE_PER_MINUTE', '1000000')
+    os.environ.setdefault('GENERATE_BURST', '1000000')
+    os.environ.setdefault('INTERACTIVE_PER_SECOND', '1000000')
+    os.environ.setdefault('INTERACTIVE_BURST', '1000000')
+    # One client address generates every deck, so the daily token budgets are off too
+    os.environ.setdefault('CLIENT_TOKEN_BUDGET', '0')
+    os.environ.setdefault('SESSION_TOKEN_BUDGET', '0')
+    # Per-request progress logging would only slow the server under load
+    os.environ.setdefault('LOG_LEVEL', 'error')
+
+    import uvicorn
+    import main as main_module
+    import app as app_module
+    main_module.client = StubAnthropic(latency=args.llm_latency / 1000)
+
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+When a class opens the same shared link at once, every request would run
+its own extraction and generation. A ``SingleFlight`` runs the first
+request's work as a task keyed on what it generates from (the normalized
+URL or the uploaded file's hash); requests arriving while it is in flight
+wait on that task and receive the same result or error. Nothing is kept
+once the task finishes, so this is not a cache: a later request generates
+afresh.
+
+Used from the event loop only, so no locks are needed.
+"""
+import asyncio
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref_src')
+
+def normalize_url(url):
+    """Canonical form of ``url`` for deciding whether two requests fetch the same page."""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if parts.port and not (parts.scheme == 'http' and parts.port == 80 or parts.scheme == 'https' and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((parts.scheme.lower(), host, parts.path or '/', urlencode(query), ''))
+
+def content_key(content, kind):
+    return f"{kind}:{hashlib.sha256(content).hexdigest()}"
+
+class SingleFlight:
+    """Share one in-flight coroutine among concurrent callers with the same key."""
+
+    def __init__(self, name):
+        self.name = name
+        self.inflight = {}
+        # A joined request is a "hit": it did no work of its own
+        self.joined, self.started = metrics.cache_counters(f"coalesce_{name}")
+
+    async def run(self, key, make_coroutine):
+        """Await ``make_coroutine()`` for ``key``, or the copy already running for it.
+
+        The work runs as its own task, so a caller that disconnects does not
+        cancel it for the others.
+        """
+        task = self.inflight.get(key)
+        if task is None:
+            self.started.inc()
+            task = asyncio.ensure_future(make_coroutine())
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.joined.inc()
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Mark the exception retrieved in case every waiter went away
+        if not task.cancelled():
+            task.exception()
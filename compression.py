@@ -0,0 +1,148 @@
+"""
+Response compression for JSON and text bodies.
+
+Brotli is used when the client accepts it and the ``brotli`` package is
+installed, gzip otherwise. Small bodies, binary content types and responses
+that already carry a Content-Encoding (precompressed static files) pass
+through untouched. Streamed bodies are compressed chunk by chunk, so nothing
+is buffered beyond the first message.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'application/manifest+json', 'image/svg+xml', 'text/',
+)
+
+COMPRESSION_BYTES = metrics.MetricFamily(
+    'flashcards_compression_bytes_total',
+    'Bytes of compressed responses before and after encoding, by encoding.',
+    'counter', ('encoding', 'stage'),
+)
+
+def choose_encoding(accept_encoding, brotli_available=BROTLI_AVAILABLE):
+    """Pick 'br', 'gzip' or None from an Accept-Encoding header value."""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli_available and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+class Encoder:
+    """Incremental compressor with a uniform compress/finish interface."""
+
+    def __init__(self, encoding, gzip_level=6, brotli_quality=4):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._compressor.process
+        else:
+            # wbits 31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+
+    def compress(self, data):
+        return self._compress(data) if data else b''
+
+    def finish(self):
+        return self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses of at least ``minimum_size`` bytes."""
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._counters = {
+            encoding: (COMPRESSION_BYTES.labels(encoding, 'identity'), COMPRESSION_BYTES.labels(encoding, 'encoded'))
+            for encoding in ('br', 'gzip')
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+        identity_bytes, encoded_bytes = self._counters[encoding]
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message['type'] == 'http.response.start':
+                # Hold the headers until the first body chunk shows how big the response is
+                start_message = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start_message)
+                if not self._compressible(start_message['status'], headers) or (
+                        not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                del headers['Content-Length']
+                if not more_body:
+                    data = encoder.compress(body) + encoder.finish()
+                    headers['Content-Length'] = str(len(data))
+                    identity_bytes.inc(len(body))
+                    encoded_bytes.inc(len(data))
+                    await send(start_message)
+                    await send({'type': 'http.response.body', 'body': data})
+                    return
+                await send(start_message)
+
+            data = encoder.compress(body)
+            if not more_body:
+                data += encoder.finish()
+            identity_bytes.inc(len(body))
+            encoded_bytes.inc(len(data))
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(status, headers):
+        if status < 200 or status in (204, 304) or 'content-encoding' in headers:
+            return False
+        content_type = headers.get('content-type', '')
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,11 @@
+"""
+Shared test fixtures
+"""
+import pytest
+
+import attempts
+
+@pytest.fixture(autouse=True)
+def in_memory_attempts(monkeypatch):
+    """Record study attempts in memory, so tests never write to ATTEMPTS_PATH."""
+    monkeypatch.setattr(attempts, "STORE", attempts.AttemptStore())
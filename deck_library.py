@@ -0,0 +1,313 @@
+"""
+Persistent deck library backed by SQLite, with an FTS5 index over card text.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DECK_LIBRARY_PATH = os.getenv("DECK_LIBRARY_PATH", "flashcards.db")
+
+MAX_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_decks_source ON decks(source);
+
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    deck_id INTEGER NOT NULL REFERENCES decks(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    type TEXT,
+    category TEXT,
+    difficulty TEXT,
+    question TEXT,
+    answer TEXT,
+    term TEXT,
+    definition TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cards_deck ON cards(deck_id, position);
+
+-- Chunk manifest of incrementally generated decks: each chunk's content hash
+-- and how many of the deck's cards (in position order) it produced
+CREATE TABLE IF NOT EXISTS deck_chunks (
+    deck_id INTEGER NOT NULL REFERENCES decks(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    card_count INTEGER NOT NULL,
+    PRIMARY KEY (deck_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_deck_chunks_hash ON deck_chunks(hash);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+    question, answer, term, definition,
+    content='cards', content_rowid='id',
+    tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS cards_ai AFTER INSERT ON cards BEGIN
+    INSERT INTO cards_fts(rowid, question, answer, term, definition)
+    VALUES (new.id, new.question, new.answer, new.term, new.definition);
+END;
+
+CREATE TRIGGER IF NOT EXISTS cards_ad AFTER DELETE ON cards BEGIN
+    INSERT INTO cards_fts(cards_fts, rowid, question, answer, term, definition)
+    VALUES ('delete', old.id, old.question, old.answer, old.term, old.definition);
+END;
+"""
+
+# Column weights for bm25(): question, answer, term, definition.
+# Matches in the prompt side of a card rank above matches in the answer text.
+BM25_WEIGHTS = (4.0, 1.0, 4.0, 1.0)
+# bm25() reads the full match list of every query word to weigh it, and
+# scores every row the query matches, so common words are expensive. Words
+# found in more cards than this are left out of queries that have rarer
+# words ("what is the" in "what is the krebs cycle"); a query made only of
+# common words returns its newest matches unranked.
+MAX_TERM_CARDS = 10_000
+
+def _card_text_columns(card):
+    """Map a flashcard onto the (question, answer, term, definition) index columns."""
+    card_type = card.get('type')
+    if card_type == 'vocabulary':
+        return None, None, card.get('term'), card.get('definition')
+    if card_type == 'fact':
+        return card.get('prompt'), card.get('content'), None, None
+    return card.get('question'), card.get('answer'), None, None
+
+def build_match_query(query):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so user input can never be parsed as FTS5 syntax.
+    Prefix queries are deliberately not generated: expanding a short prefix
+    can touch a large share of the index and ranking all of those rows is what
+    pushes lookups out of the millisecond range on large libraries.
+    """
+    words = re.findall(r"\w+", query or "")
+    if not words:
+        return None
+    return ' '.join('"%s"' % word for word in words)
+
+class DeckLibrary:
+    """SQLite-backed store of every generated deck, searchable across decks."""
+
+    def __init__(self, path=DECK_LIBRARY_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_deck(self, name, flashcards, source=None, chunks=None):
+        """Store a deck and index its cards. Returns the new deck id.
+
+        When ``source`` is given, any previous deck from the same source is
+        replaced so re-generating a document does not duplicate its cards.
+        ``chunks`` is the deck's chunk manifest, a list of {'hash', 'cards'}.
+        """
+        rows = []
+        with self._lock, self._conn:
+            if source:
+                self._conn.execute("DELETE FROM decks WHERE source = ?", (source,))
+            cursor = self._conn.execute(
+                "INSERT INTO decks (name, source, created_at) VALUES (?, ?, ?)",
+                (name, source, time.time()),
+            )
+            deck_id = cursor.lastrowid
+            for position, card in enumerate(flashcards):
+                question, answer, term, definition = _card_text_columns(card)
+                rows.append((
+                    deck_id, position, card.get('type'), card.get('category'),
+                    card.get('difficulty'), question, answer, term, definition,
+                    json.dumps(card, ensure_ascii=False),
+                ))
+            self._conn.executemany(
+                "INSERT INTO cards (deck_id, position, type, category, difficulty,"
+                " question, answer, term, definition, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                "INSERT INTO deck_chunks (deck_id, position, hash, card_count) VALUES (?, ?, ?, ?)",
+                [(deck_id, position, chunk['hash'], chunk['cards']) for position, chunk in enumerate(chunks or [])],
+            )
+        return deck_id
+
+    def get_source_deck(self, source):
+        """Return {'flashcards', 'chunks'} for the deck stored from ``source``, or None.
+
+        'chunks' is the manifest given to add_deck (empty if there was none).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM decks WHERE source = ? ORDER BY created_at DESC LIMIT 1", (source,)
+            ).fetchone()
+            if not row:
+                return None
+            chunks = self._conn.execute(
+                "SELECT hash, card_count FROM deck_chunks WHERE deck_id = ? ORDER BY position", (row['id'],)
+            ).fetchall()
+            flashcards = self.get_deck(row['id'])
+        return {
+            'flashcards': flashcards,
+            'chunks': [{'hash': chunk['hash'], 'cards': chunk['card_count']} for chunk in chunks],
+        }
+
+    def chunk_cards(self, hashes):
+        """Map each of ``hashes`` stored in any deck's manifest to the cards it produced.
+
+        The most recent deck holding a chunk wins. This finds the unchanged
+        chunks of a document whose source cannot be told apart by name, such
+        as an edited re-upload.
+        """
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT dc.hash, dc.deck_id, dc.card_count,"
+                    " (SELECT COALESCE(SUM(p.card_count), 0) FROM deck_chunks p"
+                    "  WHERE p.deck_id = dc.deck_id AND p.position < dc.position) AS first"
+                    " FROM deck_chunks dc JOIN decks d ON d.id = dc.deck_id"
+                    f" WHERE dc.hash IN ({', '.join('?' * len(batch))})"
+                    " ORDER BY d.created_at DESC",
+                    batch,
+                ).fetchall()
+                for row in rows:
+                    if row['hash'] in found:
+                        continue
+                    cards = self._conn.execute(
+                        "SELECT data FROM cards WHERE deck_id = ? AND position >= ? AND position < ? ORDER BY position",
+                        (row['deck_id'], row['first'], row['first'] + row['card_count']),
+                    ).fetchall()
+                    # A manifest that does not match its deck's cards is not trusted
+                    if len(cards) == row['card_count']:
+                        found[row['hash']] = [json.loads(card['data']) for card in cards]
+        return found
+
+    def import_json_file(self, json_path):
+        """Import a ``*_flashcards.json`` file produced by the CLI."""
+        with open(json_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        flashcards = data.get('flashcards', []) if isinstance(data, dict) else data
+        name = os.path.basename(str(json_path)).rsplit('.', 1)[0]
+        return self.add_deck(name, flashcards, source=f"file:{os.path.abspath(json_path)}")
+
+    def list_decks(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.id, d.name, d.source, d.created_at, COUNT(c.id) AS card_count"
+                " FROM decks d LEFT JOIN cards c ON c.deck_id = d.id"
+                " GROUP BY d.id ORDER BY d.created_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_deck(self, deck_id):
+        """Return the cards of a deck in their original order, or None."""
+        with self._lock:
+            if not self._conn.execute("SELECT 1 FROM decks WHERE id = ?", (deck_id,)).fetchone():
+                return None
+            rows = self._conn.execute(
+                "SELECT data FROM cards WHERE deck_id = ? ORDER BY position", (deck_id,)
+            ).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def search(self, query, page=1, page_size=20):
+        """Full-text search across all decks, ranked by bm25.
+
+        Very common words are ignored when the query has rarer ones, and a
+        query of only common words lists its newest matches with score 0
+        (see MAX_TERM_CARDS).
+
+        Pagination fetches one extra row instead of counting every match, so
+        the cost of a page stays bounded by the page size on large libraries.
+        """
+        page = max(1, int(page))
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        results = self._ranked_cards(query, page_size + 1, (page - 1) * page_size)
+        return {
+            'query': query,
+            'page': page,
+            'page_size': page_size,
+            'has_more': len(results) > page_size,
+            'results': results[:page_size],
+        }
+
+    def search_cards(self, query, limit):
+        """Return just the best ``limit`` matching flashcards, for study sessions."""
+        return [result['card'] for result in self._ranked_cards(query, limit, 0)]
+
+    def _is_common(self, word):
+        # Stepping to the (MAX_TERM_CARDS + 1)th match reads at most that many
+        # postings, unlike counting every match
+        return self._conn.execute(
+            "SELECT 1 FROM cards_fts WHERE cards_fts MATCH ? LIMIT 1 OFFSET ?",
+            (build_match_query(word), MAX_TERM_CARDS),
+        ).fetchone() is not None
+
+    def _ranked_cards(self, query, limit, offset):
+        words = re.findall(r"\w+", query or "")
+        if not words:
+            return []
+        with self._lock:
+            rare = [word for word in words if not self._is_common(word)]
+            if rare:
+                match = build_match_query(' '.join(rare))
+                ranked = ("SELECT rowid, bm25(cards_fts, ?, ?, ?, ?) AS score"
+                          " FROM cards_fts WHERE cards_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?")
+                params = (*BM25_WEIGHTS, match, limit, offset)
+            else:
+                # Common words alone say little about relevance; skip bm25 and show the newest cards
+                ranked = ("SELECT rowid, 0.0 AS score"
+                          " FROM cards_fts WHERE cards_fts MATCH ? ORDER BY rowid DESC LIMIT ? OFFSET ?")
+                params = (build_match_query(' '.join(words)), limit, offset)
+            rows = self._conn.execute(
+                "SELECT c.id, c.deck_id, d.name AS deck_name, c.data, m.score"
+                f" FROM ({ranked}) AS m"
+                " JOIN cards c ON c.id = m.rowid"
+                " JOIN decks d ON d.id = c.deck_id"
+                " ORDER BY m.score, c.id DESC",
+                params,
+            ).fetchall()
+        return [
+            {
+                'card_id': row['id'],
+                'deck_id': row['deck_id'],
+                'deck_name': row['deck_name'],
+                # bm25() is lower-is-better; expose a higher-is-better score
+                'score': round(-row['score'], 4),
+                'card': json.loads(row['data']),
+            }
+            for row in rows
+        ]
+
+_library = None
+_library_lock = threading.Lock()
+
+def get_library():
+    """Return the process-wide deck library, opening it on first use."""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = DeckLibrary()
+    return _library
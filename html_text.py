@@ -0,0 +1,306 @@
+"""
+Main-content text extraction from HTML pages.
+
+Parsing is streamed: the parser calls back with start tags, end tags and text,
+and only paragraph-level text blocks are kept, never a DOM tree. lxml's C
+parser is used when it is installed, otherwise the standard library's
+html.parser. The main content is chosen with readability-style scoring: each
+paragraph scores its parent and grandparent by length and comma count,
+class/id names nudge scores up or down, and link-heavy containers are
+penalised. Node count, collected text and output size are all bounded, so a
+huge or hostile page costs a fixed amount of work.
+"""
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# Stop parsing after this many start tags
+MAX_NODES = 100_000
+# Stop collecting once this much block text has been seen
+MAX_TEXT_CHARS = 2_000_000
+# Longest text returned
+MAX_OUTPUT_CHARS = 200_000
+# Callers fetching pages should not read more than this
+MAX_HTML_BYTES = 5 * 1024 * 1024
+
+FEED_CHUNK = 64 * 1024
+MIN_PARAGRAPH_CHARS = 25
+
+# Elements whose content is never main text
+SKIP_TAGS = {
+    'head', 'script', 'style', 'noscript', 'template', 'svg', 'math', 'nav', 'aside', 'footer',
+    'form', 'iframe', 'button', 'select', 'textarea', 'object', 'canvas',
+}
+# Elements that start a new block of text
+BLOCK_TAGS = {
+    'html', 'body', 'main', 'article', 'section', 'header', 'div', 'p', 'pre', 'blockquote', 'address',
+    'center', 'details', 'summary', 'figure', 'figcaption', 'ul', 'ol', 'li', 'dl', 'dt', 'dd',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+}
+# Block starts that implicitly close an open element of the same kind, for
+# the standard library parser (lxml closes these itself)
+IMPLICIT_CLOSE = {'li': {'li'}, 'dt': {'dt', 'dd'}, 'dd': {'dt', 'dd'}, 'td': {'td', 'th'}, 'th': {'td', 'th'},
+                  'tr': {'td', 'th', 'tr'}}
+
+TAG_SCORES = {
+    'div': 5, 'pre': 3, 'td': 3, 'blockquote': 3,
+    'address': -3, 'ol': -3, 'ul': -3, 'dl': -3, 'dd': -3, 'dt': -3, 'li': -3,
+    'h1': -5, 'h2': -5, 'h3': -5, 'h4': -5, 'h5': -5, 'h6': -5, 'th': -5,
+}
+POSITIVE_HINTS = re.compile(r'article|body|content|entry|main|page|post|text|blog|story|document')
+NEGATIVE_HINTS = re.compile(
+    r'banner|breadcrumb|combx|comment|contact|cookie|copyright|foot|header|hidden|masthead|menu|meta|nav|'
+    r'newsletter|outbrain|popup|promo|related|share|shoutbox|sidebar|skyscraper|social|sponsor|subscribe|'
+    r'tags|tool|widget|catlinks|byline|advert|(^|[\s_-])ads?($|[\s_-])'
+)
+
+def class_weight(attrib):
+    hints = ' '.join(attrib.get(name) or '' for name in ('class', 'id', 'role')).lower()
+    if not hints:
+        return 0
+    weight = 0
+    if NEGATIVE_HINTS.search(hints):
+        weight -= 25
+    if POSITIVE_HINTS.search(hints):
+        weight += 25
+    return weight
+
+class TextCollector:
+    """Parser target that records text blocks and the block elements holding them.
+
+    Elements are numbered in document order, so a parent always has a smaller
+    id than its children; element 0 is a virtual root.
+    """
+
+    def __init__(self, max_nodes=MAX_NODES, max_text_chars=MAX_TEXT_CHARS):
+        self.max_nodes = max_nodes
+        self.max_text_chars = max_text_chars
+        self.done = False
+        self.nodes = 0
+        self.collected = 0
+        self.tags = ['#root']
+        self.parents = [-1]
+        self.weights = [0]
+        self.text_chars = [0]
+        self.link_chars = [0]
+        self.stack = [0]
+        self.blocks = []
+        self.pieces = []
+        self.link_pieces = 0
+        self.link_depth = 0
+        self.skip_tag = None
+        self.skip_depth = 0
+
+    # Parser target interface
+
+    def start(self, tag, attrib):
+        if self.done:
+            return
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            self.done = True
+            return
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            self.skip_tag, self.skip_depth = tag, 1
+            return
+        if tag == 'a':
+            self.link_depth += 1
+        elif tag in ('br', 'hr'):
+            self.flush()
+        elif tag in BLOCK_TAGS:
+            self.flush()
+            top = self.tags[self.stack[-1]]
+            if top == 'p' or top in IMPLICIT_CLOSE.get(tag, ()):
+                self.stack.pop()
+            self.tags.append(tag)
+            self.parents.append(self.stack[-1])
+            self.weights.append(class_weight(attrib))
+            self.text_chars.append(0)
+            self.link_chars.append(0)
+            self.stack.append(len(self.tags) - 1)
+
+    def end(self, tag):
+        if self.done:
+            return
+        tag = tag.lower() if isinstance(tag, str) else ''
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if self.skip_depth == 0:
+                    self.skip_tag = None
+            return
+        if tag == 'a':
+            self.link_depth = max(0, self.link_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.flush()
+            # An unclosed link cannot outlive the block it was opened in
+            self.link_depth = 0
+            # Pop to the matching element; stray end tags are ignored
+            for depth in range(len(self.stack) - 1, 0, -1):
+                if self.tags[self.stack[depth]] == tag:
+                    del self.stack[depth:]
+                    break
+
+    def data(self, text):
+        if self.done or self.skip_tag is not None:
+            return
+        self.pieces.append(text)
+        if self.link_depth:
+            self.link_pieces += len(text.strip())
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self.flush()
+        return self
+
+    def flush(self):
+        if not self.pieces:
+            return
+        text = ' '.join(''.join(self.pieces).split())
+        links = self.link_pieces
+        self.pieces = []
+        self.link_pieces = 0
+        if not text:
+            return
+        element = self.stack[-1]
+        self.blocks.append((text, element, min(links, len(text))))
+        self.text_chars[element] += len(text)
+        self.link_chars[element] += min(links, len(text))
+        self.collected += len(text)
+        if self.collected > self.max_text_chars:
+            self.done = True
+
+    # Content selection
+
+    def main_text(self, max_chars=MAX_OUTPUT_CHARS):
+        count = len(self.tags)
+        text_chars = list(self.text_chars)
+        link_chars = list(self.link_chars)
+        for element in range(count - 1, 0, -1):
+            parent = self.parents[element]
+            text_chars[parent] += text_chars[element]
+            link_chars[parent] += link_chars[element]
+
+        scores = {}
+        for text, element, _ in self.blocks:
+            if len(text) < MIN_PARAGRAPH_CHARS:
+                continue
+            score = 1 + text.count(',') + min(len(text) // 100, 3)
+            parent = self.parents[element]
+            grandparent = self.parents[parent] if parent >= 0 else -1
+            for ancestor, share in ((parent, 1.0), (grandparent, 0.5)):
+                if ancestor < 0:
+                    break
+                if ancestor not in scores:
+                    scores[ancestor] = TAG_SCORES.get(self.tags[ancestor], 0) + self.weights[ancestor]
+                scores[ancestor] += score * share
+
+        for candidate in scores:
+            if text_chars[candidate]:
+                scores[candidate] *= 1 - link_chars[candidate] / text_chars[candidate]
+
+        if scores:
+            top = max(scores, key=scores.get)
+            threshold = max(10, scores[top] * 0.2)
+            selected = {top} | {
+                candidate for candidate, score in scores.items()
+                if self.parents[candidate] == self.parents[top] and score >= threshold
+            }
+        else:
+            selected = {0}
+
+        # Inside the selection, drop blocks under elements whose class or id
+        # marks them as boilerplate (inline ads, share bars, comment threads)
+        inside = [False] * count
+        noisy = [False] * count
+        for element in range(count):
+            if element in selected:
+                inside[element] = True
+                continue
+            parent = self.parents[element]
+            if parent >= 0:
+                inside[element] = inside[parent]
+                noisy[element] = noisy[parent]
+            noisy[element] = noisy[element] or self.weights[element] < 0
+
+        lines = []
+        has_title = False
+        for text, element, links in self.blocks:
+            if not inside[element] or noisy[element] or links * 2 > len(text):
+                continue
+            has_title = has_title or self.tags[element] == 'h1'
+            lines.append(text)
+
+        # Keep the page heading when it sits just outside the chosen container
+        if not has_title:
+            title = next((text for text, element, _ in self.blocks if self.tags[element] == 'h1'), None)
+            if title:
+                lines.insert(0, title)
+
+        text = '\n'.join(lines)
+        if len(text) > max_chars:
+            cut = text.rfind(' ', 0, max_chars)
+            text = text[:cut if cut > 0 else max_chars]
+        return text
+
+class _StdlibParser(HTMLParser):
+    """Adapts html.parser callbacks to the lxml parser-target interface."""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+def extract_main_text(html, encoding=None, max_nodes=MAX_NODES, max_chars=MAX_OUTPUT_CHARS, use_lxml=None):
+    """Return the main readable text of an HTML document, one block per line.
+
+    ``html`` may be bytes or str; for bytes, ``encoding`` overrides charset
+    detection. ``use_lxml`` forces a parser choice (default: lxml if installed).
+    """
+    collector = TextCollector(max_nodes=max_nodes)
+    if LXML_AVAILABLE if use_lxml is None else use_lxml:
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+            encoding = 'utf-8'
+        parser = etree.HTMLParser(target=collector, encoding=encoding, recover=True)
+        feed, close = parser.feed, parser.close
+    else:
+        if isinstance(html, bytes):
+            html = html.decode(encoding or 'utf-8', errors='replace')
+        parser = _StdlibParser(collector)
+        feed, close = parser.feed, parser.close
+
+    for offset in range(0, len(html), FEED_CHUNK):
+        if collector.done:
+            break
+        feed(html[offset:offset + FEED_CHUNK])
+    try:
+        close()
+    except Exception:
+        # A truncated or malformed tail should not lose what was collected
+        collector.close()
+    return collector.main_text(max_chars)
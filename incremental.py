@@ -0,0 +1,204 @@
+"""
+Incremental regeneration of a deck when its source document changes.
+
+A deck is generated chunk by chunk: the cleaned text is split into chunks of
+a few pages, and the deck's manifest records every chunk's content hash and
+how many cards it produced, in deck order. When the document is ingested
+again, chunks whose hash is in the previous manifest reuse their cards and
+only new or edited chunks are generated, so fixing a typo on one slide costs
+one chunk, not the deck.
+
+Chunks are small so that reuse is fine-grained, but they are not sent one
+call each: the chunks to generate are packed into batches of up to
+BATCH_CHARS, sent as numbered sections of one prompt, and each card says
+which section it came from. Only the first MAX_DOCUMENT_CHARS of cleaned text
+are used, as with a single generate_flashcards call, so a first ingest is
+about one Claude call. Batches from every deck share one small executor, so
+concurrent uploads cannot multiply the large-model requests in flight.
+
+Chunk boundaries are chosen by content rather than by position: a page ends
+a chunk when the hash of its first line says so, once the chunk is long
+enough. Inserting or removing a page therefore disturbs only the chunks
+around it instead of shifting every later boundary, and an edit below a
+page's first line never moves a boundary at all.
+
+Every card carries a ``card_key`` made from its chunk's hash and its place
+in the chunk. Cards of unchanged chunks keep their key, and saved study
+progress follows the key (see Scheduler.load).
+"""
+import contextvars
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import tracing
+from text_cleanup import clean_pages
+
+# Cleaned text beyond this is dropped, leaving room for section headings
+# under generate_flashcards' 100,000-character input limit
+MAX_DOCUMENT_CHARS = 90_000
+# Once a chunk has this much text, a boundary page closes it...
+MIN_CHUNK_CHARS = 4_000
+# ...and it is always closed at this size
+MAX_CHUNK_CHARS = 16_000
+# Chunks to generate are sent together, up to this much text per call, so a
+# whole document fits in one
+BATCH_CHARS = 95_000
+# On average one page in this many is a boundary
+BOUNDARY_EVERY = 3
+# Batches generated at once, across every deck in the process
+GENERATE_CONCURRENCY = 3
+
+log = logging.getLogger(__name__)
+
+CHUNKS = metrics.MetricFamily(
+    'flashcards_chunks_total',
+    'Deck chunks whose cards were reused, generated or failed to generate.',
+    'counter', ('result',),
+)
+CHUNKS_REUSED = CHUNKS.labels('reused')
+CHUNKS_GENERATED = CHUNKS.labels('generated')
+CHUNKS_FAILED = CHUNKS.labels('failed')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the executor batches are generated on, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(GENERATE_CONCURRENCY, thread_name_prefix='chunks')
+        return _executor
+
+def chunk_hash(text):
+    # Whitespace that differs between extractions is not an edit
+    return hashlib.sha256(' '.join(text.split()).encode('utf-8')).hexdigest()
+
+def card_key(digest, index):
+    return f"{digest[:12]}-{index}"
+
+def split_chunks(text):
+    """Clean ``text`` and return (chunks of whole pages, cleanup stats).
+
+    Text without page breaks (DOCX, web pages) is split at paragraphs instead.
+    Only the first MAX_DOCUMENT_CHARS characters of cleaned text are kept.
+    The stats are those of clean_pages().
+    """
+    pages, stats = clean_pages(text)
+    if len(pages) == 1:
+        pages = [paragraph for paragraph in pages[0].split('\n\n') if paragraph.strip()]
+
+    chunks = []
+    current = []
+    size = 0
+    total = 0
+    for page in pages:
+        if total + len(page) > MAX_DOCUMENT_CHARS:
+            log.warning("Cleaned text is over %d characters, truncating", MAX_DOCUMENT_CHARS)
+            page = page[:MAX_DOCUMENT_CHARS - total]
+            if page:
+                current.append(page)
+            break
+        total += len(page)
+        current.append(page)
+        size += len(page)
+        boundary = int(chunk_hash(page.split('\n', 1)[0])[:8], 16) % BOUNDARY_EVERY == 0
+        if size >= MAX_CHUNK_CHARS or (size >= MIN_CHUNK_CHARS and boundary):
+            chunks.append('\n\n'.join(current))
+            current = []
+            size = 0
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks, stats
+
+def batches(items, limit=BATCH_CHARS):
+    """Pack (digest, chunk) pairs, in order, into lists of at most ``limit`` characters."""
+    packed = []
+    size = 0
+    for item in items:
+        if packed and size + len(item[1]) > limit:
+            yield packed
+            packed = []
+            size = 0
+        packed.append(item)
+        size += len(item[1])
+    if packed:
+        yield packed
+
+def previous_chunks(flashcards, manifest):
+    """Map each chunk hash of a saved deck's ``manifest`` to the cards it produced.
+
+    A manifest that does not account for exactly the deck's cards is ignored.
+    """
+    chunks = {}
+    start = 0
+    for entry in manifest or []:
+        end = start + entry['cards']
+        chunks[entry['hash']] = flashcards[start:end]
+        start = end
+    return chunks if start == len(flashcards) else {}
+
+def generate_deck(text, generate, previous=None):
+    """Generate a deck from ``text``, reusing the cards of unchanged chunks.
+
+    ``generate`` takes a list of chunk texts, makes one Claude call for them
+    (main.generate_sections) and returns one list of cards, or None, per
+    chunk. ``previous`` is what previous_chunks() returned for the last
+    version of the deck, or a function that looks up the cards of the
+    document's chunk hashes. Batches run on the shared executor.
+    Returns {'flashcards', 'manifest', 'reused', 'generated', 'failed',
+    'calls', 'cleanup'}, where 'manifest' holds one {'hash', 'cards'} entry
+    per chunk in the deck and 'cleanup' the stats of clean_pages(). A chunk
+    that fails is left out of both, so the next run retries it.
+    """
+    chunks = {}
+    with tracing.span("preprocess"):
+        split, cleanup = split_chunks(text)
+    for chunk in split:
+        # A chunk repeated word for word would only yield duplicate cards
+        chunks.setdefault(chunk_hash(chunk), chunk)
+    if callable(previous):
+        previous = previous(list(chunks))
+    previous = previous or {}
+    pending = [(digest, chunk) for digest, chunk in chunks.items() if digest not in previous]
+
+    def generate_batch(batch):
+        try:
+            results = generate([chunk for _, chunk in batch])
+        except Exception as e:
+            log.error("Error generating %d chunks: %s", len(batch), e)
+            results = None
+        results = results or [None] * len(batch)
+        return {
+            digest: [{**card, 'card_key': card_key(digest, index)} for index, card in enumerate(cards)] if cards else None
+            for (digest, _), cards in zip(batch, results)
+        }
+
+    # Each job runs in a copy of the caller's context, keeping its trace and usage attribution
+    jobs = [get_executor().submit(contextvars.copy_context().run, generate_batch, batch) for batch in batches(pending)]
+    fresh = {}
+    for job in jobs:
+        fresh.update(job.result())
+
+    deck = {'flashcards': [], 'manifest': [], 'reused': 0, 'generated': 0, 'failed': 0,
+            'calls': len(jobs), 'cleanup': cleanup}
+    for digest in chunks:
+        if digest in previous:
+            cards = previous[digest]
+            deck['reused'] += 1
+        else:
+            cards = fresh.get(digest)
+            if cards is None:
+                deck['failed'] += 1
+                continue
+            deck['generated'] += 1
+        deck['flashcards'].extend(cards)
+        deck['manifest'].append({'hash': digest, 'cards': len(cards)})
+
+    CHUNKS_REUSED.inc(deck['reused'])
+    CHUNKS_GENERATED.inc(deck['generated'])
+    CHUNKS_FAILED.inc(deck['failed'])
+    return deck
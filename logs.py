@@ -0,0 +1,184 @@
+"""
+Structured, non-blocking logging with request-ID correlation.
+
+Log calls only put a record on a bounded in-memory queue; a background
+listener thread formats it and writes it to stderr, so a slow stdout pipe
+(as on Render) never stalls a request. When the queue is full, new records
+are dropped and counted instead of waiting.
+
+Every record carries the ID of the request it was logged in. The ID comes
+from an incoming X-Request-ID header or is generated, is echoed back in the
+response, and follows work into the worker pools because it lives in a
+context variable. Verbose output such as raw Claude response previews is
+logged with ``extra=SAMPLED`` and only a fraction of those records is kept.
+
+Configured from the environment by setup():
+  LOG_LEVEL        debug, info (default), warning or error
+  LOG_FORMAT       text (default) or json, one object per line
+  LOG_SAMPLE_RATE  fraction of sampled debug records kept (default 0.01)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+import metrics
+
+# Pass as ``extra=`` to log a record only LOG_SAMPLE_RATE of the time
+SAMPLED = {'sampled': True}
+QUEUE_SIZE = 10_000
+# Libraries that log every HTTP request at INFO
+QUIET_LOGGERS = ('httpx', 'httpcore')
+
+DROPPED = metrics.MetricFamily(
+    'flashcards_log_records_dropped_total',
+    'Log records dropped because the log queue was full.',
+    'counter',
+).labels()
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id', 'sampled'}
+_VALID_REQUEST_ID = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+
+def current_request_id():
+    return _request_id.get()
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request ID and thin out sampled ones.
+
+    Runs in the thread that logs, before the record is queued, so it sees
+    that thread's context and sampled records cost nothing further.
+    """
+
+    def __init__(self, sample_rate=0.01):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        if getattr(record, 'sampled', False) and random.random() >= self.sample_rate:
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records rather than block when the queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any fields passed in ``extra``."""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class StderrHandler(logging.StreamHandler):
+    """Writes to whatever sys.stderr is when a record is emitted, not when the handler was made."""
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+def setup(level=None, fmt=None, sample_rate=None, stream=None, queue_size=QUEUE_SIZE):
+    """Send the root logger's records through a queue to a background writer.
+
+    Arguments default to the LOG_* environment variables. Calling it again
+    replaces the previous configuration. Returns the QueueListener.
+    """
+    global _listener
+    level = (level or os.getenv('LOG_LEVEL') or 'info').upper()
+    fmt = (fmt or os.getenv('LOG_FORMAT') or 'text').lower()
+    if sample_rate is None:
+        sample_rate = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+    output = logging.StreamHandler(stream) if stream else StderrHandler()
+    output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(ContextFilter(sample_rate))
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+        for old in [old for old in root.handlers if isinstance(old, DroppingQueueHandler)]:
+            root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    return _listener
+
+@atexit.register
+def _flush():
+    # Write out whatever is still queued when the process exits
+    if _listener is not None:
+        _listener.stop()
+
+class RequestIdMiddleware:
+    """ASGI middleware that gives each HTTP request an ID for log correlation.
+
+    A well-formed X-Request-ID from the client or proxy is reused so logs
+    line up across services; otherwise a new one is generated. The ID is
+    returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get('headers', ()):
+            if name == b'x-request-id':
+                request_id = value.decode('latin-1')
+                break
+        if not request_id or not _VALID_REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex[:16]
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(b'x-request-id', request_id.encode('latin-1'))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
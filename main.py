@@ -1,125 +1,139 @@
 import json
+import logging
 import sys
 from pathlib import Path
-import PyPDF2
-import anthropic
-import random
+from scheduler import Scheduler, quality_for
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
+import random
 import re
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    print("⚠️ python-docx not installed. DOC/DOCX support disabled. Install with: pip install python-docx")
+import threading
+from contextlib import nullcontext
+import metrics
+import tracing
+import usage
+import logs
+
+# PyPDF2, requests, lxml, python-docx, anthropic and FastAPI are
+# imported where they are used, so `import main` (and with it app.py) and
+# CLI commands like `study` only pay for the libraries they actually touch.
 
 # Load environment variables from .env file
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 # Claude API configuration
 CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY")
-if not CLAUDE_API_KEY:
-    raise ValueError("CLAUDE_API_KEY not found in environment variables. Please check your .env file.")
 
-client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+# Model tiers: 'fast' for short interactive replies, 'large' for deck generation
+# and for grading the fast model is unsure about
+MODEL_TIERS = {
+    'fast': os.getenv("CLAUDE_FAST_MODEL", "claude-3-5-haiku-20241022"),
+    'large': os.getenv("CLAUDE_LARGE_MODEL", "claude-3-7-sonnet-20250219"),
+}
+# US dollars per million (input, output) tokens for each tier's default model,
+# used for the cost estimates in the usage ledger; update with the models
+MODEL_PRICES = {
+    'fast': (0.80, 4.00),
+    'large': (3.00, 15.00),
+}
+# Tier used for each call purpose
+MODEL_ROUTES = {
+    'generate': 'large',
+    'grade': 'fast',
+    'hint': 'fast',
+}
 
-app = FastAPI()
+# Wrong options shown next to the correct answer in multiple-choice mode
+CHOICE_DISTRACTORS = 3
+# Cards sampled from the deck when a card has to borrow distractors
+CHOICE_SAMPLE = 50
+# Added to the generation prompt when several deck chunks share one call
+SECTIONS_INSTRUCTION = (
+    "The text is divided into {count} sections, each headed \"[Section N]\". Give every flashcard a "
+    "'section' field with the number of the section its content comes from, and list the flashcards in section order."
+)
 
-# Configure templates
-templates = Jinja2Templates(directory="templates")
+# Created on first use by get_client(); tests and benchmarks may assign a stand-in
+client = None
 
-# Pydantic models for API requests
-class URLRequest(BaseModel):
-    url: str
+# Optional cap on concurrent Claude requests, set with limit_claude_concurrency()
+_claude_slots = None
 
-# Add this to handle HEAD requests
-@app.head("/")
-async def head_root():
-    return {}
-
-@app.get("/")
-async def root():
-    return {"message": "Flashcard API is running"}
-
-@app.get("/app", response_class=HTMLResponse)
-async def get_app():
-    """Serve the flashcard web application."""
-    try:
-        with open("templates/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Application template not found")
+def get_client():
+    """Return the Anthropic client, creating it on first use."""
+    global client
+    if client is None:
+        if not CLAUDE_API_KEY:
+            raise ValueError("CLAUDE_API_KEY not found in environment variables. Please check your .env file.")
+        import anthropic
+        client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+    return client
 
 def extract_text_from_pdf(pdf_path):
     """Extract text content from a PDF file."""
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text.strip()
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return None
+    import PyPDF2
+    
+    with tracing.span("extract.pdf", metrics.EXTRACTION_PDF):
+        try:
+            with open(pdf_path, 'rb') as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                # Pages are separated by form feeds so cleanup can find running headers and footers
+                pages = [page.extract_text() or "" for page in pdf_reader.pages]
+            return "\f".join(pages).strip()
+        except Exception as e:
+            log.warning("Error reading PDF: %s", e)
+            return None
 
 def extract_text_from_url(url):
     """Extract text content from various web sources."""
-    try:
-        # Determine content type based on URL
-        if 'youtube.com' in url or 'youtu.be' in url:
-            return extract_youtube_transcript(url)
-        elif 'wikipedia.org' in url:
-            return extract_wikipedia_content(url)
-        else:
-            return extract_general_webpage(url)
-    except Exception as e:
-        error_msg = f"Error extracting content from URL: {e}"
-        print(error_msg)
-        raise Exception(error_msg)
+    with tracing.span("extract.url", metrics.EXTRACTION_URL):
+        try:
+            # Determine content type based on URL
+            if 'youtube.com' in url or 'youtu.be' in url:
+                return extract_youtube_transcript(url)
+            elif 'wikipedia.org' in url:
+                return extract_wikipedia_content(url)
+            else:
+                return extract_general_webpage(url)
+        except Exception as e:
+            error_msg = f"Error extracting content from URL: {e}"
+            log.warning(error_msg)
+            raise Exception(error_msg)
 
 def extract_general_webpage(url):
-    """Extract text from general web pages."""
+    """Extract the main text from general web pages."""
+    import requests
+    from html_text import MAX_HTML_BYTES, extract_main_text
+    
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     
-    response = requests.get(url, headers=headers, timeout=10)
-    response.raise_for_status()
-    
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    # Remove script and style elements
-    for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-        script.decompose()
-    
-    # Get text from main content areas
-    main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=re.compile(r'content|article|post'))
-    
-    if main_content:
-        text = main_content.get_text()
-    else:
-        text = soup.get_text()
-    
-    # Clean up text
-    lines = (line.strip() for line in text.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = ' '.join(chunk for chunk in chunks if chunk)
+    with requests.get(url, headers=headers, timeout=10, stream=True) as response:
+        response.raise_for_status()
+        
+        # Read at most MAX_HTML_BYTES; anything past that is not worth parsing
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_HTML_BYTES:
+                break
+        
+        # Only trust an explicit charset; otherwise let the parser sniff <meta charset>
+        encoding = response.encoding if 'charset' in response.headers.get('content-type', '').lower() else None
     
-    return text
+    return extract_main_text(b''.join(chunks)[:MAX_HTML_BYTES], encoding=encoding)
 
 def extract_wikipedia_content(url):
     """Extract content from Wikipedia articles with better structure."""
     # Convert to API format for cleaner extraction
+    import requests
+    
     page_title = url.split('/')[-1]
     api_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{page_title}"
     
@@ -147,32 +161,47 @@ def extract_youtube_transcript(url):
                 raise ValueError("Invalid YouTube URL: missing video ID")
             video_id = parse_qs(parsed_url.query)['v'][0]
         
-        print(f"Attempting to extract transcript for video ID: {video_id}")
+        log.info("Extracting transcript for YouTube video %s", video_id)
         
         # Get transcript
         transcript = YouTubeTranscriptApi.get_transcript(video_id)
         
         # Combine transcript text
         text = ' '.join([entry['text'] for entry in transcript])
-        print(f"Successfully extracted {len(text)} characters from YouTube transcript")
+        log.info("Extracted %d characters from YouTube transcript", len(text))
         return text
         
     except ImportError:
         error_msg = "youtube-transcript-api not installed. Install with: pip install youtube-transcript-api"
-        print(error_msg)
+        log.error(error_msg)
         raise Exception(error_msg)
     except Exception as e:
         error_msg = f"Error extracting YouTube transcript: {e}"
-        print(error_msg)
+        log.warning(error_msg)
         raise Exception(error_msg)
 
-def generate_flashcards(text_content):
-    """Generate flashcards from text using Claude AI."""
+def generate_flashcards(text_content, clean=True, sections=None):
+    """Generate flashcards from text using Claude AI.
+    
+    Pass ``clean=False`` for text that has already been through cleanup,
+    such as the chunks of generate_deck(). With ``sections``, the text is
+    that many sections headed "[Section N]" and every card is asked for a
+    'section' number (see generate_sections).
+    """
+    from text_cleanup import clean_text
+    
+    # Strip repeated headers/footers, page numbers, boilerplate and duplicates first
+    if clean:
+        with tracing.span("preprocess"):
+            text_content, cleanup = clean_text(text_content)
+        if cleanup['chars_before'] > cleanup['chars_after']:
+            log.info("Cleanup removed %d of %d characters (~%d tokens)",
+                     cleanup['chars_before'] - cleanup['chars_after'], cleanup['chars_before'], cleanup['tokens_saved'])
     
     # Limit input text length to prevent token overflow
     MAX_INPUT_LENGTH = 100000
     if len(text_content) > MAX_INPUT_LENGTH:
-        print(f"⚠️  Input text is {len(text_content)} characters. Truncating to {MAX_INPUT_LENGTH} characters for better processing.")
+        log.warning("Input text is %d characters, truncating to %d", len(text_content), MAX_INPUT_LENGTH)
         text_content = text_content[:MAX_INPUT_LENGTH] + "..."
     
     prompt = f"""
@@ -191,10 +220,14 @@ def generate_flashcards(text_content):
 
     When you generate flashcards, ensure all the information within the text is accounted for and included in the flashcards.
 
+    {SECTIONS_INSTRUCTION.format(count=sections) if sections else ""}
+
     Additionally, full sentences aren't required for the flashcards. The flashcards should be concise and to the point and clearly convey the information needed for effective studying.
 
     When generating the question, please make it clear the question being asked, such as "What is...", "Define...", or "Explain...".
 
+    For every flashcard, also give {CHOICE_DISTRACTORS} 'distractors' for multiple-choice study: plausible but clearly wrong answers, similar in length and style to the correct answer, and never a rewording of it.
+
     IMPORTANT: Return ONLY valid JSON with NO additional text, comments, or explanations. Format your response as:
 
     {{
@@ -204,21 +237,24 @@ def generate_flashcards(text_content):
                 "difficulty": "easy",
                 "type": "question_answer",
                 "question": "What is...",
-                "answer": "..."
+                "answer": "...",
+                "distractors": ["...", "...", "..."]
             }},
             {{
                 "category": "category_name",
                 "difficulty": "medium",
                 "type": "vocabulary",
                 "term": "...",
-                "definition": "..."
+                "definition": "...",
+                "distractors": ["...", "...", "..."]
             }},
             {{
                 "category": "category_name",
                 "difficulty": "hard",
                 "type": "fact",
                 "prompt": "...",
-                "content": "..."
+                "content": "...",
+                "distractors": ["...", "...", "..."]
             }}
         ]
     }}
@@ -228,96 +264,176 @@ def generate_flashcards(text_content):
     """
     
     try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=8000,  # Increased from 4000 to 8000
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Extract JSON from response
-        response_text = response.content[0].text
-        print(f"Raw Claude response length: {len(response_text)} characters")
-        print(f"Raw Claude response preview: {response_text[:200]}...")  # Reduced debug output
+        response_text = call_claude("generate", prompt, max_tokens=8000)
         
+        # Extract JSON from response; the preview is verbose, so only a sample is logged
+        log.debug("Claude response: %d characters, starting %.200r", len(response_text), response_text, extra=logs.SAMPLED)
+        
+        return parse_flashcards_response(response_text)
+            
+    except Exception as e:
+        log.error("Error generating flashcards: %s", e)
+        return None
+
+def generate_sections(sections):
+    """Generate the cards of several cleaned chunks in one Claude call.
+    
+    Returns one list of cards (or None) per chunk. Each card is placed by
+    its 'section' number; a card without a valid one follows the card before
+    it, since cards come back in text order.
+    """
+    if len(sections) == 1:
+        result = generate_flashcards(sections[0], clean=False)
+        return [result.get('flashcards') if result else None]
+    
+    text = "\n\n".join(f"[Section {number}]\n{section}" for number, section in enumerate(sections, 1))
+    result = generate_flashcards(text, clean=False, sections=len(sections))
+    if not result:
+        return [None] * len(sections)
+    
+    grouped = [[] for _ in sections]
+    index = 0
+    for card in result.get('flashcards') or []:
+        section = card.pop('section', None)
+        try:
+            if 1 <= int(section) <= len(sections):
+                index = int(section) - 1
+        except (TypeError, ValueError):
+            pass
+        grouped[index].append(card)
+    return [cards or None for cards in grouped]
+
+def generate_deck(text_content, previous=None):
+    """Generate a deck chunk by chunk, reusing the cards of the chunks in ``previous``.
+    
+    See incremental.generate_deck for the result; ``previous`` comes from
+    incremental.previous_chunks() on the last version of the deck.
+    """
+    import incremental
+    deck = incremental.generate_deck(text_content, generate_sections, previous)
+    cleanup = deck['cleanup']
+    if cleanup['chars_before'] > cleanup['chars_after']:
+        log.info("Cleanup removed %d of %d characters (~%d tokens)",
+                 cleanup['chars_before'] - cleanup['chars_after'], cleanup['chars_before'], cleanup['tokens_saved'])
+    log.info("Generated %d chunks in %d calls, reused %d unchanged, %d failed",
+             deck['generated'], deck['calls'], deck['reused'], deck['failed'])
+    return deck
+
+def limit_claude_concurrency(limit):
+    """Allow at most ``limit`` Claude requests in flight at once (None for no limit)."""
+    global _claude_slots
+    _claude_slots = threading.BoundedSemaphore(limit) if limit else None
+
+def call_claude(purpose, prompt, max_tokens, tier=None):
+    """Send a single-turn prompt to Claude and return the response text.
+    
+    ``purpose`` ('generate', 'grade' or 'hint') picks the model tier from
+    MODEL_ROUTES unless ``tier`` overrides it, and labels the latency
+    metrics and the tracing span.
+    """
+    tier = tier or MODEL_ROUTES[purpose]
+    # Waiting for a slot is not part of the measured call
+    with _claude_slots or nullcontext():
+        with tracing.span(f"claude.{purpose}", metrics.CLAUDE_BY_ROUTE[purpose, tier]):
+            response = get_client().messages.create(
+                model=MODEL_TIERS[tier],
+                max_tokens=max_tokens,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+    record_usage(purpose, tier, getattr(response, 'usage', None))
+    return response.content[0].text
+
+def record_usage(purpose, tier, response_usage):
+    """Add a response's token usage and estimated cost to the usage ledger."""
+    input_tokens = getattr(response_usage, 'input_tokens', 0) or 0
+    output_tokens = getattr(response_usage, 'output_tokens', 0) or 0
+    input_price, output_price = MODEL_PRICES[tier]
+    cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    usage.LEDGER.record(purpose, tier, input_tokens, output_tokens, cost)
+
+def parse_flashcards_response(response_text):
+    """Parse the flashcard JSON in a Claude response, repairing it if needed."""
+    with tracing.span("parse", metrics.JSON_PARSE):
         # Try to find and parse JSON in the response
         start_idx = response_text.find('{')
         end_idx = response_text.rfind('}') + 1
         
-        if start_idx != -1 and end_idx != 0:
-            json_str = response_text[start_idx:end_idx]
-            
-            # Clean up common JSON formatting issues
-            json_str = json_str.replace('\n', ' ').replace('\r', ' ')
-            
-            # Try to parse JSON with better error handling
-            try:
-                parsed_json = json.loads(json_str)
-                print(f"✅ Successfully parsed JSON with {len(parsed_json.get('flashcards', []))} flashcards")
-                return parsed_json
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {e}")
-                print(f"Error at position {e.pos}")
-                
-                # Try to fix common issues and parse again
-                try:
-                    # Remove trailing commas before closing brackets/braces
-                    import re
-                    json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-                    
-                    # Try to find incomplete JSON and fix it
-                    if json_str.count('{') > json_str.count('}'):
-                        # Add missing closing braces
-                        missing_braces = json_str.count('{') - json_str.count('}')
-                        json_str += '}' * missing_braces
-                        print(f"🔧 Added {missing_braces} missing closing braces")
-                    
-                    if json_str.count('[') > json_str.count(']'):
-                        # Add missing closing brackets
-                        missing_brackets = json_str.count('[') - json_str.count(']')
-                        json_str += ']' * missing_brackets
-                        print(f"🔧 Added {missing_brackets} missing closing brackets")
-                    
-                    parsed_json = json.loads(json_str)
-                    print(f"✅ Successfully fixed and parsed JSON with {len(parsed_json.get('flashcards', []))} flashcards")
-                    return parsed_json
-                    
-                except json.JSONDecodeError as e2:
-                    print(f"Failed to fix JSON: {e2}")
-                    
-                    # Last resort: try to extract partial flashcards
-                    try:
-                        # Look for individual flashcard objects
-                        import re
-                        flashcard_pattern = r'\{[^{}]*"type"[^{}]*\}'
-                        matches = re.findall(flashcard_pattern, json_str)
-                        
-                        if matches:
-                            print(f"🔧 Attempting to extract {len(matches)} partial flashcards")
-                            flashcards = []
-                            for match in matches[:10]:  # Limit to 10 flashcards
-                                try:
-                                    flashcard = json.loads(match)
-                                    flashcards.append(flashcard)
-                                except:
-                                    continue
-                            
-                            if flashcards:
-                                print(f"✅ Extracted {len(flashcards)} partial flashcards")
-                                return {"flashcards": flashcards}
-                    
-                    except Exception as e3:
-                        print(f"Partial extraction failed: {e3}")
-                    
-                    print("❌ All JSON parsing attempts failed")
-                    return None
-        else:
-            print("Could not find valid JSON in response")
+        if start_idx == -1 or end_idx == 0:
+            log.warning("Could not find valid JSON in response")
             return None
+        
+        json_str = response_text[start_idx:end_idx]
+        
+        # Clean up common JSON formatting issues
+        json_str = json_str.replace('\n', ' ').replace('\r', ' ')
+        
+        # Try to parse JSON with better error handling
+        try:
+            parsed_json = json.loads(json_str)
+            log.info("Parsed JSON with %d flashcards", len(parsed_json.get('flashcards', [])))
+            return parsed_json
+        except json.JSONDecodeError as e:
+            log.warning("JSON parsing error at position %d: %s", e.pos, e.msg)
+    
+    with tracing.span("parse.repair", metrics.JSON_REPAIR):
+        return repair_flashcards_json(json_str)
+
+def repair_flashcards_json(json_str):
+    """Fallbacks for flashcard JSON that failed to parse as-is."""
+    # Try to fix common issues and parse again
+    try:
+        # Remove trailing commas before closing brackets/braces
+        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+        
+        # Try to find incomplete JSON and fix it
+        if json_str.count('{') > json_str.count('}'):
+            # Add missing closing braces
+            missing_braces = json_str.count('{') - json_str.count('}')
+            json_str += '}' * missing_braces
+            log.info("Added %d missing closing braces", missing_braces)
+        
+        if json_str.count('[') > json_str.count(']'):
+            # Add missing closing brackets
+            missing_brackets = json_str.count('[') - json_str.count(']')
+            json_str += ']' * missing_brackets
+            log.info("Added %d missing closing brackets", missing_brackets)
+        
+        parsed_json = json.loads(json_str)
+        log.info("Repaired and parsed JSON with %d flashcards", len(parsed_json.get('flashcards', [])))
+        metrics.JSON_REPAIR_FIXED.inc()
+        return parsed_json
+        
+    except json.JSONDecodeError as e2:
+        log.warning("Failed to repair JSON: %s", e2)
+        
+        # Last resort: try to extract partial flashcards
+        try:
+            # Look for individual flashcard objects
+            flashcard_pattern = r'\{[^{}]*"type"[^{}]*\}'
+            matches = re.findall(flashcard_pattern, json_str)
             
-    except Exception as e:
-        print(f"Error generating flashcards: {e}")
+            if matches:
+                log.info("Extracting up to %d partial flashcards", len(matches))
+                flashcards = []
+                for match in matches[:10]:  # Limit to 10 flashcards
+                    try:
+                        flashcard = json.loads(match)
+                        flashcards.append(flashcard)
+                    except:
+                        continue
+                
+                if flashcards:
+                    log.info("Extracted %d partial flashcards", len(flashcards))
+                    metrics.JSON_REPAIR_PARTIAL.inc()
+                    return {"flashcards": flashcards}
+        
+        except Exception as e3:
+            log.warning("Partial extraction failed: %s", e3)
+        
+        log.error("All JSON parsing attempts failed")
+        metrics.JSON_REPAIR_FAILED.inc()
         return None
 
 def save_flashcards(flashcards, output_path):
@@ -329,19 +445,33 @@ def save_flashcards(flashcards, output_path):
     except Exception as e:
         print(f"Error saving flashcards: {e}")
 
-def load_flashcards(json_path):
-    """Load flashcards from a JSON file."""
+def load_deck_file(json_path):
+    """Load a saved deck file ({} if it cannot be read)."""
     try:
         with open(json_path, 'r', encoding='utf-8') as file:
             data = json.load(file)
-            return data.get('flashcards', [])
+        return data if isinstance(data, dict) else {}
     except Exception as e:
         print(f"Error loading flashcards: {e}")
+        return {}
+
+def load_flashcards(json_path):
+    """Load flashcards from a JSON file."""
+    return load_deck_file(json_path).get('flashcards', [])
+
+def grade_verdict(response_text):
+    """Read a grading reply: True, False, or None when unsure or unreadable."""
+    reply = response_text.strip().upper()
+    if "UNSURE" in reply:
         return None
+    if "INCORRECT" in reply:
+        return False
+    if "CORRECT" in reply:
+        return True
+    return None
 
-def check_answer(question, correct_answer, user_answer):
-    """Check if user's answer is correct using Claude with more flexible evaluation."""
-    prompt = f"""
+def grading_prompt(question, correct_answer, user_answer, replies):
+    return f"""
     You are evaluating a student's answer to a study question. Be fair and flexible in your assessment.
     
     Question: {question}
@@ -362,50 +492,102 @@ def check_answer(question, correct_answer, user_answer):
     
     Use your knowledge to evaluate if the student's answer is reasonable and correct, even if it doesn't match the expected answer word-for-word. Different correct explanations or phrasings should be accepted.
     
-    Respond with ONLY: "CORRECT" or "INCORRECT"
+    Respond with ONLY: {replies}
     """
+
+def check_answer(question, correct_answer, user_answer):
+    """Check if user's answer is correct using Claude with more flexible evaluation.
     
+    The fast tier grades first and may answer UNSURE; only then is the
+    answer passed to the large tier.
+    """
     try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=20,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        response_text = response.content[0].text.strip().upper()
-        return "CORRECT" in response_text and "INCORRECT" not in response_text
+        prompt = grading_prompt(question, correct_answer, user_answer,
+                                '"CORRECT", "INCORRECT", or "UNSURE" if you cannot tell with confidence')
+        verdict = grade_verdict(call_claude("grade", prompt, max_tokens=5))
+        if verdict is None:
+            metrics.GRADE_ESCALATIONS.inc()
+            prompt = grading_prompt(question, correct_answer, user_answer, '"CORRECT" or "INCORRECT"')
+            verdict = grade_verdict(call_claude("grade", prompt, max_tokens=20, tier='large'))
+        return verdict is True
     except:
-        # Improved fallback logic
-        user_lower = user_answer.lower().strip()
-        correct_lower = correct_answer.lower().strip()
-        
-        # Exact match
-        if user_lower == correct_lower:
-            return True
-            
-        # Check if user answer contains key concepts from correct answer
-        correct_words = set(correct_lower.split())
-        user_words = set(user_lower.split())
+        return local_check_answer(correct_answer, user_answer)
+
+def local_check_answer(correct_answer, user_answer):
+    """Grade without Claude, by key-word overlap; the fallback when Claude is unavailable or over budget."""
+    user_lower = user_answer.lower().strip()
+    correct_lower = correct_answer.lower().strip()
+    
+    # Exact match
+    if user_lower == correct_lower:
+        return True
         
-        # Remove common words that don't carry meaning
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'}
+    # Check if user answer contains key concepts from correct answer
+    correct_words = set(correct_lower.split())
+    user_words = set(user_lower.split())
+    
+    # Remove common words that don't carry meaning
+    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'}
+    
+    meaningful_correct = correct_words - stop_words
+    meaningful_user = user_words - stop_words
+    
+    # If user answer contains most key concepts, consider it correct
+    if meaningful_correct and len(meaningful_user.intersection(meaningful_correct)) >= len(meaningful_correct) * 0.7:
+        return True
         
-        meaningful_correct = correct_words - stop_words
-        meaningful_user = user_words - stop_words
+    # Check for partial matches (if user answer is contained in or contains correct answer)
+    if len(user_lower) > 5 and (user_lower in correct_lower or correct_lower in user_lower):
+        return True
         
-        # If user answer contains most key concepts, consider it correct
-        if meaningful_correct and len(meaningful_user.intersection(meaningful_correct)) >= len(meaningful_correct) * 0.7:
-            return True
-            
-        # Check for partial matches (if user answer is contained in or contains correct answer)
-        if len(user_lower) > 5 and (user_lower in correct_lower or correct_lower in user_lower):
-            return True
-            
-        return False
+    return False
+
+def card_question_answer(card):
+    """Return the (question, correct_answer) pair for a flashcard of any type."""
+    if card.get('type') == 'vocabulary':
+        return f"What is the definition of: {card['term']}?", card['definition']
+    elif card.get('type') == 'fact':
+        return card['prompt'], card['content']
+    return card.get('question', ''), card.get('answer', '')
 
-def chatbot_session(flashcards):
-    """Interactive chatbot session using flashcards."""
+def card_choices(card, flashcards=()):
+    """Return the shuffled answer options for a multiple-choice question on ``card``.
+    
+    The options are the correct answer and the distractors generated with
+    the card. A card without enough of them (older decks, imported JSON)
+    borrows the answers of other cards in ``flashcards``, from the same
+    category first, so any deck can be studied this way without a Claude call.
+    """
+    _, correct_answer = card_question_answer(card)
+    correct_answer = str(correct_answer).strip()
+    options = [correct_answer]
+    for option in card.get('distractors') or []:
+        option = str(option).strip()
+        if option and option not in options:
+            options.append(option)
+    
+    if len(options) <= CHOICE_DISTRACTORS:
+        others = random.sample(flashcards, min(len(flashcards), CHOICE_SAMPLE))
+        others.sort(key=lambda other: other.get('category') != card.get('category'))
+        for other in others:
+            option = str(card_question_answer(other)[1]).strip()
+            if option and option not in options:
+                options.append(option)
+            if len(options) > CHOICE_DISTRACTORS:
+                break
+    
+    options = options[:CHOICE_DISTRACTORS + 1]
+    random.shuffle(options)
+    return options
+
+def chatbot_session(flashcards, progress_path=None, multiple_choice=False):
+    """Interactive chatbot session using flashcards.
+    
+    Cards are drawn from a spaced-repetition scheduler; when ``progress_path``
+    is given the per-card review state is loaded from and saved back to it.
+    With ``multiple_choice`` each question lists answer options and is graded
+    locally, without a Claude call.
+    """
     print("\n🤖 Flashcard Study Bot Started!")
     print("I'll ask you questions based on your flashcards.")
     print("Type 'quit' to exit, 'hint' for a hint, or 'skip' to skip.\n")
@@ -430,38 +612,43 @@ def chatbot_session(flashcards):
     score = 0
     questions_asked = 0
     
-    # Shuffle flashcards for random order
-    random.shuffle(flashcards)
-    
-    # Only take the number of questions requested
-    selected_flashcards = flashcards[:desired_questions]
+    # Cards that are due soonest come first; unseen cards come in random order.
+    # Progress follows stable card keys when the deck has them, so it survives regeneration
+    keys = [card.get('card_key') for card in flashcards]
+    if not all(keys):
+        keys = None
+    if progress_path:
+        scheduler = Scheduler.load(progress_path, total_available, keys)
+    else:
+        scheduler = Scheduler(total_available)
     
-    for card in selected_flashcards:
+    while questions_asked < desired_questions:
+        card_index = scheduler.draw()
+        if card_index is None:
+            break
+        card = flashcards[card_index]
         questions_asked += 1
+        hint_used = False
         
         # Ask question based on card type
-        if card['type'] == 'question_answer':
-            question = card['question']
-            correct_answer = card['answer']
-        elif card['type'] == 'vocabulary':
-            question = f"What is the definition of: {card['term']}?"
-            correct_answer = card['definition']
-        elif card['type'] == 'fact':
-            question = card['prompt']
-            correct_answer = card['content']
-        else:
-            continue
+        question, correct_answer = card_question_answer(card)
             
         print(f"📚 Question {questions_asked}/{desired_questions}:")
         print(f"Category: {card.get('category', 'General')} | Difficulty: {card.get('difficulty', 'Unknown')}")
         print(f"Q: {question}")
+        choices = card_choices(card, flashcards) if multiple_choice else None
+        if choices:
+            for number, choice in enumerate(choices, 1):
+                print(f"  {number}. {choice}")
         
         # Get user response
         user_answer = input("\nYour answer: ").strip()
         
         if user_answer.lower() == 'quit':
+            scheduler.release(card_index)
             break
         elif user_answer.lower() == 'skip':
+            scheduler.review(card_index, quality_for(False, skipped=True))
             print(f"⏭️  Skipped!")
             print(f"📖 Correct answer: {correct_answer}\n")
             continue
@@ -469,10 +656,18 @@ def chatbot_session(flashcards):
             # Generate hint using Claude
             hint = generate_hint(question, correct_answer)
             print(f"💡 Hint: {hint}")
+            hint_used = True
             user_answer = input("Your answer (after hint): ").strip()
             
-        # Check answer using Claude
-        is_correct = check_answer(question, correct_answer, user_answer)
+        if choices:
+            # An option number or the option itself; exact match, no Claude call
+            if user_answer.isdigit() and 1 <= int(user_answer) <= len(choices):
+                user_answer = choices[int(user_answer) - 1]
+            is_correct = user_answer == str(correct_answer).strip()
+        else:
+            # Check answer using Claude
+            is_correct = check_answer(question, correct_answer, user_answer)
+        scheduler.review(card_index, quality_for(is_correct, hint_used=hint_used))
         
         if is_correct:
             print("✅ Correct!")
@@ -484,6 +679,12 @@ def chatbot_session(flashcards):
         print(f"📖 Correct answer: {correct_answer}")
         print(f"Current score: {score}/{questions_asked}\n")
     
+    if progress_path:
+        try:
+            scheduler.save(progress_path, keys)
+        except Exception as e:
+            print(f"Error saving study progress: {e}")
+    
     # Final score with percentage
     if questions_asked > 0:
         percentage = (score / questions_asked) * 100
@@ -516,39 +717,51 @@ def generate_hint(question, answer):
     """
     
     try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=200,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.content[0].text.strip()
+        return call_claude("hint", prompt, max_tokens=200).strip()
     except:
+        return local_hint(answer)
+
+def local_hint(answer):
+    """A hint that needs no Claude call: the answer's length and first word."""
+    words = str(answer).split()
+    if not words:
         return "Think about the key concepts from your study material."
+    return f'The answer has {len(words)} word{"s" if len(words) != 1 else ""} and starts with "{words[0]}".'
 
 def main():
     """Main function to process PDF/URL and generate flashcards."""
+    logs.setup()
     if len(sys.argv) < 2:
         print("Usage:")
         print("  Generate flashcards from document: python main.py <path_to_file>")
         print("  Generate flashcards from URL: python main.py <url>")
-        print("  Study with chatbot: python main.py study <path_to_flashcard_json>")
+        print("  Study with chatbot: python main.py study <path_to_flashcard_json> [--multiple-choice]")
+        print("  Import decks into the library: python main.py library import <flashcard_json>...")
+        print("  Search the library: python main.py library search <query>")
+        print("  One deck from many URLs: python main.py urls <url_or_list_file>... [-o output.json]")
+        print("  One deck per document: python main.py batch <dir_or_list_file> [--out DIR] [--workers N]")
         print("\nSupported document formats: PDF, DOC, DOCX")
         print("\nExamples:")
         print("  python main.py document.pdf")
         print("  python main.py document.docx")
         print("  python main.py https://en.wikipedia.org/wiki/Machine_Learning")
         print("  python main.py study document_flashcards.json")
+        print("  python main.py library search backpropagation")
+        print("  python main.py urls reading_list.txt -o week1_flashcards.json")
+        print("  python main.py batch lectures/ --out decks")
         sys.exit(1)
     
     if sys.argv[1] == "study":
         # Chatbot mode
-        if len(sys.argv) != 3:
-            print("Usage for study mode: python main.py study <path_to_flashcard_json>")
+        args = sys.argv[2:]
+        multiple_choice = "--multiple-choice" in args
+        if multiple_choice:
+            args.remove("--multiple-choice")
+        if len(args) != 1:
+            print("Usage for study mode: python main.py study <path_to_flashcard_json> [--multiple-choice]")
             sys.exit(1)
             
-        json_path = sys.argv[2]
+        json_path = args[0]
         
         if not Path(json_path).exists():
             print(f"Error: Flashcard file '{json_path}' not found")
@@ -562,12 +775,26 @@ def main():
             sys.exit(1)
             
         print(f"Loaded {len(flashcards)} flashcards")
-        chatbot_session(flashcards)
+        progress_path = Path(json_path).with_name(Path(json_path).stem + "_progress.json")
+        chatbot_session(flashcards, progress_path, multiple_choice)
+        
+    elif sys.argv[1] == "library":
+        library_command(sys.argv[2:])
+        
+    elif sys.argv[1] == "urls":
+        urls_command(sys.argv[2:])
+        
+    elif sys.argv[1] == "batch":
+        batch_command(sys.argv[2:])
         
     else:
         # Content processing mode (PDF or URL)
         input_source = sys.argv[1]
         
+        if not CLAUDE_API_KEY:
+            print("Error: CLAUDE_API_KEY not found in environment variables. Please check your .env file.")
+            sys.exit(1)
+        
         # Determine if input is URL or file path
         if input_source.startswith(('http://', 'https://')):
             # URL processing mode
@@ -606,19 +833,37 @@ def main():
             print(f"Extracted {len(text)} characters from document")
             output_path = Path(file_path).stem + "_flashcards.json"
         
-        # Generate flashcards using Claude (same for both sources)
+        # Generate flashcards using Claude (same for both sources); when an
+        # earlier deck for this source exists, only its changed chunks are regenerated
+        from incremental import previous_chunks
+        previous = {}
+        if Path(output_path).exists():
+            saved = load_deck_file(output_path)
+            previous = previous_chunks(saved.get('flashcards', []), saved.get('chunks'))
+            if previous:
+                print(f"Found {len(previous)} chunks from the previous deck in {output_path}")
+        
         print("Generating flashcards with Claude AI...")
-        flashcards = generate_flashcards(text)
+        deck = generate_deck(text, previous)
         
-        if not flashcards:
+        if not deck['flashcards']:
             print("Failed to generate flashcards")
             sys.exit(1)
         
-        print(f"Generated {len(flashcards.get('flashcards', []))} flashcards")
+        print(f"Generated {len(deck['flashcards'])} flashcards")
+        flashcards = {'flashcards': deck['flashcards'], 'chunks': deck['manifest']}
         
         # Save flashcards to file
         save_flashcards(flashcards, output_path)
         
+        # Keep the deck searchable alongside everything else we have generated
+        try:
+            from deck_library import get_library
+            get_library().add_deck(output_path, deck['flashcards'], source=f"file:{Path(output_path).resolve()}",
+                                   chunks=deck['manifest'])
+        except Exception as e:
+            print(f"⚠️ Could not save deck to library: {e}")
+        
         # Also print to console
         print("\nGenerated Flashcards:")
         print(json.dumps(flashcards, indent=2, ensure_ascii=False))
@@ -626,42 +871,191 @@ def main():
         print(f"\n💡 To study with these flashcards, run:")
         print(f"python main.py study {output_path}")
 
+def library_command(args):
+    """Handle `python main.py library import|search ...`."""
+    from deck_library import get_library
+    
+    if len(args) < 2 or args[0] not in ("import", "search"):
+        print("Usage:")
+        print("  python main.py library import <flashcard_json>...")
+        print("  python main.py library search <query>")
+        sys.exit(1)
+    
+    library = get_library()
+    
+    if args[0] == "import":
+        for json_path in args[1:]:
+            try:
+                library.import_json_file(json_path)
+                print(f"📚 Imported {json_path}")
+            except Exception as e:
+                print(f"Error importing {json_path}: {e}")
+        return
+    
+    query = ' '.join(args[1:])
+    results = library.search(query)['results']
+    if not results:
+        print(f"No flashcards match '{query}'")
+        return
+    
+    for result in results:
+        card = result['card']
+        question, answer = card_question_answer(card)
+        print(f"[{result['deck_name']}] {question}")
+        print(f"    {answer}")
+
+def urls_command(args):
+    """Handle `python main.py urls <url_or_list_file>... [-o output.json]`."""
+    import asyncio
+    from url_batch import MAX_BATCH_URLS, ingest_urls
+    
+    output_path = "url_batch_flashcards.json"
+    if "-o" in args:
+        index = args.index("-o")
+        if index + 1 >= len(args):
+            print("Error: -o needs an output path")
+            sys.exit(1)
+        output_path = args[index + 1]
+        args = args[:index] + args[index + 2:]
+    
+    # Each argument is a URL or a text file with one URL per line
+    urls = []
+    for arg in args:
+        if arg.startswith(('http://', 'https://')):
+            urls.append(arg)
+        elif Path(arg).is_file():
+            lines = Path(arg).read_text(encoding='utf-8').splitlines()
+            urls.extend(line.strip() for line in lines if line.strip() and not line.startswith('#'))
+        else:
+            print(f"Error: '{arg}' is neither a URL nor a file")
+            sys.exit(1)
+    urls = list(dict.fromkeys(urls))
+    
+    if not urls:
+        print("Usage: python main.py urls <url_or_list_file>... [-o output.json]")
+        sys.exit(1)
+    if len(urls) > MAX_BATCH_URLS:
+        print(f"Error: at most {MAX_BATCH_URLS} URLs per batch")
+        sys.exit(1)
+    if not CLAUDE_API_KEY:
+        print("Error: CLAUDE_API_KEY not found in environment variables. Please check your .env file.")
+        sys.exit(1)
+    
+    print(f"Fetching {len(urls)} URLs...")
+    result = asyncio.run(ingest_urls(urls, generate_flashcards, sync_extract=extract_text_from_url))
+    
+    for source in result['sources']:
+        if source['ok']:
+            print(f"  ✅ {source['url']} ({source['chars']} characters)")
+        else:
+            print(f"  ❌ {source['url']}: {source['error']}")
+    if result['failed_chunks']:
+        print(f"⚠️  {result['failed_chunks']} of {result['chunks']} chunks failed to generate")
+    
+    flashcards = result['flashcards']
+    if not flashcards:
+        print("Failed to generate flashcards")
+        sys.exit(1)
+    
+    print(f"Generated {len(flashcards)} flashcards from {result['chunks']} chunks")
+    save_flashcards({"flashcards": flashcards}, output_path)
+    try:
+        from deck_library import get_library
+        get_library().add_deck(output_path, flashcards, source=f"file:{Path(output_path).resolve()}")
+    except Exception as e:
+        print(f"⚠️ Could not save deck to library: {e}")
+    
+    print(f"\n💡 To study with these flashcards, run:")
+    print(f"python main.py study {output_path}")
+
+def batch_command(args):
+    """Handle `python main.py batch <dir_or_list_file> [options]`."""
+    import argparse
+    import time
+    from batch_ingest import collect_inputs, input_base, run_batch
+    
+    parser = argparse.ArgumentParser(prog="python main.py batch",
+                                     description="Generate one deck per PDF/DOC/DOCX, resuming interrupted runs.")
+    parser.add_argument("source", help="directory of documents (searched recursively) or a file listing one path per line")
+    parser.add_argument("--out", default="decks", help="output directory for decks and manifest.json (default: decks)")
+    parser.add_argument("--workers", type=int, default=4, help="documents processed at once (default: 4)")
+    parser.add_argument("--claude-concurrency", type=int, default=2, help="Claude requests in flight at once (default: 2)")
+    parser.add_argument("--force", action="store_true", help="regenerate decks even if the document is unchanged")
+    parser.add_argument("--no-library", action="store_true", help="do not add the decks to the deck library")
+    options = parser.parse_args(args)
+    
+    if not Path(options.source).exists():
+        print(f"Error: '{options.source}' not found")
+        sys.exit(1)
+    if not CLAUDE_API_KEY:
+        print("Error: CLAUDE_API_KEY not found in environment variables. Please check your .env file.")
+        sys.exit(1)
+    
+    paths = collect_inputs(options.source)
+    if not paths:
+        print(f"No PDF, DOC or DOCX files found in '{options.source}'")
+        sys.exit(1)
+    
+    on_deck = None
+    if not options.no_library:
+        from deck_library import get_library
+        library = get_library()
+        
+        def on_deck(output_path, flashcards):
+            library.add_deck(output_path.name, flashcards, source=f"file:{output_path.resolve()}")
+    
+    limit_claude_concurrency(options.claude_concurrency)
+    print(f"Processing {len(paths)} documents with {options.workers} workers...")
+    start = time.perf_counter()
+    counts = run_batch(paths, options.out, extract_text_from_document, generate_flashcards,
+                       workers=options.workers, force=options.force, on_deck=on_deck,
+                       base=input_base(options.source))
+    print(f"\nDone in {time.perf_counter() - start:.1f}s: {counts['done']} generated, "
+          f"{counts['skipped']} unchanged, {counts['failed']} failed")
+    print(f"Progress is recorded in {Path(options.out) / 'manifest.json'}; rerun the same command to retry failures.")
+    if counts['failed']:
+        sys.exit(1)
+
 def extract_text_from_docx(docx_path):
     """Extract text content from a DOCX file."""
-    if not DOCX_AVAILABLE:
+    try:
+        from docx import Document
+    except ImportError:
         raise Exception("python-docx not installed. Install with: pip install python-docx")
     
-    try:
-        doc = Document(docx_path)
-        text = ""
+    with tracing.span("extract.docx", metrics.EXTRACTION_DOCX):
+        try:
+            doc = Document(docx_path)
+            text = ""
         
-        # Extract text from paragraphs
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
+            # Extract text from paragraphs
+            for paragraph in doc.paragraphs:
+                text += paragraph.text + "\n"
         
-        # Extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    text += cell.text + " "
-                text += "\n"
+            # Extract text from tables
+            for table in doc.tables:
+                for row in table.rows:
+                    for cell in row.cells:
+                        text += cell.text + " "
+                    text += "\n"
         
-        return text.strip()
-    except Exception as e:
-        print(f"Error reading DOCX: {e}")
-        return None
+            return text.strip()
+        except Exception as e:
+            log.warning("Error reading DOCX: %s", e)
+            return None
 
 def extract_text_from_doc(doc_path):
     """Extract text content from a DOC file using textract."""
-    try:
-        import textract
-        text = textract.process(doc_path).decode('utf-8')
-        return text.strip()
-    except ImportError:
-        raise Exception("textract not installed. Install with: pip install textract")
-    except Exception as e:
-        print(f"Error reading DOC: {e}")
-        return None
+    with tracing.span("extract.doc", metrics.EXTRACTION_DOC):
+        try:
+            import textract
+            text = textract.process(doc_path).decode('utf-8')
+            return text.strip()
+        except ImportError:
+            raise Exception("textract not installed. Install with: pip install textract")
+        except Exception as e:
+            log.warning("Error reading DOC: %s", e)
+            return None
 
 def extract_text_from_document(file_path):
     """Extract text from various document formats."""
@@ -677,37 +1071,87 @@ def extract_text_from_document(file_path):
     else:
         raise Exception(f"Unsupported file format: {extension}. Supported formats: PDF, DOC, DOCX")
 
-@app.post("/check-answer")
-async def check_answer_endpoint(question: str, correct_answer: str, user_answer: str):
-    is_correct = check_answer(question, correct_answer, user_answer)
-    return {"correct": is_correct}
+def create_app():
+    """Build the standalone FastAPI app served by `uvicorn main:app`.
+    
+    The web UI is served by app.py; this smaller API is only built when
+    something asks for `main.app`, so importing main never constructs it.
+    """
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import HTMLResponse
+    from pydantic import BaseModel
+    from static_cache import StaticCache
+    
+    app = FastAPI()
+    app.add_middleware(logs.RequestIdMiddleware)
+    
+    # The web app page is read once and served from memory with an ETag
+    shell = StaticCache()
+    if os.path.exists("templates/index.html"):
+        shell.add("/app", "templates/index.html", "text/html")
+    
+    # Pydantic models for API requests
+    class URLRequest(BaseModel):
+        url: str
+    
+    # Add this to handle HEAD requests
+    @app.head("/")
+    async def head_root():
+        return {}
+    
+    @app.get("/")
+    async def root():
+        return {"message": "Flashcard API is running"}
+    
+    @app.get("/app", response_class=HTMLResponse)
+    async def get_app(request: Request):
+        """Serve the flashcard web application."""
+        if "/app" not in shell:
+            raise HTTPException(status_code=404, detail="Application template not found")
+        return shell.response("/app", request)
+    
+    @app.post("/check-answer")
+    async def check_answer_endpoint(question: str, correct_answer: str, user_answer: str):
+        with usage.attribute("/check_answer"):
+            is_correct = check_answer(question, correct_answer, user_answer)
+        return {"correct": is_correct}
+    
+    @app.post("/generate-from-url")
+    async def generate_flashcards_from_url(request: URLRequest):
+        """API endpoint to generate flashcards from a URL."""
+        try:
+            import uuid
+            
+            log.info("Processing URL %s", request.url)
+            text = extract_text_from_url(request.url)
+            if not text:
+                raise HTTPException(status_code=400, detail="Failed to extract content from URL")
+            
+            log.info("Extracted %d characters from URL", len(text))
+            with usage.attribute("/generate-from-url"):
+                flashcards = generate_flashcards(text)
+            if not flashcards:
+                raise HTTPException(status_code=500, detail="Failed to generate flashcards")
+            
+            # Generate a session_id for compatibility with the frontend
+            session_id = str(uuid.uuid4())
+            
+            return {
+                "session_id": session_id,
+                "flashcards": flashcards.get('flashcards', []),
+                "message": f"Generated {len(flashcards.get('flashcards', []))} flashcards from URL"
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing URL: {str(e)}")
+    
+    return app
 
-@app.post("/generate-from-url")
-async def generate_flashcards_from_url(request: URLRequest):
-    """API endpoint to generate flashcards from a URL."""
-    try:
-        import uuid
-        
-        print(f"Processing URL: {request.url}")
-        text = extract_text_from_url(request.url)
-        if not text:
-            raise HTTPException(status_code=400, detail="Failed to extract content from URL")
-        
-        print(f"Extracted {len(text)} characters from URL")
-        flashcards = generate_flashcards(text)
-        if not flashcards:
-            raise HTTPException(status_code=500, detail="Failed to generate flashcards")
-        
-        # Generate a session_id for compatibility with the frontend
-        session_id = str(uuid.uuid4())
-        
-        return {
-            "session_id": session_id,
-            "flashcards": flashcards.get('flashcards', []),
-            "message": f"Generated {len(flashcards.get('flashcards', []))} flashcards from URL"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing URL: {str(e)}")
+def __getattr__(name):
+    # Build `main.app` on first access so `uvicorn main:app` keeps working
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # CLI mode only - web server uses app.py
@@ -0,0 +1,205 @@
+"""
+Prometheus-style metrics rendered in the text exposition format.
+
+Everything on the hot path is a plain attribute or list-slot increment on an
+object created ahead of time: no locks, and no allocation per observation
+once a label combination has been seen. Updates rely on the GIL, so under
+heavy thread contention a rare increment can be lost; that is an accepted
+trade-off for metrics that never block a request.
+"""
+from bisect import bisect_left
+from time import perf_counter
+
+# Latency buckets in seconds, from sub-millisecond grading lookups up to slow
+# whole-document generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow slot
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricFamily:
+    """A named metric with a fixed set of label names and one child per label combination."""
+
+    def __init__(self, name, help_text, kind, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.children = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """Return the child for these label values, creating it on first use.
+
+        Hot paths should call this once and keep the child rather than calling
+        it per request.
+        """
+        child = self.children.get(values)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == 'histogram' else Counter()
+            self.children[values] = child
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            labels = _format_labels(self.labelnames, values)
+            if self.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), values + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{labels} {child.sum}")
+                lines.append(f"{self.name}_count{labels} {child.count}")
+            else:
+                lines.append(f"{self.name}{labels} {child.value}")
+        return lines
+
+class GaugeFunction:
+    """A gauge whose per-label values are computed by a callback at scrape time."""
+
+    def __init__(self, name, help_text, labelname, callback):
+        self.name = name
+        self.help_text = help_text
+        self.labelname = labelname
+        self.callback = callback
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for value, amount in self.callback().items():
+            lines.append(f"{self.name}{_format_labels((self.labelname,), (value,))} {amount}")
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+REGISTRY = []
+
+def render_latest():
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Metric definitions
+
+HTTP_REQUEST_SECONDS = MetricFamily(
+    'flashcards_http_request_duration_seconds',
+    'HTTP request latency by route template and method.',
+    'histogram', ('route', 'method'),
+)
+
+EXTRACTION_SECONDS = MetricFamily(
+    'flashcards_extraction_duration_seconds',
+    'Time spent extracting text from a source.',
+    'histogram', ('source',),
+)
+EXTRACTION_PDF = EXTRACTION_SECONDS.labels('pdf')
+EXTRACTION_DOCX = EXTRACTION_SECONDS.labels('docx')
+EXTRACTION_DOC = EXTRACTION_SECONDS.labels('doc')
+EXTRACTION_URL = EXTRACTION_SECONDS.labels('url')
+
+CLAUDE_REQUEST_SECONDS = MetricFamily(
+    'flashcards_claude_request_duration_seconds',
+    'Claude API call latency by purpose and model tier.',
+    'histogram', ('purpose', 'tier'),
+)
+CLAUDE_BY_ROUTE = {
+    (purpose, tier): CLAUDE_REQUEST_SECONDS.labels(purpose, tier)
+    for purpose in ('generate', 'grade', 'hint') for tier in ('fast', 'large')
+}
+
+GRADE_ESCALATIONS = MetricFamily(
+    'flashcards_grade_escalations_total',
+    'Answers the fast model was unsure about and passed to the large model.',
+    'counter',
+).labels()
+
+JSON_SECONDS = MetricFamily(
+    'flashcards_json_duration_seconds',
+    'Time spent parsing generated flashcard JSON, and repairing it when parsing fails.',
+    'histogram', ('stage',),
+)
+JSON_PARSE = JSON_SECONDS.labels('parse')
+JSON_REPAIR = JSON_SECONDS.labels('repair')
+
+JSON_REPAIRS = MetricFamily(
+    'flashcards_json_repairs_total',
+    'Generated responses that needed a JSON repair fallback, by outcome.',
+    'counter', ('outcome',),
+)
+JSON_REPAIR_FIXED = JSON_REPAIRS.labels('fixed')
+JSON_REPAIR_PARTIAL = JSON_REPAIRS.labels('partial')
+JSON_REPAIR_FAILED = JSON_REPAIRS.labels('failed')
+
+CACHE_REQUESTS = MetricFamily(
+    'flashcards_cache_requests_total',
+    'Cache lookups by cache name and result.',
+    'counter', ('cache', 'result'),
+)
+
+def cache_counters(cache_name):
+    """Return the (hit, miss) counters for a named cache."""
+    return CACHE_REQUESTS.labels(cache_name, 'hit'), CACHE_REQUESTS.labels(cache_name, 'miss')
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request latency.
+
+    The label is the matched route template (e.g. ``/get_question``) rather
+    than the raw path, so session ids in URLs cannot blow up cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._by_route = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._histogram_for(scope).observe(perf_counter() - start)
+
+    def _histogram_for(self, scope):
+        route = scope.get('route')
+        path = route.path if route is not None else ('/static' if scope['path'].startswith('/static/') else 'unmatched')
+        by_method = self._by_route.get(path)
+        if by_method is None:
+            by_method = self._by_route[path] = {}
+        histogram = by_method.get(scope['method'])
+        if histogram is None:
+            histogram = by_method[scope['method']] = HTTP_REQUEST_SECONDS.labels(path, scope['method'])
+        return histogram
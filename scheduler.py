@@ -0,0 +1,132 @@
+"""
+Spaced-repetition scheduling (SM-2) with a due-time priority queue.
+"""
+import heapq
+import json
+import random
+import time
+
+DAY = 24 * 60 * 60
+
+# SM-2 parameters
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# A failed card comes back after this many seconds instead of waiting a day
+RELEARN_DELAY = 60
+
+def quality_for(correct, hint_used=False, skipped=False):
+    """Map a study result onto the SM-2 0-5 quality scale."""
+    if skipped:
+        return 0
+    if not correct:
+        return 1
+    return 3 if hint_used else 5
+
+class CardState:
+    """Per-card SM-2 state. ``due`` is a unix timestamp; 0 means never studied."""
+
+    __slots__ = ('ease', 'interval', 'repetitions', 'lapses', 'due')
+
+    def __init__(self, ease=DEFAULT_EASE, interval=0, repetitions=0, lapses=0, due=0.0):
+        self.ease = ease
+        self.interval = interval
+        self.repetitions = repetitions
+        self.lapses = lapses
+        self.due = due
+
+    def to_list(self):
+        return [self.ease, self.interval, self.repetitions, self.lapses, self.due]
+
+class Scheduler:
+    """Orders the cards of one deck by due time.
+
+    The heap is built once per deck (O(n)); after that each draw and each
+    review is O(log n), so a study session never walks the whole deck. Heap
+    entries are ``(due, tiebreak, index)`` where the random tiebreak keeps
+    unseen cards in a shuffled order without shuffling the deck itself.
+
+    A drawn card is out of the queue until it is reviewed or released, so it
+    cannot be handed out twice.
+    """
+
+    def __init__(self, card_count, states=None):
+        if states is None:
+            states = [CardState() for _ in range(card_count)]
+        elif len(states) != card_count:
+            raise ValueError(f"Expected {card_count} card states, got {len(states)}")
+        self.states = states
+        self._heap = [(state.due, random.random(), index) for index, state in enumerate(states)]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.states)
+
+    def draw(self):
+        """Take the card that is due soonest, or None if every card is drawn."""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def release(self, index):
+        """Put a drawn card back without recording a review."""
+        heapq.heappush(self._heap, (self.states[index].due, random.random(), index))
+
+    def review(self, index, quality, now=None):
+        """Record an SM-2 review for a drawn card and requeue it at its new due time."""
+        now = time.time() if now is None else now
+        state = self.states[index]
+
+        if quality >= 3:
+            if state.repetitions == 0:
+                state.interval = 1
+            elif state.repetitions == 1:
+                state.interval = 6
+            else:
+                state.interval = round(state.interval * state.ease)
+            state.repetitions += 1
+            state.due = now + state.interval * DAY
+        else:
+            state.repetitions = 0
+            state.interval = 0
+            state.lapses += 1
+            state.due = now + RELEARN_DELAY
+
+        state.ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.release(index)
+
+    def to_dict(self, keys=None):
+        data = {'cards': [state.to_list() for state in self.states]}
+        if keys is not None:
+            data['keys'] = list(keys)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        states = [CardState(*values) for values in data['cards']]
+        return cls(len(states), states)
+
+    def save(self, path, keys=None):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(keys), file)
+
+    @classmethod
+    def load(cls, path, card_count, keys=None):
+        """Load saved progress, starting fresh if it is missing or for a different deck.
+
+        ``keys`` are the cards' stable keys (see incremental.py). When both
+        they and the saved progress have keys, state is matched by key, so a
+        regenerated deck keeps the progress of its unchanged cards and new
+        cards start fresh.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            scheduler = cls.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(card_count)
+        if keys is not None and data.get('keys'):
+            saved = dict(zip(data['keys'], scheduler.states))
+            return cls(card_count, [saved.pop(key, None) or CardState() for key in keys])
+        if len(scheduler) != card_count:
+            return cls(card_count)
+        return scheduler
@@ -0,0 +1,130 @@
+"""
+In-memory cache for the app shell: the index page, PWA manifest, service
+worker and static assets.
+
+Files are read once when registered and served from memory with a strong
+ETag and a Cache-Control policy, answering If-None-Match revalidations with
+304. Compressible files get gzip (and brotli, when installed) variants at
+maximum compression, built when the file is registered at startup so no
+request waits for them. With ``reload=True`` (dev mode) each request checks
+the file's mtime and size and reloads it when it changed; a reload happens
+on the request path, so its variants use faster settings.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+
+from starlette.responses import Response
+
+import metrics
+from compression import BROTLI_AVAILABLE, COMPRESSIBLE_TYPES, choose_encoding
+
+if BROTLI_AVAILABLE:
+    import brotli
+
+# Bodies smaller than this are not worth a separate encoding
+MIN_COMPRESS_BYTES = 256
+
+def dev_mode():
+    """Whether DEBUG is set, in which case cached files reload when they change on disk."""
+    return os.environ.get('DEBUG', '').lower() in ('1', 'true', 'yes')
+
+ENCODINGS = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+def _encode(body, encoding, fast=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5 if fast else 11)
+    # mtime=0 makes the output identical across restarts
+    return gzip.compress(body, compresslevel=6 if fast else 9, mtime=0)
+
+class CachedFile:
+    """One file's bytes, validators and compressed variants."""
+
+    def __init__(self, path, media_type, cache_control, render=None):
+        self.path = Path(path)
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.render = render
+        self.compressible = media_type.startswith(COMPRESSIBLE_TYPES)
+        self.load()
+
+    def load(self, fast=False):
+        """Read the file and build its variants; ``fast`` trades size for speed."""
+        stat = self.path.stat()
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        self.body = self.render(self.path) if self.render else self.path.read_bytes()
+        self.digest = hashlib.sha256(self.body).hexdigest()[:20]
+        # encoding -> (body, etag); encodings that do not pay off are left out
+        self.variants = {}
+        if self.compressible and len(self.body) >= MIN_COMPRESS_BYTES:
+            for encoding in ENCODINGS:
+                encoded = _encode(self.body, encoding, fast)
+                if len(encoded) < len(self.body):
+                    self.variants[encoding] = (encoded, f'"{self.digest}-{encoding}"')
+
+    def changed(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != self.signature
+
+    def variant(self, encoding):
+        """Return (body, etag, encoding) for the best representation for ``encoding``."""
+        if encoding in self.variants:
+            body, etag = self.variants[encoding]
+            return body, etag, encoding
+        return self.body, f'"{self.digest}"', None
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+class StaticCache:
+    """Named in-memory responses; see the module docstring."""
+
+    def __init__(self, reload=None):
+        self.reload = dev_mode() if reload is None else reload
+        self.files = {}
+        self.revalidated, self.sent = metrics.cache_counters('static')
+
+    def add(self, name, path, media_type=None, cache_control='no-cache', render=None):
+        """Load ``path`` and serve it as ``name``. ``render(path)`` can produce the bytes instead of a plain read."""
+        media_type = media_type or mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+        self.files[name] = CachedFile(path, media_type, cache_control, render)
+
+    def add_directory(self, directory, prefix, cache_control):
+        """Load every file under ``directory``, named ``prefix`` plus its relative path."""
+        directory = Path(directory)
+        for path in sorted(directory.rglob('*')):
+            if path.is_file():
+                self.add(prefix + path.relative_to(directory).as_posix(), path, cache_control=cache_control)
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def response(self, name, request):
+        """Build the response for ``name``: 304 when the client's copy is current, else the cached bytes."""
+        cached = self.files[name]
+        if self.reload and cached.changed():
+            cached.load(fast=True)
+
+        encoding = choose_encoding(request.headers.get('accept-encoding', ''), brotli_available=BROTLI_AVAILABLE)
+        body, etag, used_encoding = cached.variant(encoding)
+        headers = {'ETag': etag, 'Cache-Control': cached.cache_control}
+        if cached.compressible:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            self.revalidated.inc()
+            return Response(status_code=304, headers=headers)
+
+        self.sent.inc()
+        if used_encoding:
+            headers['Content-Encoding'] = used_encoding
+        return Response(content=body, media_type=cached.media_type, headers=headers)
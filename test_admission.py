@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for admission control: token buckets, bounded work pools and the 429/503 responses
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app
+from admission import ClientQuotas, WorkPool
+
+CARDS = [{"type": "question_answer", "question": f"Q{i}", "answer": f"A{i}"} for i in range(3)]
+
+def test_token_bucket_refills_at_rate():
+    quotas = ClientQuotas('test', rate=0.5, burst=2)
+    assert quotas.take('a', now=0) == 0
+    assert quotas.take('a', now=0) == 0
+    # Empty: one token takes two seconds at 0.5/s
+    assert quotas.take('a', now=0) == pytest.approx(2.0)
+    assert quotas.take('b', now=0) == 0
+    assert quotas.take('a', now=2.0) == 0
+
+def test_quotas_forget_least_recent_clients():
+    quotas = ClientQuotas('test', rate=1, burst=1, max_clients=2)
+    for key in ('a', 'b', 'c'):
+        quotas.take(key, now=0)
+    assert list(quotas.buckets) == ['b', 'c']
+
+def test_full_pool_sheds_load_with_retry_after():
+    pool = WorkPool('test', workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        queued = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as rejected:
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert int(error.headers['Retry-After']) >= 1
+    assert pool.pending == 0
+    pool.executor.shutdown()
+
+def test_study_quota_returns_429(monkeypatch):
+    monkeypatch.setattr(app, "check_answer", lambda question, correct, answer: True)
+    monkeypatch.setattr(app, "generate_hint", lambda question, answer: "a hint")
+    monkeypatch.setattr(app, "interactive_quota", ClientQuotas('interactive', rate=0.01, burst=1))
+    client = TestClient(app.app)
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": CARDS}).json()["session_id"]
+    study_session_id = client.post("/start_session", json={"session_id": session_id, "num_questions": 3}).json()["study_session_id"]
+    body = {"study_session_id": study_session_id}
+    client.post("/get_question", json=body)
+
+    assert client.post("/get_hint", json=body).status_code == 200
+    response = client.post("/get_hint", json=body)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    with client.websocket_connect(f"/ws/study/{study_session_id}") as websocket:
+        assert websocket.receive_json()["type"] == "question"
+        websocket.send_json({"type": "hint"})
+        reply = websocket.receive_json()
+    assert reply["type"] == "error" and reply["status"] == 429
+    assert reply["retry_after"] >= 1
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar attempt store and the card analytics
+"""
+import time
+
+from fastapi.testclient import TestClient
+
+import app
+import attempts
+from attempts import AttemptStore
+
+EASY = {"category": "cells", "difficulty": "easy", "question": "What is ATP?"}
+HARD = {"category": "genetics", "difficulty": "Hard", "question": "Define epistasis"}
+
+def fill(store):
+    # The card labelled easy is missed most of the time; the hard one plays as labelled
+    for i in range(10):
+        store.record("easy-1", EASY, EASY["question"], f"s{i % 2}", correct=i < 3, latency=4.0, hint=i == 0, now=1000)
+        store.record("hard-1", HARD, HARD["question"], f"s{i % 2}", correct=i < 4, latency=9.0, now=2000)
+
+def test_analytics_finds_mislabelled_cards():
+    store = AttemptStore(block_size=4)
+    fill(store)
+    report = store.analytics(min_attempts=5)
+    assert report["attempts"] == 20 and report["sessions"] == 2 and report["cards"] == 2
+    assert report["accuracy"] == 0.35
+    assert [row["category"] for row in report["categories"]] == ["cells", "genetics"]
+    assert report["categories"][0]["hint_rate"] == 0.1
+    assert report["categories"][0]["mean_latency_ms"] == 4000
+    easy = report["difficulty"][0]
+    assert easy["difficulty"] == "easy" and easy["cards_played_as"] == {"easy": 0, "medium": 0, "hard": 1}
+    assert [card["card_key"] for card in report["hardest_cards"]] == ["easy-1", "hard-1"]
+    assert [card["card_key"] for card in report["mislabelled_cards"]] == ["easy-1"]
+    assert report["mislabelled_cards"][0]["observed_difficulty"] == "hard"
+    # Too few attempts to judge
+    assert store.analytics(min_attempts=11)["mislabelled_cards"] == []
+    assert store.analytics(since=1500)["attempts"] == 10
+
+def test_spilled_attempts_are_reloaded_from_disk(tmp_path):
+    store = AttemptStore(tmp_path, block_size=4)
+    fill(store)
+    assert len(store) == 20 and store.size == 0
+    store.record("easy-1", EASY, EASY["question"], "s9", correct=True, latency=1.0)
+    store.flush()
+
+    reloaded = AttemptStore(tmp_path, block_size=4)
+    assert len(reloaded) == 21
+    assert reloaded.analytics() == store.analytics()
+
+def test_study_answers_are_recorded_for_analytics(monkeypatch):
+    monkeypatch.setattr(attempts, "STORE", AttemptStore())
+    monkeypatch.setattr(app, "check_answer", lambda question, correct, answer: answer == correct)
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    client = TestClient(app.app)
+    cards = [{"question": "Q", "answer": "A", "category": "cells", "difficulty": "easy"}]
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": cards}).json()["session_id"]
+    body = {"study_session_id": client.post("/start_session", json={"session_id": session_id, "num_questions": 1}).json()["study_session_id"]}
+    client.post("/get_question", json=body)
+    client.post("/submit_answer", json={**body, "answer": "A"})
+
+    assert client.get("/admin/analytics").status_code == 403
+    report = client.get("/admin/analytics", params={"min_attempts": 1}, headers={"X-Admin-Token": "secret"}).json()
+    assert report["attempts"] == 1 and report["accuracy"] == 1.0
+    assert report["hardest_cards"][0]["card_key"] == attempts.card_identity(cards[0], "Q", "A")
+
+def test_latency_runs_from_showing_the_question_to_the_answer(monkeypatch):
+    def slow_check(question, correct, answer):
+        time.sleep(0.2)
+        return answer == correct
+
+    monkeypatch.setattr(app, "check_answer", slow_check)
+    client = TestClient(app.app)
+    cards = [{"question": f"Q{i}", "answer": f"A{i}"} for i in range(2)]
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": cards}).json()["session_id"]
+    study_session_id = client.post("/start_session", json={"session_id": session_id, "num_questions": 2}).json()["study_session_id"]
+
+    with client.websocket_connect(f"/ws/study/{study_session_id}") as socket:
+        socket.receive_json()
+        socket.send_json({"type": "answer", "answer": "x", "question_number": 1})
+        assert socket.receive_json()["next"]["question_number"] == 2
+        # Reading the result before showing the pushed question is not answer time
+        time.sleep(0.2)
+        socket.send_json({"type": "question"})
+        socket.receive_json()
+        socket.send_json({"type": "answer", "answer": "x", "question_number": 2})
+        socket.receive_json()
+
+    # Neither latency includes the 200 ms grading call or the pause
+    assert attempts.STORE.analytics()["categories"][0]["mean_latency_ms"] < 150
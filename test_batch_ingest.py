@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for resumable batch deck generation
+"""
+import json
+
+from batch_ingest import MANIFEST_NAME, collect_inputs, input_base, run_batch
+
+def make_inputs(tmp_path):
+    source = tmp_path / "lectures"
+    (source / "week2").mkdir(parents=True)
+    (source / "intro.pdf").write_text("intro text")
+    (source / "week2" / "graphs.docx").write_text("graph text")
+    (source / "notes.txt").write_text("not a document")
+    return source
+
+def extract(path):
+    text = path.read_text()
+    return None if "broken" in text else text
+
+def test_rerun_skips_unchanged_documents_and_retries_failures(tmp_path):
+    source = make_inputs(tmp_path)
+    out = tmp_path / "decks"
+    generated = []
+
+    def generate(text):
+        generated.append(text)
+        return {"flashcards": [{"type": "fact", "prompt": text, "content": "x"}]}
+
+    paths = collect_inputs(source)
+    assert [path.name for path in paths] == ["intro.pdf", "graphs.docx"]
+
+    (source / "intro.pdf").write_text("broken")
+    counts = run_batch(paths, out, extract, generate, workers=2, report=lambda line: None, base=source)
+    assert counts == {"done": 1, "skipped": 0, "failed": 1}
+    assert json.loads((out / "week2" / "graphs_flashcards.json").read_text())["flashcards"][0]["prompt"] == "graph text"
+
+    # The failed document is fixed; the finished one is unchanged and skipped
+    (source / "intro.pdf").write_text("intro text")
+    counts = run_batch(paths, out, extract, generate, workers=2, report=lambda line: None, base=source)
+    assert counts == {"done": 1, "skipped": 1, "failed": 0}
+    assert generated == ["graph text", "intro text"]
+
+    manifest = json.loads((out / MANIFEST_NAME).read_text())["files"]
+    assert manifest["intro.pdf"]["status"] == "done"
+    assert manifest["week2/graphs.docx"]["output"] == "week2/graphs_flashcards.json"
+
+    # Editing a document regenerates only that deck
+    (source / "week2" / "graphs.docx").write_text("new graph text")
+    counts = run_batch(paths, out, extract, generate, workers=2, report=lambda line: None, base=source)
+    assert counts == {"done": 1, "skipped": 1, "failed": 0}
+    assert generated[-1] == "new graph text"
+
+def test_adding_a_file_in_another_folder_keeps_existing_keys(tmp_path):
+    source = tmp_path / "src"
+    (source / "week1").mkdir(parents=True)
+    (source / "week1" / "a.pdf").write_text("a text")
+    out = tmp_path / "out"
+    generated = []
+
+    def generate(text):
+        generated.append(text)
+        return {"flashcards": [{"type": "fact", "prompt": text, "content": "x"}]}
+
+    def run():
+        return run_batch(collect_inputs(source), out, extract, generate, report=lambda line: None,
+                         base=input_base(source))
+
+    assert run() == {"done": 1, "skipped": 0, "failed": 0}
+    (source / "week2").mkdir()
+    (source / "week2" / "b.pdf").write_text("b text")
+    assert run() == {"done": 1, "skipped": 1, "failed": 0}
+    assert generated == ["a text", "b text"]
+    assert sorted(json.loads((out / MANIFEST_NAME).read_text())["files"]) == ["week1/a.pdf", "week2/b.pdf"]
+    assert (out / "week1" / "a_flashcards.json").exists()
+
+    # A list file's keys are relative to the folder holding it
+    listing = tmp_path / "reading.txt"
+    listing.write_text("src/week1/a.pdf\n")
+    assert input_base(listing) == tmp_path.resolve()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for coalescing identical concurrent generation requests
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import app
+from coalesce import SingleFlight, normalize_url
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com:443/notes?b=2&utm_source=x&a=1#intro") == "https://example.com/notes?a=1&b=2"
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/a") == "http://example.com:8080/a"
+    assert normalize_url("https://example.com/a?fbclid=abc") == normalize_url("https://example.com/a")
+    assert normalize_url("https://example.com/A") != normalize_url("https://example.com/a")
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+
+    async def work(result):
+        calls.append(result)
+        await asyncio.sleep(0.05)
+        if result == "bad":
+            raise ValueError(result)
+        return result
+
+    async def scenario():
+        flights = SingleFlight("test")
+        shared = await asyncio.gather(*(flights.run("a", lambda: work("ok")) for _ in range(5)))
+        failed = await asyncio.gather(*(flights.run("b", lambda: work("bad")) for _ in range(3)),
+                                      return_exceptions=True)
+        again = await flights.run("a", lambda: work("later"))
+        return shared, failed, again, flights.inflight
+
+    shared, failed, again, inflight = asyncio.run(scenario())
+    assert shared == ["ok"] * 5
+    assert all(isinstance(error, ValueError) for error in failed)
+    # Nothing is kept once the work finishes
+    assert again == "later" and inflight == {}
+    assert calls == ["ok", "bad", "later"]
+
+def test_same_url_requested_at_once_generates_once(monkeypatch):
+    generated = []
+    saved = []
+    lock = threading.Lock()
+
+    def slow_generate(url):
+        with lock:
+            generated.append(url)
+        time.sleep(0.3)
+        return {'flashcards': [{"question": "Q", "answer": "A"}], 'manifest': []}
+
+    monkeypatch.setattr(app, "generate_from_url", slow_generate)
+    monkeypatch.setattr(app, "save_to_library", lambda name, flashcards, source, chunks=None: saved.append(name))
+    urls = ["https://example.com/notes?utm_source=class", "https://EXAMPLE.com/notes", "https://example.com/notes#top"]
+
+    with TestClient(app.app) as client:
+        with ThreadPoolExecutor(len(urls)) as pool:
+            responses = list(pool.map(lambda url: client.post("/generate-from-url", json={"url": url}), urls))
+
+    assert [response.status_code for response in responses] == [200] * len(urls)
+    assert len(generated) == 1 and len(saved) == 1
+    # Every request still gets its own study session
+    assert len({response.json()["session_id"] for response in responses}) == len(urls)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite deck library and its full-text search
+"""
+import deck_library
+from deck_library import DeckLibrary, build_match_query
+
+DECK = [
+    {"type": "question_answer", "category": "neural networks", "difficulty": "medium",
+     "question": "What is backpropagation?", "answer": "An algorithm for computing gradients"},
+    {"type": "vocabulary", "category": "neural networks", "difficulty": "easy",
+     "term": "Gradient descent", "definition": "Optimisation that follows the negative gradient"},
+    {"type": "fact", "category": "history", "difficulty": "hard",
+     "prompt": "Year the perceptron was introduced", "content": "1958"},
+]
+
+def test_build_match_query_quotes_words():
+    assert build_match_query('back-prop "OR" NEAR(') == '"back" "prop" "OR" "NEAR"'
+    assert build_match_query("  ") is None
+
+def test_search_ranks_and_paginates(tmp_path):
+    library = DeckLibrary(str(tmp_path / "library.db"))
+    library.add_deck("ml", DECK, source="test:ml")
+
+    page = library.search("gradient", page_size=1)
+    assert page["has_more"] is True
+    assert len(page["results"]) == 1
+    # The vocabulary card mentions "gradient" in its term, which is weighted higher
+    assert page["results"][0]["card"]["term"] == "Gradient descent"
+
+    second = library.search("gradient", page=2, page_size=1)
+    assert second["has_more"] is False
+    assert second["results"][0]["card"]["question"] == "What is backpropagation?"
+
+    assert library.search_cards("perceptron", 10)[0]["content"] == "1958"
+
+def test_add_deck_replaces_same_source(tmp_path):
+    library = DeckLibrary(str(tmp_path / "library.db"))
+    library.add_deck("ml", DECK, source="test:ml")
+    deck_id = library.add_deck("ml", DECK[:1], source="test:ml")
+
+    assert [deck["id"] for deck in library.list_decks()] == [deck_id]
+    assert library.get_deck(deck_id) == DECK[:1]
+    assert library.search("perceptron")["results"] == []
+
+def test_common_words_are_not_ranked(tmp_path, monkeypatch):
+    library = DeckLibrary(str(tmp_path / "library.db"))
+    library.add_deck("ml", DECK, source="test:ml")
+    # "gradient" is in two cards, so with this limit it counts as common
+    monkeypatch.setattr(deck_library, "MAX_TERM_CARDS", 1)
+
+    results = library.search("gradient descent")["results"]
+    assert [result["card"]["term"] for result in results] == ["Gradient descent"]
+    assert results[0]["score"] > 0
+
+    # Only common words: the newest matches, unranked
+    results = library.search("gradient")["results"]
+    assert [result["card"]["type"] for result in results] == ["vocabulary", "question_answer"]
+    assert {result["score"] for result in results} == {0.0}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for compact deck responses, cursor-paginated deck retrieval and response compression
+"""
+import json
+
+from fastapi.testclient import TestClient
+
+import app
+from compression import choose_encoding
+
+CARDS = [
+    {"type": "question_answer", "category": "Biology" if i % 2 else "History", "question": f"Q{i}", "answer": f"A{i}" * 20}
+    for i in range(250)
+]
+
+def upload_deck(client, **params):
+    files = {"file": ("deck.json", json.dumps({"flashcards": CARDS}), "application/json")}
+    return client.post("/upload", files=files, params=params)
+
+def test_upload_returns_counts_unless_cards_requested():
+    client = TestClient(app.app)
+    compact = upload_deck(client).json()
+    assert compact["flashcard_count"] == len(CARDS)
+    assert "flashcards" not in compact
+    assert upload_deck(client, include_cards=True).json()["flashcards"] == CARDS
+
+def test_deck_pages_follow_cursor():
+    client = TestClient(app.app)
+    session_id = upload_deck(client).json()["session_id"]
+
+    cards = []
+    cursor = ""
+    while True:
+        page = client.get(f"/sessions/{session_id}/flashcards", params={"cursor": cursor, "limit": 100}).json()
+        assert page["total"] == len(CARDS)
+        cards.extend(page["flashcards"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [card["id"] for card in cards] == list(range(len(CARDS)))
+    assert [{key: value for key, value in card.items() if key != "id"} for card in cards] == CARDS
+    assert client.get(f"/sessions/{session_id}/flashcards", params={"cursor": "x"}).status_code == 400
+    assert client.get(f"/sessions/{session_id}/flashcards", params={"limit": 10_000}).status_code == 400
+    assert client.get("/sessions/missing/flashcards").status_code == 404
+
+def test_filter_returns_card_ids():
+    client = TestClient(app.app)
+    session_id = upload_deck(client).json()["session_id"]
+    result = client.post("/filter_flashcards", json={"session_id": session_id, "filters": {"category": "Biology"}}).json()
+    assert result["ids"] == list(range(1, len(CARDS), 2))
+    assert result["count"] == len(CARDS) // 2 and "flashcards" not in result
+
+def test_large_json_is_gzipped_and_small_json_is_not():
+    client = TestClient(app.app)
+    session_id = upload_deck(client).json()["session_id"]
+    large = client.get(f"/sessions/{session_id}/flashcards", params={"limit": 500}, headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert len(large.json()["flashcards"]) == len(CARDS)
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br", brotli_available=True) == "br"
+    assert choose_encoding("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0.5", brotli_available=True) == "gzip"
+    assert choose_encoding("identity") is None
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for main-content HTML extraction against the fixture corpus
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+import html_text
+
+CORPUS = Path(__file__).parent / "benchmarks" / "html_corpus"
+EXPECTED = json.loads((CORPUS / "expected.json").read_text())
+PARSERS = [False] + ([True] if html_text.LXML_AVAILABLE else [])
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+@pytest.mark.parametrize("page", sorted(EXPECTED))
+def test_corpus_keeps_content_and_drops_boilerplate(page, use_lxml):
+    text = html_text.extract_main_text((CORPUS / page).read_bytes(), use_lxml=use_lxml)
+    flat = " ".join(text.split())
+    assert [snippet for snippet in EXPECTED[page]["include"] if snippet not in flat] == []
+    assert [snippet for snippet in EXPECTED[page]["exclude"] if snippet in flat] == []
+
+@pytest.mark.parametrize("use_lxml", PARSERS)
+def test_limits_bound_node_count_and_output(use_lxml):
+    html = "<div>" + "<p>Short paragraph, with a comma, and enough text to score.</p>" * 5000 + "</div>"
+    text = html_text.extract_main_text(html, max_nodes=1000, use_lxml=use_lxml)
+    assert 0 < text.count("\n") < 1000
+
+    text = html_text.extract_main_text(html, max_chars=2000, use_lxml=use_lxml)
+    assert 0 < len(text) <= 2000
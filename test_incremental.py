@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for chunk manifests and incremental regeneration of changed documents
+"""
+import threading
+
+from deck_library import DeckLibrary
+import incremental
+import main
+from incremental import generate_deck, previous_chunks, split_chunks
+
+def make_document(pages=40, edit=None):
+    texts = []
+    for page in range(pages):
+        lines = [f"Slide {page}: sentence {line} about topic {page * 7 + line} in some detail." for line in range(25)]
+        if page == edit:
+            lines[3] = lines[3].replace("detail", "detial")
+        texts.append("\n".join(lines))
+    return "\f".join(texts)
+
+class CountingGenerator:
+    """Stands in for generate_sections: one card per chunk, recording each call."""
+
+    def __init__(self, fail=False):
+        self.chunks = []
+        self.calls = 0
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, sections):
+        with self._lock:
+            self.chunks.extend(sections)
+            self.calls += 1
+        if self.fail:
+            return None
+        return [[{"type": "fact", "prompt": chunk[:20], "content": str(len(chunk))}] for chunk in sections]
+
+def test_editing_a_page_changes_one_chunk():
+    before, _ = split_chunks(make_document())
+    after, _ = split_chunks(make_document(edit=30))
+    assert len(before) > 5
+    assert len(set(after) - set(before)) == 1
+
+def test_only_changed_chunks_are_regenerated():
+    generate = CountingGenerator()
+    first = generate_deck(make_document(), generate)
+    assert first['generated'] == len(generate.chunks) == len(first['manifest'])
+    # Every chunk of a first ingest goes out in one call
+    assert first['calls'] == generate.calls == 1
+
+    again = CountingGenerator()
+    previous = previous_chunks(first['flashcards'], first['manifest'])
+    second = generate_deck(make_document(edit=30), again, previous)
+    assert len(again.chunks) == 1 and "detial" in again.chunks[0]
+    assert second['reused'] == len(first['manifest']) - 1
+    # Cards of untouched chunks keep their identity
+    keys = {card['card_key'] for card in first['flashcards']}
+    assert len(keys & {card['card_key'] for card in second['flashcards']}) == len(keys) - 1
+
+def test_short_deck_keeps_the_cards_of_untouched_slides():
+    # 12 slides, well under one generation input
+    generate = CountingGenerator()
+    first = generate_deck(make_document(12), generate)
+    assert len(first['manifest']) > 1 and generate.calls == 1
+
+    again = CountingGenerator()
+    previous = previous_chunks(first['flashcards'], first['manifest'])
+    second = generate_deck(make_document(12, edit=11), again, previous)
+    assert len(again.chunks) == 1 and "detial" in again.chunks[0]
+    keys = {card['card_key'] for card in first['flashcards']}
+    assert len(keys & {card['card_key'] for card in second['flashcards']}) == len(keys) - 1
+
+def test_long_documents_are_capped_and_batches_share_one_pool():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def generate(sections):
+        with lock:
+            in_flight.append(sections)
+            peak.append(len(in_flight))
+        threading.Event().wait(0.02)
+        with lock:
+            in_flight.remove(sections)
+        return [[{"type": "fact", "prompt": chunk[:20], "content": str(len(chunk))}] for chunk in sections]
+
+    # Long documents at once, as from concurrent uploads
+    decks = []
+    threads = [threading.Thread(target=lambda n=n: decks.append(generate_deck(make_document(400 + n), generate)))
+               for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [deck['calls'] for deck in decks] == [1] * 5
+    chunks, _ = split_chunks(make_document(400))
+    assert sum(len(chunk) for chunk in chunks) <= incremental.BATCH_CHARS
+    assert max(peak) <= incremental.GENERATE_CONCURRENCY
+
+def test_cleanup_stats_are_returned():
+    deck = generate_deck("Course notes\nPage 1\f" * 3 + "Real content about cells.", CountingGenerator())
+    assert deck['cleanup']['chars_before'] > deck['cleanup']['chars_after']
+
+def test_failed_chunks_are_left_out_of_the_manifest():
+    first = generate_deck(make_document(), CountingGenerator())
+    previous = previous_chunks(first['flashcards'], first['manifest'])
+    second = generate_deck(make_document(edit=30), CountingGenerator(fail=True), previous)
+    assert second['failed'] == 1
+    assert len(second['manifest']) == len(first['manifest']) - 1
+    # A manifest that does not match its deck is not trusted
+    assert previous_chunks(first['flashcards'][1:], first['manifest']) == {}
+
+def test_library_keeps_the_manifest(tmp_path):
+    library = DeckLibrary(str(tmp_path / "library.db"))
+    deck = generate_deck(make_document(), CountingGenerator())
+    library.add_deck("slides.pdf", deck['flashcards'], source="upload:slides.pdf", chunks=deck['manifest'])
+    stored = library.get_source_deck("upload:slides.pdf")
+    assert stored == {'flashcards': deck['flashcards'], 'chunks': deck['manifest']}
+    assert library.get_source_deck("upload:other.pdf") is None
+
+def test_edited_upload_reuses_chunks_from_any_deck(tmp_path):
+    library = DeckLibrary(str(tmp_path / "library.db"))
+    first = generate_deck(make_document(), CountingGenerator())
+    library.add_deck("slides.pdf", first['flashcards'], source="upload:pdf:aaa", chunks=first['manifest'])
+    # A different file that happens to share the name is stored alongside it
+    library.add_deck("slides.pdf", [{"type": "fact", "prompt": "p", "content": "c"}], source="upload:pdf:bbb")
+    assert len(library.list_decks()) == 2
+
+    again = CountingGenerator()
+    second = generate_deck(make_document(edit=30), again, library.chunk_cards)
+    assert len(again.chunks) == 1
+    assert second['reused'] == len(first['manifest']) - 1
+
+def test_sections_share_one_call_and_cards_follow_their_section(monkeypatch):
+    prompts = []
+
+    def generate(text, clean=True, sections=None):
+        prompts.append((text, sections))
+        return {'flashcards': [{"prompt": "a", "section": 1}, {"prompt": "b", "section": "2"},
+                               {"prompt": "c"}, {"prompt": "d", "section": 9}]}
+
+    monkeypatch.setattr(main, "generate_flashcards", generate)
+    grouped = main.generate_sections(["first chunk", "second chunk", "third chunk"])
+    assert len(prompts) == 1 and prompts[0][1] == 3 and "[Section 3]\nthird chunk" in prompts[0][0]
+    # Untagged or out-of-range cards stay with the card before them; a section with no cards failed
+    assert [[card["prompt"] for card in cards] if cards else None for cards in grouped] == [["a"], ["b", "c", "d"], None]
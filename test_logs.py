@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for queued structured logging, request IDs and sampling
+"""
+import io
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+import app
+import logs
+from admission import ClientQuotas
+
+def make_record(message, **extra):
+    record = logging.LogRecord('test', logging.DEBUG, __file__, 1, message, (), None)
+    record.__dict__.update(extra)
+    return record
+
+def test_request_id_is_echoed_and_follows_work_into_the_pool(monkeypatch):
+    seen = []
+
+    def extract(url):
+        seen.append(logs.current_request_id())
+        return ""
+
+    monkeypatch.setattr(app, "extract_text_from_url", extract)
+    monkeypatch.setattr(app, "CLIENT_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(app, "generate_quota", ClientQuotas('generate', rate=1, burst=10))
+    client = TestClient(app.app)
+    response = client.post("/generate-from-url", json={"url": "https://example.com/ids"},
+                           headers={"X-Request-ID": "req-42"})
+    assert response.headers["x-request-id"] == "req-42"
+    assert seen == ["req-42"]
+
+    # Header values that could forge log lines are replaced
+    response = client.get("/metrics", headers={"X-Request-ID": "bad id\nINFO spoofed"})
+    assert response.headers["x-request-id"] != "bad id\nINFO spoofed"
+    assert len(response.headers["x-request-id"]) == 16
+
+def test_sampled_records_are_thinned_and_others_kept():
+    assert logs.ContextFilter(sample_rate=0).filter(make_record("preview", sampled=True)) is False
+    assert logs.ContextFilter(sample_rate=1).filter(make_record("preview", sampled=True)) is True
+    record = make_record("status")
+    assert logs.ContextFilter(sample_rate=0).filter(record) is True
+    assert record.request_id == "-"
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.DroppingQueueHandler(queue.Queue(1))
+    dropped = logs.DROPPED.value
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+    assert handler.queue.qsize() == 1
+    assert logs.DROPPED.value == dropped + 1
+
+def test_json_lines_are_written_by_the_listener():
+    stream = io.StringIO()
+    listener = logs.setup(level="info", fmt="json", sample_rate=0, stream=stream)
+    try:
+        log = logging.getLogger("test_logs")
+        log.info("Extracted %d characters", 1200, extra={"source": "pdf"})
+        log.debug("Claude response preview", extra=logs.SAMPLED)
+        listener.queue.join()
+        entry = json.loads(stream.getvalue())
+        assert entry["message"] == "Extracted 1200 characters"
+        assert entry["level"] == "info" and entry["request_id"] == "-"
+        assert entry["source"] == "pdf"
+    finally:
+        logs.setup()
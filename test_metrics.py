@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus-style metrics module
+"""
+from metrics import MetricFamily, REGISTRY, render_latest
+
+def test_histogram_renders_cumulative_buckets():
+    family = MetricFamily('test_latency_seconds', 'Test latency.', 'histogram', ('stage',), buckets=(0.1, 1.0))
+    try:
+        child = family.labels('parse')
+        assert family.labels('parse') is child
+        for value in (0.05, 0.5, 0.5, 3.0):
+            child.observe(value)
+
+        text = render_latest()
+        assert 'test_latency_seconds_bucket{stage="parse",le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{stage="parse",le="1.0"} 3' in text
+        assert 'test_latency_seconds_bucket{stage="parse",le="+Inf"} 4' in text
+        assert 'test_latency_seconds_count{stage="parse"} 4' in text
+    finally:
+        REGISTRY.remove(family)
+
+def test_counter_labels_are_escaped():
+    family = MetricFamily('test_events_total', 'Test events.', 'counter', ('name',))
+    try:
+        family.labels('say "hi"').inc(2)
+        assert 'test_events_total{name="say \\"hi\\""} 2' in render_latest()
+    finally:
+        REGISTRY.remove(family)
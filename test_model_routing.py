@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for routing Claude calls to model tiers and escalating unsure grades
+"""
+import main
+import metrics
+
+class ScriptedClient:
+    """Answers each call with the next scripted reply and records the model used."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.models = []
+        self.messages = self
+
+    def create(self, model, max_tokens, messages, **kwargs):
+        self.models.append(model)
+        reply = self.replies.pop(0)
+        return type('Message', (), {'content': [type('Content', (), {'text': reply})()]})()
+
+def test_grading_and_hints_use_the_fast_tier(monkeypatch):
+    client = ScriptedClient("CORRECT", "Think about the membrane.")
+    monkeypatch.setattr(main, "client", client)
+    assert main.check_answer("What is ATP?", "Energy currency", "energy") is True
+    assert main.generate_hint("What is ATP?", "Energy currency") == "Think about the membrane."
+    assert client.models == [main.MODEL_TIERS['fast'], main.MODEL_TIERS['fast']]
+
+def test_unsure_grade_escalates_to_the_large_tier(monkeypatch):
+    client = ScriptedClient("UNSURE", "INCORRECT")
+    monkeypatch.setattr(main, "client", client)
+    escalations = metrics.GRADE_ESCALATIONS.value
+    assert main.check_answer("What is ATP?", "Energy currency", "a sugar") is False
+    assert client.models == [main.MODEL_TIERS['fast'], main.MODEL_TIERS['large']]
+    assert metrics.GRADE_ESCALATIONS.value == escalations + 1
+
+def test_grade_verdict():
+    assert main.grade_verdict(" correct.") is True
+    assert main.grade_verdict("INCORRECT") is False
+    assert main.grade_verdict("UNSURE") is None
+    assert main.grade_verdict("maybe") is None
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the SM-2 spaced-repetition scheduler
+"""
+from scheduler import DAY, RELEARN_DELAY, Scheduler, quality_for
+
+def test_draw_hands_out_each_card_once():
+    scheduler = Scheduler(100)
+    drawn = [scheduler.draw() for _ in range(100)]
+    assert sorted(drawn) == list(range(100))
+    assert scheduler.draw() is None
+
+def test_failed_cards_come_back_before_known_cards():
+    scheduler = Scheduler(3)
+    now = 1_000_000.0
+    first, second, third = scheduler.draw(), scheduler.draw(), scheduler.draw()
+    scheduler.review(first, quality_for(True), now=now)
+    scheduler.review(second, quality_for(False), now=now)
+    scheduler.review(third, quality_for(True, hint_used=True), now=now)
+
+    assert scheduler.states[second].due == now + RELEARN_DELAY
+    assert scheduler.states[first].due == now + DAY
+    assert scheduler.draw() == second
+
+def test_intervals_grow_and_ease_is_bounded():
+    scheduler = Scheduler(1)
+    intervals = []
+    for _ in range(4):
+        scheduler.review(scheduler.draw(), 5, now=0)
+        intervals.append(scheduler.states[0].interval)
+    assert intervals[:2] == [1, 6]
+    assert intervals[3] > intervals[2] > 6
+
+    for _ in range(20):
+        scheduler.review(scheduler.draw(), 0, now=0)
+    assert scheduler.states[0].ease == 1.3
+    assert scheduler.states[0].repetitions == 0
+
+def test_progress_round_trip(tmp_path):
+    path = tmp_path / "deck_progress.json"
+    scheduler = Scheduler(5)
+    scheduler.review(scheduler.draw(), 5, now=0)
+    scheduler.save(path)
+
+    restored = Scheduler.load(path, 5)
+    assert [s.to_list() for s in restored.states] == [s.to_list() for s in scheduler.states]
+    # Progress saved for a different deck size is ignored
+    assert all(s.due == 0 for s in Scheduler.load(path, 6).states)
+
+def test_progress_follows_card_keys(tmp_path):
+    path = tmp_path / "deck_progress.json"
+    scheduler = Scheduler(3)
+    for _ in range(3):
+        index = scheduler.draw()
+        scheduler.review(index, 5 if index == 1 else 1, now=0)
+    scheduler.save(path, ["a-0", "b-0", "c-0"])
+
+    # "c-0" was regenerated as "d-0" and a card was added in front
+    restored = Scheduler.load(path, 4, ["e-0", "a-0", "b-0", "d-0"])
+    assert restored.states[1].to_list() == scheduler.states[0].to_list()
+    assert restored.states[2].to_list() == scheduler.states[1].to_list()
+    assert restored.states[0].due == 0 and restored.states[3].due == 0
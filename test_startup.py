@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Tests that importing main stays cheap: no API key needed, no heavy libraries loaded
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ("PyPDF2", "anthropic", "lxml", "requests", "docx", "fastapi")
+
+def test_import_main_is_lazy():
+    env = {key: value for key, value in os.environ.items() if key != "CLAUDE_API_KEY"}
+    script = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+def test_import_app_leaves_numpy_for_the_first_answer():
+    script = "import sys, app; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_main_app_is_built_on_demand():
+    import main
+    assert main.app is main.app
+    assert "/generate-from-url" in [route.path for route in main.app.routes]
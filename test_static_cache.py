@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory app shell cache: ETags, 304 revalidation, precompressed variants and dev reload
+"""
+import gzip
+import os
+
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import app
+import static_cache
+from static_cache import StaticCache
+
+def make_request(**headers):
+    raw = [(name.replace('_', '-').lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': raw})
+
+def test_index_revalidates_with_304():
+    client = TestClient(app.app)
+    first = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in first.headers
+
+    again = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+
+def test_precompressed_variant_has_its_own_etag():
+    client = TestClient(app.app)
+    plain = client.get("/sw.js", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/sw.js", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    # Decoded once by the client, so the middleware did not encode it a second time
+    assert compressed.content == plain.content
+    assert client.get("/sw.js", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]}).status_code == 200
+
+def test_static_files_and_manifest():
+    client = TestClient(app.app)
+    icon = client.get("/static/icons/icon-72x72.png")
+    assert icon.status_code == 200 and icon.headers["content-type"] == "image/png"
+    assert "max-age" in icon.headers["cache-control"]
+    assert client.get("/static/missing.png").status_code == 404
+    assert client.get("/manifest.json").json()["icons"]
+
+def test_reload_picks_up_changes(tmp_path):
+    path = tmp_path / "page.js"
+    path.write_text("console.log('one');" * 20)
+    cache = StaticCache(reload=True)
+    cache.add("page", path)
+    first = cache.response("page", make_request(accept_encoding="gzip"))
+    assert gzip.decompress(first.body).startswith(b"console.log('one')")
+
+    path.write_text("console.log('two');" * 30)
+    os.utime(path, ns=(0, 10**18))
+    second = cache.response("page", make_request(accept_encoding="gzip"))
+    assert gzip.decompress(second.body).startswith(b"console.log('two')")
+    assert second.headers["etag"] != first.headers["etag"]
+
+def test_variants_are_built_when_files_are_added(tmp_path, monkeypatch):
+    path = tmp_path / "page.js"
+    path.write_text("console.log('one');" * 20)
+    cache = StaticCache(reload=True)
+    cache.add("page", path)
+    assert "gzip" in cache.files["page"].variants
+
+    # Serving never compresses; a dev reload rebuilds with the fast settings
+    calls = []
+    real_encode = static_cache._encode
+    monkeypatch.setattr(static_cache, "_encode", lambda body, encoding, fast=False: calls.append(fast) or real_encode(body, encoding, fast))
+    cache.response("page", make_request(accept_encoding="gzip"))
+    assert calls == []
+    path.write_text("console.log('two');" * 30)
+    os.utime(path, ns=(0, 10**18))
+    cache.response("page", make_request(accept_encoding="gzip"))
+    assert calls and all(calls)
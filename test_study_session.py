@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the study session endpoints and the study WebSocket channel
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app
+import main
+
+CARDS = [{"type": "question_answer", "question": f"Q{i}", "answer": f"A{i}"} for i in range(5)]
+
+def make_client(monkeypatch):
+    monkeypatch.setattr(app, "check_answer", lambda question, correct, answer: answer == correct)
+    monkeypatch.setattr(app, "generate_hint", lambda question, answer: "a hint")
+    return TestClient(app.app)
+
+def start_study_session(client, num_questions):
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": CARDS}).json()["session_id"]
+    response = client.post("/start_session", json={"session_id": session_id, "num_questions": num_questions})
+    return response.json()["study_session_id"]
+
+def correct_answer_for(question):
+    return "A" + question["question"][1:]
+
+def test_http_study_flow(monkeypatch):
+    client = make_client(monkeypatch)
+    study_session_id = start_study_session(client, 3)
+    body = {"study_session_id": study_session_id}
+
+    seen = set()
+    for number in range(1, 4):
+        question = client.post("/get_question", json=body).json()
+        # Asking again before answering returns the same card
+        assert client.post("/get_question", json=body).json() == question
+        assert question["question_number"] == number
+        seen.add(question["question"])
+        result = client.post("/submit_answer", json={**body, "answer": correct_answer_for(question)}).json()
+        assert result["correct"] is True
+
+    assert len(seen) == 3
+    final = client.post("/get_question", json=body).json()
+    assert final["complete"] is True and final["final_score"] == 3
+
+def test_second_answer_to_a_card_being_graded_is_rejected(monkeypatch):
+    release = threading.Event()
+
+    def slow_check(question, correct, answer):
+        release.wait(5)
+        return answer == correct
+
+    client = make_client(monkeypatch)
+    monkeypatch.setattr(app, "check_answer", slow_check)
+    study_session_id = start_study_session(client, 2)
+    question = client.post("/get_question", json={"study_session_id": study_session_id}).json()
+    study_data = app.get_study_session(study_session_id)
+    answer = correct_answer_for(question)
+
+    async def double_submit():
+        first = asyncio.create_task(app.submit_study_answer(study_session_id, study_data, answer, "testclient"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            await app.submit_study_answer(study_session_id, study_data, answer, "testclient")
+        assert rejected.value.status_code == 409
+        release.set()
+        return await first
+
+    assert asyncio.run(double_submit())["correct"] is True
+    assert study_data["answered"] == 1 and study_data["score"] == 1
+    assert study_data["grading"] is None
+
+def test_websocket_pushes_next_question_and_resumes(monkeypatch):
+    client = make_client(monkeypatch)
+    study_session_id = start_study_session(client, 2)
+
+    with client.websocket_connect(f"/ws/study/{study_session_id}") as socket:
+        question = socket.receive_json()
+        assert question["type"] == "question" and question["question_number"] == 1
+
+        socket.send_json({"type": "hint", "question_number": 1})
+        assert socket.receive_json() == {"type": "hint", "hint": "a hint"}
+
+        socket.send_json({"type": "answer", "answer": correct_answer_for(question), "question_number": 1})
+        result = socket.receive_json()
+        assert result["type"] == "result" and result["correct"] is True
+        assert result["next"]["question_number"] == 2
+
+    # Reconnecting resumes on the question that was pushed before the disconnect
+    with client.websocket_connect(f"/ws/study/{study_session_id}") as socket:
+        resumed = socket.receive_json()
+        assert resumed["question"] == result["next"]["question"]
+
+        # A resend for the already-answered question is rejected, not graded
+        socket.send_json({"type": "answer", "answer": "x", "question_number": 1})
+        assert socket.receive_json()["status"] == 409
+
+        socket.send_json({"type": "answer", "answer": "SKIPPED", "question_number": 2})
+        assert socket.receive_json()["next"]["complete"] is True
+
+def test_websocket_rejects_unknown_session(monkeypatch):
+    client = make_client(monkeypatch)
+    with client.websocket_connect("/ws/study/missing") as socket:
+        assert socket.receive_json() == {"type": "error", "detail": "Invalid study session"}
+
+def test_multiple_choice_is_graded_without_claude(monkeypatch):
+    def no_model(*args):
+        raise AssertionError("multiple-choice answers must not be graded by Claude")
+
+    monkeypatch.setattr(app, "check_answer", no_model)
+    client = TestClient(app.app)
+    cards = [{**card, "distractors": ["wrong 1", "wrong 2", "wrong 3"]} for card in CARDS]
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": cards}).json()["session_id"]
+    started = client.post("/start_session", json={"session_id": session_id, "num_questions": 2, "multiple_choice": True}).json()
+    body = {"study_session_id": started["study_session_id"]}
+
+    question = client.post("/get_question", json=body).json()
+    answer = correct_answer_for(question)
+    assert sorted(question["choices"]) == sorted([answer, "wrong 1", "wrong 2", "wrong 3"])
+    # The options keep their order until the question is answered
+    assert client.post("/get_question", json=body).json()["choices"] == question["choices"]
+    assert client.post("/submit_answer", json={**body, "answer": answer}).json()["correct"] is True
+
+    client.post("/get_question", json=body)
+    assert client.post("/submit_answer", json={**body, "answer": "wrong 2"}).json()["correct"] is False
+
+def test_cards_without_distractors_borrow_other_answers():
+    choices = main.card_choices(CARDS[0], CARDS)
+    assert len(choices) == main.CHOICE_DISTRACTORS + 1
+    assert "A0" in choices and len(set(choices)) == len(choices)
+    assert set(choices) <= {card["answer"] for card in CARDS}
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the cleanup pass that runs on extracted text before generation
+"""
+from text_cleanup import clean_text
+
+def make_pages(count):
+    pages = []
+    for number in range(1, count + 1):
+        pages.append("\n".join([
+            "CS229 Lecture Notes  -  Spring 2025",
+            f"Paragraph {number} explains gradient descent   and its learning rate in detail.",
+            "Summary",
+            f"Momentum smooths the updates of step {number} with a running average of gradients.",
+            f"Page {number} of {count}",
+        ]))
+    return "\f".join(pages)
+
+def test_running_headers_footers_and_page_numbers_are_removed():
+    text, stats = clean_text(make_pages(6))
+    assert "CS229 Lecture Notes" not in text
+    assert "Page 3 of 6" not in text
+    assert "Paragraph 4 explains gradient descent and its learning rate in detail." in text
+    # Short repeated lines inside the page are content, not boilerplate
+    assert text.count("Summary") == 6
+    assert stats["header_footer_lines"] == 12
+    assert stats["chars_after"] < stats["chars_before"] and stats["tokens_saved"] > 0
+
+def test_numbered_headings_are_not_running_headers():
+    pages = []
+    for number in range(1, 7):
+        pages.append("\n".join([
+            f"Question {number} (10 marks)",
+            f"Explain how step {number} of the Krebs cycle regenerates its carrier molecules.",
+            f"End of question {number}",
+            f"Notes - Chapter {(number + 1) // 2} - p. {number}",
+        ]))
+    text, stats = clean_text("\f".join(pages))
+    assert all(f"Question {number} (10 marks)" in text for number in range(1, 7))
+    assert all(f"End of question {number}" in text for number in range(1, 7))
+    # Page labels and chapter numbers that hold for several pages are still running headers
+    assert "Chapter" not in text
+    assert stats["header_footer_lines"] == 6
+
+def test_short_documents_keep_their_edges():
+    text, _ = clean_text(make_pages(2))
+    assert text.count("CS229 Lecture Notes") == 2
+
+def test_boilerplate_and_duplicate_paragraphs_are_removed():
+    paragraph = "Mitochondria produce most of the chemical energy needed by the cell."
+    text, stats = clean_text("\n".join([
+        "We use cookies to improve your experience. Accept all cookies",
+        paragraph,
+        "Share this article",
+        "The inner membrane is folded into cristae, which increases its surface area.",
+        paragraph,
+    ]))
+    assert text == paragraph + "\nThe inner membrane is folded into cristae, which increases its surface area."
+    assert stats["boilerplate_lines"] == 2
+    assert stats["duplicate_lines"] == 1
+
+def test_long_paragraph_mentioning_cookies_is_kept():
+    long_line = "Cookies were first used in 1994; " * 6
+    text, _ = clean_text("Browsers accept cookies that we use cookies for. " + long_line)
+    assert "Cookies were first used in 1994" in text
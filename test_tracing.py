@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for request tracing spans and the stack-sampling profiler
+"""
+import threading
+import time
+
+import tracing
+
+def test_server_timing_sums_repeated_spans():
+    header = tracing.server_timing_header([("claude.grade", 0.05), ("parse", 0.002), ("parse", 0.003)], 0.06)
+    assert header == 'claude.grade;dur=50.0, parse;dur=5.0;desc="2 calls", total;dur=60.0'
+
+def test_span_records_into_current_trace():
+    trace = []
+    token = tracing._current_trace.set(trace)
+    try:
+        with tracing.span("work"):
+            pass
+    finally:
+        tracing._current_trace.reset(token)
+    assert [name for name, _ in trace] == ["work"]
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_sampler_profiles_only_armed_requests():
+    sampler = tracing.StackSampler(interval=0.001)
+    assert sampler.request_started() is False
+
+    sampler.arm(1)
+    assert sampler.request_started() is True
+    assert sampler.request_started() is False
+    worker = threading.Thread(target=busy_loop, args=(0.05,))
+    worker.start()
+    worker.join()
+    sampler.request_finished()
+
+    report = sampler.report()
+    assert report["requests_profiled"] == 1 and report["requests_remaining"] == 0
+    assert report["samples"] > 0
+    assert any(entry["function"].endswith(":busy_loop") for entry in report["functions"])
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for concurrent multi-URL ingestion
+"""
+import asyncio
+
+from benchmarks.fixtures import fixture, serve_directory
+from url_batch import cap_sources, ingest_urls, pack_chunks
+
+def fake_generate(chunk):
+    return {"flashcards": [{"type": "question_answer", "question": chunk[:40], "answer": str(len(chunk))}]}
+
+def test_failed_urls_are_reported_without_failing_the_batch():
+    page = fixture("html", 50)
+    with serve_directory(page.parent) as base_url:
+        urls = [f"{base_url}/{page.name}", f"{base_url}/missing.html", "ftp://example.com/file"]
+        result = asyncio.run(ingest_urls(urls, fake_generate))
+
+    ok, missing, invalid = result["sources"]
+    assert ok["ok"] and ok["chars"] > 1000 and ok["error"] is None
+    assert missing == {"url": urls[1], "ok": False, "chars": 0, "truncated": False, "error": "HTTP 404"}
+    assert invalid["error"] == "Not an http(s) URL"
+    assert result["chunks"] == 1 and result["failed_chunks"] == 0
+    assert len(result["flashcards"]) == 1
+
+def test_pack_chunks_splits_long_texts_and_labels_sources():
+    text = "\n".join(f"Line {i} of the article." for i in range(500))
+    sources = [{"url": "https://a.example/1", "ok": True, "text": text},
+               {"url": "https://b.example/2", "ok": True, "text": "short text"}]
+    chunks = pack_chunks(sources, chunk_chars=2000)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    assert all(chunk.startswith("Source: https://a.example/1") for chunk in chunks[:-1])
+    assert "Source: https://b.example/2\nshort text" in chunks[-1]
+    # Nothing is lost in the split
+    assert sum(chunk.count("of the article.") for chunk in chunks) == 500
+
+def test_combined_text_is_capped_and_truncation_reported():
+    page = fixture("html", 50)
+    with serve_directory(page.parent) as base_url:
+        urls = [f"{base_url}/{page.name}?copy={i}" for i in range(3)]
+        size = asyncio.run(ingest_urls(urls[:1], fake_generate))["sources"][0]["chars"]
+        result = asyncio.run(ingest_urls(urls, fake_generate, max_chars=size + size // 2))
+
+    first, second, third = result["sources"]
+    assert not first["truncated"] and first["chars"] == size
+    assert second["truncated"] and second["chars"] == size // 2
+    assert third["ok"] and third["truncated"] and third["chars"] == 0
+    assert result["chunks"] == 1
+
+    sources = cap_sources([{"url": "u", "ok": True, "chars": 10, "text": "x" * 10}], max_chars=4)
+    assert sources[0]["text"] == "xxxx" and sources[0]["truncated"]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the token ledger, daily budgets and the usage report
+"""
+from fastapi.testclient import TestClient
+
+import app
+import main
+import usage
+from usage import TokenLedger
+
+DAY_START = 1_700_006_400  # midnight UTC
+
+def test_ledger_aggregates_per_key_and_endpoint():
+    ledger = TokenLedger()
+    with usage.attribute("/submit_answer", "session:a"):
+        ledger.record("grade", "fast", 200, 5, 0.001, now=DAY_START + 10)
+        ledger.record("grade", "large", 300, 5, 0.002, now=DAY_START + 20)
+    with usage.attribute("/upload", "client:1.2.3.4"):
+        ledger.record("generate", "large", 20_000, 8_000, 0.18, now=DAY_START + 30)
+    # The next UTC day starts from zero
+    with usage.attribute("/submit_answer", "session:a"):
+        ledger.record("grade", "fast", 100, 5, 0.0005, now=DAY_START + usage.DAY)
+
+    assert ledger.used("session:a", now=DAY_START + 60) == 510
+    assert ledger.over_budget("session:a", 500, now=DAY_START + 60)
+    assert not ledger.over_budget("session:a", 0, now=DAY_START + 60)
+
+    report = ledger.report(usage.day_of(DAY_START))
+    assert report["total"]["calls"] == 3 and report["total"]["input_tokens"] == 20_500
+    assert report["endpoints"][0]["endpoint"] == "/upload"
+    assert [entry["key"] for entry in report["keys"]] == ["client:1.2.3.4", "session:a"]
+
+def test_call_claude_records_response_usage(monkeypatch):
+    class Client:
+        def __init__(self):
+            self.messages = self
+
+        def create(self, model, max_tokens, messages):
+            text = type("Content", (), {"text": "CORRECT"})()
+            tokens = type("Usage", (), {"input_tokens": 1_000_000, "output_tokens": 0})()
+            return type("Message", (), {"content": [text], "usage": tokens})()
+
+    ledger = TokenLedger()
+    monkeypatch.setattr(main, "client", Client())
+    monkeypatch.setattr(usage, "LEDGER", ledger)
+    with usage.attribute("/submit_answer", "session:b"):
+        main.call_claude("grade", "prompt", max_tokens=5)
+    assert ledger.used("session:b") == 1_000_000
+    assert ledger.report()["total"]["cost"] == main.MODEL_PRICES["fast"][0]
+
+def test_over_budget_session_is_graded_locally(monkeypatch):
+    def no_model(*args):
+        raise AssertionError("an over-budget session must not call Claude")
+
+    monkeypatch.setattr(app, "check_answer", no_model)
+    monkeypatch.setattr(app, "generate_hint", no_model)
+    monkeypatch.setattr(app, "SESSION_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(usage, "LEDGER", TokenLedger())
+    client = TestClient(app.app)
+    cards = [{"type": "question_answer", "question": "What is ATP?", "answer": "The energy currency of the cell"}]
+    session_id = client.post("/create_session_from_flashcards", json={"flashcards": cards}).json()["session_id"]
+    body = {"study_session_id": client.post("/start_session", json={"session_id": session_id}).json()["study_session_id"]}
+    with usage.attribute("/submit_answer", f"session:{session_id}"):
+        usage.LEDGER.record("grade", "fast", 150, 5, 0.0)
+
+    client.post("/get_question", json=body)
+    assert client.post("/get_hint", json=body).json()["hint"].endswith('starts with "The".')
+    result = client.post("/submit_answer", json={**body, "answer": "energy currency of the cell"}).json()
+    assert result["correct"] is True and result["graded_locally"] is True
+
+def test_new_sessions_share_the_client_budget(monkeypatch):
+    monkeypatch.setattr(app, "check_answer", lambda question, correct, answer: answer == correct)
+    monkeypatch.setattr(app, "generate_hint", lambda question, answer: "a hint")
+    monkeypatch.setattr(app, "CLIENT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(usage, "LEDGER", TokenLedger())
+    client = TestClient(app.app)
+    cards = [{"type": "question_answer", "question": "What is ATP?", "answer": "The energy currency of the cell"}]
+
+    def start():
+        session_id = client.post("/create_session_from_flashcards", json={"flashcards": cards}).json()["session_id"]
+        body = {"study_session_id": client.post("/start_session", json={"session_id": session_id}).json()["study_session_id"]}
+        client.post("/get_question", json=body)
+        return session_id, body
+
+    session_id, body = start()
+    # Grading is counted against the client as well as the session
+    with usage.attribute("/submit_answer", f"session:{session_id}", "client:testclient"):
+        usage.LEDGER.record("grade", "fast", 150, 5, 0.0)
+    assert usage.LEDGER.used("client:testclient") == 155
+
+    # A fresh session has its own budget left, but the client does not
+    _, body = start()
+    result = client.post("/submit_answer", json={**body, "answer": "energy currency of the cell"}).json()
+    assert result["graded_locally"] is True
+
+def test_client_over_generation_budget_gets_429(monkeypatch):
+    monkeypatch.setattr(app, "CLIENT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(usage, "LEDGER", TokenLedger())
+    with usage.attribute("/generate-from-url", "client:testclient"):
+        usage.LEDGER.record("generate", "large", 150, 0, 0.0)
+    response = TestClient(app.app).post("/generate-from-url", json={"url": "https://example.com"})
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) <= usage.DAY
+
+def test_usage_report_needs_admin_token(monkeypatch):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    client = TestClient(app.app)
+    assert client.get("/admin/usage").status_code == 403
+    report = client.get("/admin/usage", headers={"X-Admin-Token": "secret"}).json()
+    assert report["budgets"]["session_tokens_per_day"] == app.SESSION_TOKEN_BUDGET
+    assert {"day", "total", "endpoints", "keys"} <= set(report)
@@ -0,0 +1,174 @@
+"""
+Cleanup of extracted text before it is sent for flashcard generation.
+
+Extractors hand over everything they find. PDFs repeat running headers,
+footers and page numbers on every page, and web pages keep cookie notices
+and share prompts that survive main-content extraction (link lists and
+menus are already dropped there by link density). Every such line is paid
+for in input tokens. ``clean_text`` removes them, collapses whitespace and
+drops repeated lines and paragraphs, and reports what it saved.
+``clean_pages`` does the same but keeps the pages apart, for chunking.
+
+Pages are separated by form feeds (``\\f``), as extract_text_from_pdf
+writes them; text without page breaks skips the cross-page checks.
+"""
+import re
+
+import metrics
+
+PAGE_BREAK = '\f'
+# Lines this close to the top or bottom of a page are header/footer candidates
+EDGE_LINES = 2
+# Lines up to this long may differ only in their numbers ("Chapter 3 - Page 12")
+# and still count as the same running header, if the numbers look like page
+# labels or like a chapter number that stays the same for several pages
+MAX_NUMBERED_HEADER_CHARS = 60
+# A header/footer line must recur on at least this share of pages (and on 3 or more)
+REPEAT_SHARE = 0.5
+# Shorter lines (headings, list items) can legitimately repeat and are kept
+MIN_DUPLICATE_CHARS = 40
+# Boilerplate patterns only apply to short lines, never to real paragraphs
+MAX_BOILERPLATE_CHARS = 160
+# Rough characters per token for English prose, for reporting only
+CHARS_PER_TOKEN = 4
+
+WHITESPACE = re.compile(r'[ \t\u00a0\u2000-\u200b\u3000]+')
+DIGITS = re.compile(r'\d+')
+PAGE_LABEL = re.compile(r'\bp(age|g)?\.?\s*\d|\d+\s*(of|/)\s*\d+', re.IGNORECASE)
+PAGE_NUMBER = re.compile(r'^(page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(\s*(of|/)\s*\d{1,4})?$', re.IGNORECASE)
+BOILERPLATE = re.compile(
+    r'\b(we use cookies|this (web)?site uses cookies|accept (all )?cookies|cookie (policy|settings)|'
+    r'all rights reserved|skip to (main )?content|sign (in|up) to|subscribe to (our|the) newsletter|'
+    r'share (this|on) (article|page|facebook|twitter|linkedin)|follow us on|advertisement|'
+    r'download (the|our) app|javascript is (disabled|required))\b',
+    re.IGNORECASE,
+)
+
+PREPROCESS_CHARS = metrics.MetricFamily(
+    'flashcards_preprocess_chars_total',
+    'Characters of extracted text before and after cleanup.',
+    'counter', ('stage',),
+)
+CHARS_IN = PREPROCESS_CHARS.labels('input')
+CHARS_OUT = PREPROCESS_CHARS.labels('output')
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _line_keys(line):
+    """The line's exact key, and its number-agnostic template key for short lines."""
+    line = line.lower()
+    if len(line) > MAX_NUMBERED_HEADER_CHARS or not DIGITS.search(line):
+        return line, None
+    # A prefix keeps templates apart from exact lines
+    return line, '\0' + DIGITS.sub('#', line)
+
+def _is_running_numbers(occurrences):
+    """True when a template's numbers look like a running header's, not numbered content.
+
+    ``occurrences`` is [(line, numbers)] in page order. Page labels ("Page 3",
+    "3 of 10", "3/10") qualify. Otherwise every number that changes must never
+    go down and must stay the same for two pages or more on average, like a
+    chapter number; numbered headings ("Question 1", "Question 2") change on
+    every page and are kept.
+    """
+    if all(PAGE_LABEL.search(line) for line, _ in occurrences):
+        return True
+    columns = list(zip(*(numbers for _, numbers in occurrences)))
+    varying = [column for column in columns if len(set(column)) > 1]
+    return all(
+        list(column) == sorted(column) and len(set(column)) * 2 <= len(column)
+        for column in varying
+    )
+
+def _edge_indexes(lines):
+    content = [index for index, line in enumerate(lines) if line]
+    return set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+
+def repeated_edge_lines(pages):
+    """Return the keys of lines that recur near the top or bottom of most pages."""
+    if len(pages) < 3:
+        return set()
+    counts = {}
+    templates = {}
+    for lines in pages:
+        seen = set()
+        for index in _edge_indexes(lines):
+            exact, template = _line_keys(lines[index])
+            if exact not in seen:
+                counts[exact] = counts.get(exact, 0) + 1
+            if template is not None and template not in seen:
+                numbers = tuple(int(number) for number in DIGITS.findall(exact))
+                templates.setdefault(template, []).append((exact, numbers))
+            seen.update((exact, template))
+    needed = max(3, len(pages) * REPEAT_SHARE)
+    repeated = {key for key, count in counts.items() if count >= needed}
+    repeated.update(
+        template for template, occurrences in templates.items()
+        if len(occurrences) >= needed and _is_running_numbers(occurrences)
+    )
+    return repeated
+
+def clean_pages(text):
+    """Return (cleaned_pages, stats) for extracted document or web text.
+
+    Empty pages are dropped. ``stats`` holds chars_before, chars_after, an
+    estimate of tokens_saved and a count for each kind of removed line.
+    """
+    stats = {
+        'chars_before': len(text), 'chars_after': 0, 'tokens_saved': 0,
+        'header_footer_lines': 0, 'page_number_lines': 0, 'boilerplate_lines': 0, 'duplicate_lines': 0,
+    }
+    pages = [
+        [WHITESPACE.sub(' ', line).strip() for line in page.splitlines()]
+        for page in text.split(PAGE_BREAK)
+    ]
+    repeated = repeated_edge_lines(pages)
+
+    cleaned = []
+    seen = set()
+    for lines in pages:
+        kept = []
+        edges = _edge_indexes(lines)
+        for index, line in enumerate(lines):
+            if not line:
+                # Keep one blank line as a paragraph break
+                if kept and kept[-1]:
+                    kept.append('')
+                continue
+            if index in edges:
+                if any(key in repeated for key in _line_keys(line)):
+                    stats['header_footer_lines'] += 1
+                    continue
+                if PAGE_NUMBER.match(line):
+                    stats['page_number_lines'] += 1
+                    continue
+            if len(line) <= MAX_BOILERPLATE_CHARS and BOILERPLATE.search(line):
+                stats['boilerplate_lines'] += 1
+                continue
+            if len(line) >= MIN_DUPLICATE_CHARS:
+                key = line.lower()
+                if key in seen:
+                    stats['duplicate_lines'] += 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+        page = '\n'.join(kept).strip()
+        if page:
+            cleaned.append(page)
+
+    # Measured as clean_text joins the pages
+    joined = '\n\n'.join(cleaned)
+    stats['chars_after'] = len(joined)
+    stats['tokens_saved'] = estimate_tokens(text) - estimate_tokens(joined)
+    CHARS_IN.inc(len(text))
+    CHARS_OUT.inc(len(joined))
+    return cleaned, stats
+
+def clean_text(text):
+    """Return (cleaned_text, stats) for extracted document or web text.
+
+    Pages become paragraph breaks; ``stats`` is as for clean_pages().
+    """
+    pages, stats = clean_pages(text)
+    return '\n\n'.join(pages), stats
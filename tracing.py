@@ -0,0 +1,174 @@
+"""
+Lightweight per-request tracing spans and an on-demand stack-sampling profiler.
+"""
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+@contextmanager
+def span(name, histogram=None):
+    """Time a block, adding it to the current request's trace.
+
+    ``histogram`` is an optional metrics child that receives the same
+    duration, so one wrapper feeds both the trace and /metrics. Outside a
+    traced request only the histogram is updated.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+def server_timing_header(trace, total):
+    """Format a trace as a Server-Timing header value, summing repeated spans."""
+    durations = {}
+    counts = {}
+    for name, elapsed in trace:
+        durations[name] = durations.get(name, 0.0) + elapsed
+        counts[name] = counts.get(name, 0) + 1
+    parts = []
+    for name, elapsed in durations.items():
+        part = f"{name};dur={elapsed * 1000:.1f}"
+        if counts[name] > 1:
+            part += f';desc="{counts[name]} calls"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ', '.join(parts)
+
+# Leaf functions that mean a thread is parked rather than doing work
+IDLE_FUNCTIONS = {'wait', 'select', 'poll', 'epoll', 'get', 'accept', 'sleep', '_worker'}
+
+class StackSampler:
+    """Samples the stacks of every thread while armed requests are in flight.
+
+    Sampling covers all threads, so work pushed to the threadpool shows up
+    alongside work done on the event loop. Samples are aggregated into
+    collapsed stacks (the format flame graph tools read) and per-function
+    self/total counts.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._thread = None
+        self.remaining = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.samples = 0
+        self.stacks = Counter()
+
+    def arm(self, requests):
+        """Profile the next ``requests`` requests, discarding earlier results."""
+        with self._lock:
+            self.remaining = requests
+            self.completed = 0
+            self.samples = 0
+            self.stacks = Counter()
+
+    def request_started(self):
+        """Claim a profiling slot for a request. Returns False when not armed."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self.in_flight += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+            return True
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if self.in_flight <= 0:
+                    self._thread = None
+                    return
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                with self._lock:
+                    self.stacks[';'.join(reversed(stack))] += 1
+                    self.samples += 1
+            time.sleep(self.interval)
+
+    def report(self, limit=40):
+        with self._lock:
+            stacks = Counter(self.stacks)
+            summary = {
+                'requests_remaining': self.remaining,
+                'requests_profiled': self.completed,
+                'samples': self.samples,
+                'interval_ms': self.interval * 1000,
+            }
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for function in set(frames):
+                total_counts[function] += count
+        summary['functions'] = [
+            {'function': function, 'self': self_counts[function], 'total': total}
+            for function, total in total_counts.most_common(limit)
+        ]
+        summary['stacks'] = [f"{stack} {count}" for stack, count in stacks.most_common(limit)]
+        return summary
+
+class TracingMiddleware:
+    """ASGI middleware that collects spans per request and reports them in a
+    Server-Timing response header. It also feeds armed requests to the profiler.
+    """
+
+    def __init__(self, app, sampler=None, skip_prefixes=('/admin', '/metrics')):
+        self.app = app
+        self.sampler = sampler
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = []
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                header = server_timing_header(trace, time.perf_counter() - start)
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', header.encode('latin-1'))]
+            await send(message)
+
+        profiled = (
+            self.sampler is not None
+            and not scope['path'].startswith(self.skip_prefixes)
+            and self.sampler.request_started()
+        )
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiled:
+                self.sampler.request_finished()
+            _current_trace.reset(token)
@@ -0,0 +1,177 @@
+"""
+Batch ingestion of several URLs into one deck.
+
+All URLs are fetched concurrently with httpx, limited per host and bounded by
+timeouts. The extracted texts, up to MAX_BATCH_CHARS in all, are packed into
+chunks that fit one generation request, and the chunks are generated
+concurrently. A URL that fails is reported in ``sources`` and does not fail
+the batch.
+"""
+import asyncio
+from urllib.parse import urlparse
+
+import httpx
+
+import metrics
+import tracing
+from html_text import MAX_HTML_BYTES, extract_main_text
+
+MAX_BATCH_URLS = 50
+# Concurrent fetches per host, so a reading list from one site is not a burst
+MAX_PER_HOST = 4
+MAX_CONNECTIONS = 20
+FETCH_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+# Text per generation request; generate_flashcards truncates at 100,000
+CHUNK_CHARS = 90_000
+# Text used from all URLs together, so one request is at most a few generation calls
+MAX_BATCH_CHARS = 3 * CHUNK_CHARS
+GENERATE_CONCURRENCY = 3
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+def is_youtube(url):
+    return 'youtube.com' in url or 'youtu.be' in url
+
+async def fetch_page_text(client, url):
+    """Fetch one page, reading at most MAX_HTML_BYTES, and extract its main text."""
+    async with client.stream('GET', url) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '')
+        if content_type and 'html' not in content_type and not content_type.startswith('text/'):
+            raise ValueError(f"Unsupported content type: {content_type.split(';')[0]}")
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) >= MAX_HTML_BYTES:
+                break
+        encoding = response.charset_encoding
+    # Parsing is CPU work; keep it off the event loop
+    return await asyncio.to_thread(extract_main_text, bytes(body[:MAX_HTML_BYTES]), encoding)
+
+async def fetch_source(client, url, host_limits, sync_extract):
+    """Return {'url', 'ok', 'chars', 'error', 'text'} for one URL."""
+    source = {'url': url, 'ok': False, 'chars': 0, 'error': None, 'text': ''}
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        source['error'] = 'Not an http(s) URL'
+        return source
+    try:
+        if is_youtube(url) and sync_extract is not None:
+            # Transcripts come from youtube-transcript-api, which is synchronous
+            text = await asyncio.to_thread(sync_extract, url)
+        else:
+            async with host_limits.setdefault(parsed.hostname, asyncio.Semaphore(MAX_PER_HOST)):
+                with tracing.span("extract.url", metrics.EXTRACTION_URL):
+                    text = await fetch_page_text(client, url)
+    except httpx.HTTPStatusError as e:
+        source['error'] = f"HTTP {e.response.status_code}"
+    except httpx.TimeoutException:
+        source['error'] = 'Timed out'
+    except Exception as e:
+        source['error'] = str(e) or type(e).__name__
+    else:
+        if text and text.strip():
+            source.update(ok=True, chars=len(text), text=text)
+        else:
+            source['error'] = 'No text extracted'
+    return source
+
+async def fetch_sources(urls, sync_extract=None, timeout=FETCH_TIMEOUT):
+    """Fetch every URL concurrently, returning one source dict per URL in order."""
+    host_limits = {}
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True,
+                                 headers={'User-Agent': USER_AGENT}) as client:
+        return await asyncio.gather(*(fetch_source(client, url, host_limits, sync_extract) for url in urls))
+
+def cap_sources(sources, max_chars=MAX_BATCH_CHARS):
+    """Cut the fetched texts, in URL order, to ``max_chars`` in all.
+
+    A source that loses text is marked 'truncated' and its 'chars' becomes
+    what is kept.
+    """
+    remaining = max_chars
+    for source in sources:
+        source['truncated'] = False
+        if not source['ok']:
+            continue
+        if len(source['text']) > remaining:
+            source.update(text=source['text'][:remaining], chars=remaining, truncated=True)
+        remaining -= len(source['text'])
+    return sources
+
+def pack_chunks(sources, chunk_chars=CHUNK_CHARS):
+    """Pack the fetched texts into chunks of at most ``chunk_chars``.
+
+    Whole documents share a chunk when they fit. Longer documents are split at
+    line breaks. Each piece is labelled with its source URL.
+    """
+    chunks = []
+    current = ''
+    for source in sources:
+        if not source['ok']:
+            continue
+        header = f"Source: {source['url']}\n"
+        text = source['text']
+        while text:
+            room = chunk_chars - len(current) - len(header) - 2
+            if room < min(len(text), chunk_chars // 4) and current:
+                chunks.append(current)
+                current = ''
+                continue
+            room = max(room, 1)
+            if len(text) <= room:
+                piece, text = text, ''
+            else:
+                cut = text.rfind('\n', 0, room)
+                if cut <= 0:
+                    cut = text.rfind(' ', 0, room)
+                if cut <= 0:
+                    cut = room
+                piece, text = text[:cut], text[cut:].lstrip()
+            current += header + piece + '\n\n'
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def generate_chunks(chunks, generate, concurrency=GENERATE_CONCURRENCY, run_sync=asyncio.to_thread):
+    """Run the synchronous ``generate`` over every chunk, ``concurrency`` at a time.
+
+    ``run_sync(fn, *args)`` runs blocking work off the event loop. Returns
+    (flashcards, failed_chunk_count).
+    """
+    limit = asyncio.Semaphore(concurrency)
+
+    async def generate_one(chunk):
+        async with limit:
+            return await run_sync(generate, chunk)
+
+    flashcards = []
+    failed = 0
+    for result in await asyncio.gather(*(generate_one(chunk) for chunk in chunks), return_exceptions=True):
+        if isinstance(result, dict) and result.get('flashcards'):
+            flashcards.extend(result['flashcards'])
+        else:
+            failed += 1
+    return flashcards, failed
+
+async def ingest_urls(urls, generate, sync_extract=None, chunk_chars=CHUNK_CHARS, run_sync=asyncio.to_thread,
+                      max_chars=MAX_BATCH_CHARS):
+    """Fetch ``urls`` and generate one combined deck from them.
+
+    ``generate`` is generate_flashcards (or a stand-in) and ``sync_extract``
+    handles the URLs that need a synchronous extractor (YouTube).
+    ``run_sync`` runs each generation off the event loop. Returns
+    {'flashcards', 'sources', 'chunks', 'failed_chunks'}, where each source
+    reports 'url', 'ok', 'chars', 'truncated' and 'error'. Only the first
+    ``max_chars`` of text across all URLs is used.
+    """
+    sources = cap_sources(await fetch_sources(urls, sync_extract), max_chars)
+    chunks = pack_chunks(sources, chunk_chars)
+    flashcards, failed = await generate_chunks(chunks, generate, run_sync=run_sync) if chunks else ([], 0)
+    return {
+        'flashcards': flashcards,
+        'sources': [{key: source[key] for key in ('url', 'ok', 'chars', 'truncated', 'error')} for source in sources],
+        'chunks': len(chunks),
+        'failed_chunks': failed,
+    }
@@ -0,0 +1,153 @@
+"""
+Token and cost ledger for Claude calls, with daily budgets.
+
+call_claude records the input and output tokens of every response. A call is
+attributed to the ``attribute()`` scope it runs in: an endpoint plus the keys
+it counts against, 'client:<address>' for every request and also
+'session:<id>' for grading and hints in a study session. The scope is a context variable, so it follows work handed to
+the worker pools and coalesced tasks. Usage is aggregated per key and per
+endpoint for each UTC day, in memory; set USAGE_LOG_PATH to also append one
+JSON line per call for reporting across restarts.
+
+Budgets are token totals per key per day. The ledger only answers whether a
+key is over budget; callers decide how to degrade (app.py grades locally
+once a study session or its client is over, and refuses new generations for
+a client).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import metrics
+
+DAY = 24 * 60 * 60
+
+TOKENS = metrics.MetricFamily(
+    'flashcards_claude_tokens_total',
+    'Claude tokens by call purpose, model tier and direction.',
+    'counter', ('purpose', 'tier', 'direction'),
+)
+COST = metrics.MetricFamily(
+    'flashcards_claude_cost_dollars_total',
+    'Estimated Claude cost in US dollars by call purpose and model tier.',
+    'counter', ('purpose', 'tier'),
+)
+BUDGET_EXCEEDED = metrics.MetricFamily(
+    'flashcards_budget_exceeded_total',
+    'Requests degraded or refused because a daily token budget was spent, by budget.',
+    'counter', ('budget',),
+)
+
+_attribution = contextvars.ContextVar('usage_attribution', default=('cli', ()))
+
+@contextmanager
+def attribute(endpoint, *keys):
+    """Attribute the Claude calls made inside this block to ``endpoint`` and each of ``keys``."""
+    token = _attribution.set((endpoint, keys))
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+def day_of(now):
+    return time.strftime('%Y-%m-%d', time.gmtime(now))
+
+def seconds_until_tomorrow(now=None):
+    """Seconds until the current UTC day, and with it every daily budget, ends."""
+    now = time.time() if now is None else now
+    return DAY - now % DAY
+
+def _totals():
+    # input tokens, output tokens, calls, cost in dollars
+    return [0, 0, 0, 0.0]
+
+class TokenLedger:
+    """Per-key and per-endpoint token totals for each UTC day.
+
+    Records arrive from worker threads, so updates take a lock. Only the
+    ``max_keys`` most recently active (day, key) pairs are kept; an evicted
+    key starts again from zero.
+    """
+
+    def __init__(self, log_path=None, max_keys=100_000):
+        self.log_path = log_path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self.keys = OrderedDict()
+        self.endpoints = {}
+        self._metrics = {}
+
+    def record(self, purpose, tier, input_tokens, output_tokens, cost, now=None):
+        """Add one Claude call to the totals of the current attribution scope."""
+        endpoint, keys = _attribution.get()
+        now = time.time() if now is None else now
+        day = day_of(now)
+        with self._lock:
+            rows = [self.endpoints.setdefault((day, endpoint, purpose, tier), _totals())]
+            for key in keys:
+                row = self.keys.pop((day, key), None) or _totals()
+                self.keys[(day, key)] = row
+                rows.append(row)
+                while len(self.keys) > self.max_keys:
+                    self.keys.popitem(last=False)
+            for row in rows:
+                row[0] += input_tokens
+                row[1] += output_tokens
+                row[2] += 1
+                row[3] += cost
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as log:
+                    log.write(json.dumps({
+                        'time': round(now, 3), 'endpoint': endpoint, 'keys': list(keys), 'purpose': purpose, 'tier': tier,
+                        'input_tokens': input_tokens, 'output_tokens': output_tokens, 'cost': round(cost, 6),
+                    }) + '\n')
+        counters = self._metrics.get((purpose, tier))
+        if counters is None:
+            counters = self._metrics[purpose, tier] = (
+                TOKENS.labels(purpose, tier, 'input'), TOKENS.labels(purpose, tier, 'output'), COST.labels(purpose, tier),
+            )
+        counters[0].inc(input_tokens)
+        counters[1].inc(output_tokens)
+        counters[2].inc(cost)
+
+    def used(self, key, now=None):
+        """Tokens ``key`` has used today."""
+        row = self.keys.get((day_of(time.time() if now is None else now), key))
+        return row[0] + row[1] if row else 0
+
+    def over_budget(self, key, budget, now=None):
+        """True when ``budget`` (tokens per day; 0 for none) is spent for ``key``."""
+        return bool(budget) and self.used(key, now) >= budget
+
+    def report(self, day=None, top=20):
+        """Totals for ``day`` (default today): overall, per endpoint and the ``top`` keys by tokens."""
+        day = day or day_of(time.time())
+
+        def describe(row):
+            return {'input_tokens': row[0], 'output_tokens': row[1], 'calls': row[2], 'cost': round(row[3], 6)}
+
+        with self._lock:
+            endpoints = [
+                {'endpoint': endpoint, 'purpose': purpose, 'tier': tier, **describe(row)}
+                for (row_day, endpoint, purpose, tier), row in self.endpoints.items() if row_day == day
+            ]
+            keys = [(key, list(row)) for (row_day, key), row in self.keys.items() if row_day == day]
+        total = _totals()
+        for entry in endpoints:
+            total[0] += entry['input_tokens']
+            total[1] += entry['output_tokens']
+            total[2] += entry['calls']
+            total[3] += entry['cost']
+        keys.sort(key=lambda item: item[1][0] + item[1][1], reverse=True)
+        return {
+            'day': day,
+            'total': describe(total),
+            'endpoints': sorted(endpoints, key=lambda entry: entry['cost'], reverse=True),
+            'keys': [{'key': key, **describe(row)} for key, row in keys[:top]],
+        }
+
+LEDGER = TokenLedger(os.getenv("USAGE_LOG_PATH") or None)